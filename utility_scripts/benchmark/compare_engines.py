@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Compares timing, peak memory and output size of the raster engines of plot_CaSPAr_data.py
+(pcolor, pcolormesh, imshow) for all products of the product table in lib/caspar.
+
+Synthetic files on the nominal grid of each product are written to a temporary directory.
+Every (product, engine) pair is plotted in a fresh process so that the peak memory
+(maximum resident set size) of one render does not influence the next.
+imshow is only possible for products on grids that are rectilinear on the map (GDPS, GEPS).
+
+Run with::
+
+      PRODUCTS ... products to compare (default: all)
+      ENGINES  ... engines to compare (default: pcolor pcolormesh imshow)
+      SCALE    ... factor for number of grid cells per dimension (default: 1, i.e. full grids)
+      OUTTYPE  ... png or pdf (default: png)
+
+      python compare_engines.py
+      python compare_engines.py -p RDPS HRDPS -e pcolormesh imshow -x 0.5 -t pdf
+
+"""
+
+import argparse
+
+products = []
+engines  = ['pcolor', 'pcolormesh', 'imshow']
+scale    = 1.
+outtype  = 'png'
+ntime    = 1
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Compare raster engines of plot_CaSPAr_data.py.''')
+parser.add_argument('-p', '--products', action='store', nargs='+', default=products, dest='products',
+                    help="Products to compare (default: all).")
+parser.add_argument('-e', '--engines', action='store', nargs='+', default=engines, dest='engines',
+                    help="Raster engines to compare (default: pcolor pcolormesh imshow).")
+parser.add_argument('-x', '--scale', action='store', type=float, default=scale, dest='scale',
+                    help="Factor for number of grid cells per dimension (default: 1).")
+parser.add_argument('-t', '--outtype', action='store', default=outtype, dest='outtype', choices=['png', 'pdf'],
+                    help="Output type png or pdf (default: png).")
+parser.add_argument('-n', '--ntime', action='store', type=int, default=ntime, dest='ntime',
+                    help="Number of time steps plotted per render (default: 1).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import resource
+import shutil
+import tempfile
+import time
+import multiprocessing as mp
+
+
+def write_file(job):
+    """ Write synthetic file of product in a fresh process; returns variable and grid size. """
+    product, ntime, scale, ncfile = job
+    import caspar                     # in lib/
+    ds       = caspar.synthetic_dataset(product, ntime=ntime, scale=scale)
+    variable = list(ds.data_vars)[0]
+    grid     = 'x'.join([ str(i) for i in ds[variable].shape[1:] ])
+    ds.to_netcdf(ncfile)
+    ds.close()
+
+    return variable, grid
+
+
+def render(job):
+    """ Plot one file with one engine in a fresh process; returns timing, memory and output size. """
+    ncfile, variable, engine, outtype, outbase = job
+    import caspar                     # in lib/
+    caspar.set_plot_style(outtype)
+    import matplotlib.pyplot as plt
+    import xarray as xr
+    from mpl_toolkits.basemap import Basemap
+
+    rss0   = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tstart = time.time()
+    if outtype == 'pdf':
+        itime = caspar.plot_caspar(ncfile, variable, pdffile=outbase+'.pdf', timesteps='all',
+                                   engine=engine, verbose=False)
+        outfiles = [outbase+'.pdf']
+    else:
+        itime = caspar.plot_caspar(ncfile, variable, pngbase=outbase, timesteps='all',
+                                   engine=engine, verbose=False)
+        outfiles = [ outbase+"{0:04d}".format(i+1)+".png" for i in range(itime['nframes']) ]
+    itime['total'] = time.time() - tstart
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    itime['peakmem'] = (rss1 - rss0) / 1024.                                 # MB (ru_maxrss in kB on Linux)
+    itime['size']    = sum([ os.path.getsize(ff) for ff in outfiles ]) / 1024.**2  # MB
+
+    return itime
+
+
+if __name__ == '__main__':
+
+    args     = parser.parse_args()
+    products = args.products
+    engines  = args.engines
+    scale    = args.scale
+    outtype  = args.outtype
+    ntime    = args.ntime
+    del parser, args
+
+    import caspar                     # in lib/
+    if len(products) == 0:
+        products = [ pp for pp in caspar.caspar_products if pp != '' ]
+
+    tmpdir = tempfile.mkdtemp(prefix='caspar_engines_')
+    ctx    = mp.get_context('spawn')   # fresh process per render for clean memory and matplotlib state
+
+    print('{:<16s} {:>12s} {:<11s} {:>8s} {:>8s} {:>8s} {:>11s} {:>9s}'.format(
+        'product', 'grid', 'engine', 'setup', 'render', 'total', 'peakmem', 'size'))
+    print('{:<16s} {:>12s} {:<11s} {:>8s} {:>8s} {:>8s} {:>11s} {:>9s}'.format(
+        '', '', '', '[s]', '[s]', '[s]', '[MB]', '[MB]'))
+    try:
+        for product in products:
+            # synthetic file in a worker: the peak memory of this process is inherited by the workers
+            ncfile = os.path.join(tmpdir, product+'.nc')
+            pool   = ctx.Pool(processes=1)
+            variable, grid = pool.apply(write_file, ((product, ntime, scale, ncfile),))
+            pool.close()
+            pool.join()
+            for engine in engines:
+                outbase = os.path.join(tmpdir, product+'_'+engine+'_')
+                pool = ctx.Pool(processes=1)
+                try:
+                    itime = pool.apply(render, ((ncfile, variable, engine, outtype, outbase),))
+                    print('{:<16s} {:>12s} {:<11s} {:>8.2f} {:>8.2f} {:>8.2f} {:>11.1f} {:>9.2f}'.format(
+                        product, grid, engine, itime['setup'], itime['render'], itime['total'],
+                        itime['peakmem'], itime['size']))
+                except ValueError as e:
+                    print('{:<16s} {:>12s} {:<11s} {:s}'.format(product, grid, engine, 'not possible: '+str(e)))
+                pool.close()
+                pool.join()
+                sys.stdout.flush()
+    finally:
+        shutil.rmtree(tmpdir)
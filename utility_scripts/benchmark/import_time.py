@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Measures the time to import packages of lib/ and fails if it exceeds a budget.
+
+Every import is timed in a fresh Python process, several times, and the fastest time counts,
+so that the result does not depend on modules imported before or on a cold disk cache.
+Heavy packages (numpy, matplotlib, ...) that were pulled in by the import are listed.
+The exit status is 1 if any import is slower than the budget, so the script can be used
+as a check after changes to lib/color.
+
+Run with::
+
+      MODULES ... modules to import (default: color)
+      BUDGET  ... maximum import time in milliseconds (default: 50)
+      REPEAT  ... number of fresh processes per module (default: 5)
+
+      python import_time.py
+      python import_time.py -m color caspar -b 200
+
+"""
+
+import argparse
+
+modules = ['color']
+budget  = 50.
+repeat  = 5
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Import time of lib/ packages with budget.''')
+parser.add_argument('-m', '--modules', action='store', nargs='+', default=modules, dest='modules',
+                    help="Modules to import (default: color).")
+parser.add_argument('-b', '--budget', action='store', type=float, default=budget, dest='budget',
+                    help="Maximum import time [ms] (default: 50).")
+parser.add_argument('-r', '--repeat', action='store', type=int, default=repeat, dest='repeat',
+                    help="Number of fresh processes per module (default: 5).")
+
+args    = parser.parse_args()
+modules = args.modules
+budget  = args.budget
+repeat  = args.repeat
+
+del parser, args
+
+import sys
+import os
+import json
+import subprocess
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+lib_path = os.path.abspath(dir_path+'/../lib')
+
+# heavy packages that should not be imported by a fast import
+heavy = ['numpy', 'scipy', 'matplotlib', 'pandas', 'xarray', 'netCDF4', 'mpl_toolkits.basemap']
+
+# code run in the fresh process: time the import only, not the interpreter start
+code = '''
+import sys, time, json
+sys.path.insert(0, {lib!r})
+t0 = time.time()
+import {module}
+t1 = time.time()
+print(json.dumps({{'time': t1-t0, 'heavy': [ mm for mm in {heavy!r} if mm in sys.modules ]}}))
+'''
+
+failed = []
+print('{:<20s} {:>10s} {:>10s} {:>10s}  {:s}'.format('module', 'min [ms]', 'max [ms]', 'budget', 'heavy modules imported'))
+for module in modules:
+    times = []
+    try:
+        for ii in range(repeat):
+            out = subprocess.check_output([sys.executable, '-c', code.format(lib=lib_path, module=module, heavy=heavy)])
+            res = json.loads(out.decode('utf-8').strip().split('\n')[-1])
+            times.append(res['time']*1000.)
+    except subprocess.CalledProcessError:
+        failed.append(module)
+        print('{:<20s} {:>10s} {:>10s} {:>10s}'.format(module, '-', '-', 'IMPORT ERROR'))
+        continue
+    ok = min(times) <= budget
+    if not ok:
+        failed.append(module)
+    print('{:<20s} {:>10.1f} {:>10.1f} {:>10s}  {:s}'.format(module, min(times), max(times),
+                                                           'ok' if ok else 'FAILED', ', '.join(res['heavy'])))
+
+if len(failed) > 0:
+    print('')
+    print('Import slower than budget of {:g} ms: {:s}'.format(budget, ', '.join(failed)))
+    sys.exit(1)
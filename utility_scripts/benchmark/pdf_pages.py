@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Checks the multi-page PDF output of plot_CaSPAr_data.py with and without writing the page
+images as soon as every page is saved (caspar.plot.flush_pdf).
+
+A synthetic file on the nominal grid of the product with NPAGES time steps is written to a
+temporary directory and plotted into one PDF page per time step, once with and once without
+flushing, each in a fresh process. Time, peak memory (maximum resident set size) and file size
+are reported. Both PDF files are then read again and compared page by page: the content
+streams of the pages and the pixels (and soft masks) of the images drawn on them must be
+identical. The exit status is 1 if they differ.
+
+The flush is only done with the matplotlib versions of caspar.plot.pdf_flush_versions; with
+other versions both runs write the images when the file is closed.
+
+Run with::
+
+      PRODUCT   ... product of the synthetic file (default: HRDPS)
+      SCALE     ... factor for number of grid cells per dimension (default: 0.5)
+      NPAGES    ... number of pages, i.e. time steps (default: 120)
+      RASTERDPI ... dpi of the rasterised field (default: 150)
+
+      python pdf_pages.py
+      python pdf_pages.py -p RDPS -x 1 -n 240
+
+"""
+
+import argparse
+
+product   = 'HRDPS'
+scale     = 0.5
+npages    = 120
+rasterdpi = 150
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Memory and page identity of multi-page PDF output with and without flush.''')
+parser.add_argument('-p', '--product', action='store', default=product, dest='product',
+                    help="Product of the synthetic file (default: HRDPS).")
+parser.add_argument('-x', '--scale', action='store', type=float, default=scale, dest='scale',
+                    help="Factor for number of grid cells per dimension (default: 0.5).")
+parser.add_argument('-n', '--npages', action='store', type=int, default=npages, dest='npages',
+                    help="Number of pages, i.e. time steps (default: 120).")
+parser.add_argument('-a', '--rasterdpi', action='store', type=int, default=rasterdpi, dest='rasterdpi',
+                    help="dpi of the rasterised field (default: 150).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import re
+import shutil
+import tempfile
+import time
+import zlib
+import multiprocessing as mp
+
+
+def write_file(job):
+    """ Write synthetic file of product in a fresh process; returns variable and grid size. """
+    product, ntime, scale, ncfile = job
+    import caspar                     # in lib/
+    ds       = caspar.synthetic_dataset(product, ntime=ntime, scale=scale)
+    variable = list(ds.data_vars)[0]
+    grid     = 'x'.join([ str(i) for i in ds[variable].shape[1:] ])
+    ds.to_netcdf(ncfile)
+    ds.close()
+
+    return variable, grid
+
+
+def run_pdf(job):
+    """ Plot all time steps into one PDF in a fresh process; returns time [s] and peak memory [MB]. """
+    ncfile, variable, pdffile, rasterdpi, flush = job
+    import caspar                     # in lib/
+    import caspar.plot
+    caspar.set_plot_style('pdf')
+    caspar.plot.flush_pdf = flush
+
+    tstart = time.time()
+    caspar.plot_caspar(ncfile, variable, pdffile=pdffile, timesteps='all', rasterdpi=rasterdpi, verbose=False)
+
+    return {'time': time.time() - tstart, 'peakmem': caspar.peak_rss()}
+
+
+def read_pdf(pdffile):
+    """
+        Pages of a PDF file written by matplotlib: list of (content stream, {image name: (pixels, soft mask)})
+        with all streams decompressed. Reads the objects through the cross-reference table.
+    """
+    with open(pdffile, 'rb') as ff:
+        data = ff.read()
+
+    # cross-reference table
+    start   = int(data[data.rindex(b'startxref')+9:].split()[0])
+    xref    = data[start:data.index(b'trailer', start)].split()
+    offsets = {}
+    ii, nn  = 2, len(xref)
+    while ii < nn:
+        first, count = int(xref[ii-1]), int(xref[ii])
+        for kk in range(count):
+            if xref[ii+1+3*kk+2] == b'n':
+                offsets[first+kk] = int(xref[ii+1+3*kk])
+        ii += 2 + 3*count
+
+    def obj(num):
+        """ Dictionary text and decompressed stream (or None) of object num. """
+        pos  = data.index(b'obj', offsets[num]) + 3
+        end  = data.index(b'endobj', pos)
+        sbeg = data.find(b'stream', pos, end)
+        if sbeg < 0:
+            return data[pos:end], None
+        head   = data[pos:sbeg]
+        length = re.search(rb'/Length (\d+)( 0 R)?', head)
+        length = int(obj(int(length.group(1)))[0]) if length.group(2) else int(length.group(1))
+        sbeg   = sbeg + 6 + (2 if data[sbeg+6:sbeg+8] == b'\r\n' else 1)
+        stream = data[sbeg:sbeg+length]
+        if b'/FlateDecode' in head:
+            stream = zlib.decompress(stream)
+        return head, stream
+
+    def ref(text, key):
+        """ Object number of entry key in dictionary text. """
+        return int(re.search(b'/'+key+rb'\s+(\d+) 0 R', text).group(1))
+
+    catalog  = obj(ref(data[data.rindex(b'trailer'):], b'Root'))[0]
+    kids     = re.search(rb'/Kids\s*\[([^\]]*)\]', obj(ref(catalog, b'Pages'))[0]).group(1)
+    xobjects = {}
+    pages    = []
+    for pnum in [ int(nn) for nn in re.findall(rb'(\d+) 0 R', kids) ]:
+        page    = obj(pnum)[0]
+        content = obj(ref(page, b'Contents'))[1]
+        if not xobjects:
+            resources = page if (b'/XObject' in page) else obj(ref(page, b'Resources'))[0]
+            xobjects  = dict([ (nn, int(oo)) for nn, oo in
+                               re.findall(rb'/(\w+)\s+(\d+) 0 R', obj(ref(resources, b'XObject'))[0]) ])
+        images = {}
+        for name in re.findall(rb'/(I\d+) Do', content):
+            head, pixels = obj(xobjects[name])
+            smask = re.search(rb'/SMask (\d+) 0 R', head)
+            images[name] = (pixels, obj(int(smask.group(1)))[1] if smask else None)
+        pages.append((content, images))
+
+    return pages
+
+
+if __name__ == '__main__':
+
+    args      = parser.parse_args()
+    product   = args.product
+    scale     = args.scale
+    npages    = args.npages
+    rasterdpi = args.rasterdpi
+    del parser, args
+
+    import caspar                     # in lib/
+    import caspar.plot
+    import matplotlib as mpl
+
+    tmpdir = tempfile.mkdtemp(prefix='caspar_pdf_')
+    os.environ['CASPAR_CACHE_DIR'] = os.path.join(tmpdir, 'cache')   # inherited by the workers
+    ctx    = mp.get_context('spawn')   # fresh process per run for clean memory
+    try:
+        # synthetic file in a worker: the peak memory of this process is inherited by the workers
+        ncfile = os.path.join(tmpdir, product+'.nc')
+        pool   = ctx.Pool(processes=1)
+        variable, grid = pool.apply(write_file, ((product, npages, scale, ncfile),))
+        pool.close()
+        pool.join()
+
+        print('matplotlib ', mpl.__version__, ' flush versions ', caspar.plot.pdf_flush_versions)
+        print('{:<12s} {:>10s} {:>6s} {:<6s} {:>9s} {:>9s} {:>9s}'.format('product', 'grid', 'pages', 'flush',
+                                                                       'time', 'peakmem', 'size'))
+        print('{:<12s} {:>10s} {:>6s} {:<6s} {:>9s} {:>9s} {:>9s}'.format('', '', '', '', '[s]', '[MB]', '[MB]'))
+        pdffiles = {}
+        for flush in [True, False]:
+            pdffiles[flush] = os.path.join(tmpdir, product+'_flush{:d}.pdf'.format(flush))
+            pool = ctx.Pool(processes=1)
+            res  = pool.apply(run_pdf, ((ncfile, variable, pdffiles[flush], rasterdpi, flush),))
+            pool.close()
+            pool.join()
+            print('{:<12s} {:>10s} {:>6d} {:<6s} {:>9.1f} {:>9.1f} {:>9.1f}'.format(
+                product, grid, npages, str(flush), res['time'], res['peakmem'], os.path.getsize(pdffiles[flush])/2.**20))
+            sys.stdout.flush()
+
+        with_flush    = read_pdf(pdffiles[True])
+        without_flush = read_pdf(pdffiles[False])
+        differ = [ ii+1 for ii, (pp, qq) in enumerate(zip(with_flush, without_flush)) if pp != qq ]
+        if len(with_flush) != len(without_flush):
+            print('Number of pages differ: {:d} with flush, {:d} without'.format(len(with_flush), len(without_flush)))
+            differ.append(0)
+        elif (len(with_flush) != npages) or (min([ len(pp[1]) for pp in with_flush ]) == 0):
+            print('Expected {:d} pages with one image each'.format(npages))
+            differ.append(0)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('')
+    if len(differ) > 0:
+        print('Pages differ with and without flush: ', differ)
+        sys.exit(1)
+    print('All {:d} pages identical with and without flush'.format(npages))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Times the stages of the plot pipeline of plot_CaSPAr_data.py per product and compares them
+with a baseline written earlier on the same machine.
+
+Synthetic files on the nominal grid of each product are written to a temporary directory.
+Every product is plotted with plot_caspar in a fresh process. The stages are the ones that
+plot_caspar marks with caspar.stage, recorded with caspar.enable_profile/profile_records:
+
+      open        open file lazily and select hyperslab
+      edges       cell centres and corners (grid_geometry)
+      map         Basemap, coastlines and graticule
+      projection  map coordinates of centres and corners (project_grid)
+      read        read the field, summed over all time steps
+      draw        field and colour bar
+      savefig     update data and write one PNG per time step, summed over all time steps
+
+The peak memory (maximum resident set size) is recorded after every stage. The on-disk cache
+of grid geometry, projections and coastline overlays is emptied before every run, unless -c
+is given; then it is kept between the repeats of a product (use -r 2 or more for warm caches).
+
+With -w the results are written as baseline (JSON). Otherwise they are compared with the
+baseline if it exists: a stage is flagged as regression if it is slower than the baseline by
+more than TOLERANCE (relative) and 0.05 s, or the peak memory is higher by more than TOLERANCE
+and 20 MB. The exit status is 1 if there is any regression. Baselines are only comparable on
+the same machine, so none is shipped: run with -w first, e.g. before a change.
+
+Run with::
+
+      PRODUCTS  ... products to time (default: CaPA_coarse CaPA_fine RDPS HRDPS GDPS RDRS_v2 CaLDAS)
+      SCALE     ... factor for number of grid cells per dimension (default: 1, i.e. full grids)
+      NTIME     ... number of time steps (default: 2)
+      REPEAT    ... number of fresh processes per product; the fastest counts (default: 1)
+      BASELINE  ... JSON file of baseline (default: plot_stages_baseline.json next to this script)
+      TOLERANCE ... relative tolerance of regressions (default: 0.2)
+
+      python plot_stages.py -w                 # store baseline
+      python plot_stages.py                    # compare with baseline
+      python plot_stages.py -p RDPS HRDPS -x 0.5 -r 3
+
+"""
+
+import argparse
+
+products  = ['CaPA_coarse', 'CaPA_fine', 'RDPS', 'HRDPS', 'GDPS', 'RDRS_v2', 'CaLDAS']
+scale     = 1.
+ntime     = 2
+repeat    = 1
+baseline  = ''
+tolerance = 0.2
+write     = False
+cache     = False
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Stage timing of the plot pipeline with baseline.''')
+parser.add_argument('-p', '--products', action='store', nargs='+', default=products, dest='products',
+                    help="Products to time (default: CaPA_coarse CaPA_fine RDPS HRDPS GDPS RDRS_v2 CaLDAS).")
+parser.add_argument('-x', '--scale', action='store', type=float, default=scale, dest='scale',
+                    help="Factor for number of grid cells per dimension (default: 1).")
+parser.add_argument('-n', '--ntime', action='store', type=int, default=ntime, dest='ntime',
+                    help="Number of time steps (default: 2).")
+parser.add_argument('-r', '--repeat', action='store', type=int, default=repeat, dest='repeat',
+                    help="Number of fresh processes per product (default: 1).")
+parser.add_argument('-b', '--baseline', action='store', default=baseline, dest='baseline',
+                    help="JSON file of baseline (default: plot_stages_baseline.json next to this script).")
+parser.add_argument('-l', '--tolerance', action='store', type=float, default=tolerance, dest='tolerance',
+                    help="Relative tolerance of regressions (default: 0.2).")
+parser.add_argument('-w', '--write', action='store_true', default=write, dest='write',
+                    help="Write results as new baseline.")
+parser.add_argument('-c', '--cache', action='store_true', default=cache, dest='cache',
+                    help="Use on-disk cache of grid geometry and projections.")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import json
+import shutil
+import tempfile
+import multiprocessing as mp
+
+stages = ['open', 'edges', 'map', 'projection', 'read', 'draw', 'savefig']
+
+
+def write_file(job):
+    """ Write synthetic file of product in a fresh process; returns variable and grid size. """
+    product, ntime, scale, ncfile = job
+    import caspar                     # in lib/
+    ds       = caspar.synthetic_dataset(product, ntime=ntime, scale=scale)
+    variable = list(ds.data_vars)[0]
+    grid     = 'x'.join([ str(i) for i in ds[variable].shape[1:] ])
+    ds.to_netcdf(ncfile)
+    ds.close()
+
+    return variable, grid
+
+
+def run_stages(job):
+    """ Plot one file with plot_caspar in a fresh process; returns time [s] and peak memory [MB] per stage. """
+    ncfile, variable, outbase = job
+    import caspar                     # in lib/
+    caspar.set_plot_style('png')
+
+    caspar.enable_profile(jsonfile=None)
+    caspar.plot_caspar(ncfile, variable, pngbase=outbase, timesteps='all', verbose=False)
+    caspar.disable_profile()
+
+    # stages of several time steps (read, savefig) are summed up
+    result = {}
+    for record in caspar.profile_records():
+        ss = record['stage']
+        if ss not in result:
+            result[ss] = {'time': 0., 'peakmem': 0.}
+        result[ss]['time']   += record['wall']
+        result[ss]['peakmem'] = max(result[ss]['peakmem'], record['peakrss'])
+        if (ss == 'draw'):
+            result['engine'] = record['engine']
+
+    return result
+
+
+def regressions(now, base, tolerance):
+    """ List of (stage, quantity, baseline, now) that are worse than the baseline. """
+    worse = []
+    for ss in stages:
+        if ss not in base:
+            continue
+        if now[ss]['time'] > base[ss]['time'] * (1. + tolerance) + 0.05:
+            worse.append((ss, 'time', base[ss]['time'], now[ss]['time']))
+        if now[ss]['peakmem'] > base[ss]['peakmem'] * (1. + tolerance) + 20.:
+            worse.append((ss, 'peakmem', base[ss]['peakmem'], now[ss]['peakmem']))
+
+    return worse
+
+
+if __name__ == '__main__':
+
+    args      = parser.parse_args()
+    products  = args.products
+    scale     = args.scale
+    ntime     = args.ntime
+    repeat    = args.repeat
+    baseline  = args.baseline
+    tolerance = args.tolerance
+    write     = args.write
+    cache     = args.cache
+    del parser, args
+
+    import caspar                     # in lib/
+
+    if baseline == '':
+        baseline = os.path.join(dir_path, 'plot_stages_baseline.json')
+    base = {}
+    if (not write) and os.path.exists(baseline):
+        with open(baseline) as ff:
+            base = json.load(ff)
+        if (base['scale'] != scale) or (base['ntime'] != ntime) or (base['cache'] != cache):
+            print('Baseline was measured with other scale, number of time steps or cache: not compared')
+            base = {}
+    elif (not write):
+        print('No baseline ', baseline, ': not compared (write one with -w)')
+
+    tmpdir = tempfile.mkdtemp(prefix='caspar_stages_')
+    os.environ['CASPAR_CACHE_DIR'] = os.path.join(tmpdir, 'cache')   # inherited by the workers
+    ctx    = mp.get_context('spawn')   # fresh process per product for clean memory and matplotlib state
+
+    print('{:<12s} {:>10s} {:<11s} '.format('product', 'grid', 'engine') +
+          ' '.join([ '{:>10s}'.format(ss) for ss in stages ]) + ' {:>9s}'.format('peakmem'))
+    print('{:<12s} {:>10s} {:<11s} '.format('', '', '') +
+          ' '.join([ '{:>10s}'.format('[s]') for ss in stages ]) + ' {:>9s}'.format('[MB]'))
+    results = {}
+    failed  = []
+    try:
+        for product in products:
+            # synthetic file in a worker: the peak memory of this process is inherited by the workers
+            ncfile = os.path.join(tmpdir, product+'.nc')
+            pool   = ctx.Pool(processes=1)
+            variable, grid = pool.apply(write_file, ((product, ntime, scale, ncfile),))
+            pool.close()
+            pool.join()
+
+            best = None
+            for ii in range(repeat):
+                if (not cache) and os.path.exists(os.environ['CASPAR_CACHE_DIR']):
+                    shutil.rmtree(os.environ['CASPAR_CACHE_DIR'])
+                pool = ctx.Pool(processes=1)
+                res  = pool.apply(run_stages, ((ncfile, variable, os.path.join(tmpdir, product+'_')),))
+                pool.close()
+                pool.join()
+                if best is None:
+                    best = res
+                else:
+                    for ss in stages:
+                        best[ss]['time']    = min(best[ss]['time'], res[ss]['time'])
+                        best[ss]['peakmem'] = min(best[ss]['peakmem'], res[ss]['peakmem'])
+            results[product] = best
+            print('{:<12s} {:>10s} {:<11s} '.format(product, grid, best['engine']) +
+                  ' '.join([ '{:>10.3f}'.format(best[ss]['time']) for ss in stages ]) +
+                  ' {:>9.1f}'.format(max([ best[ss]['peakmem'] for ss in stages ])))
+            if product in base.get('products', {}):
+                for ss, qq, bb, nn in regressions(best, base['products'][product], tolerance):
+                    failed.append(product)
+                    unit = 's' if (qq == 'time') else 'MB'
+                    print('    REGRESSION {:s} {:s}: {:.3f} {:s} -> {:.3f} {:s}'.format(ss, qq, bb, unit, nn, unit))
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if write:
+        tmpfile = baseline+'.'+str(os.getpid())+'.tmp'
+        with open(tmpfile, 'w') as ff:
+            json.dump({'scale': scale, 'ntime': ntime, 'cache': cache, 'products': results}, ff, indent=1)
+        os.rename(tmpfile, baseline)
+        print('')
+        print('Wrote baseline ', baseline)
+    elif len(failed) > 0:
+        print('')
+        print('Regressions against baseline in: {:s}'.format(', '.join(sorted(set(failed)))))
+        sys.exit(1)
@@ -145,6 +145,7 @@
               ST, Mar 2014 - include NCL color maps; define_brewer -> register_brewer
               MC, MAr 2014 - colour maps in extra file brewer.cmaps
               JM, Sep 2014 - color maps of Mathematica
+              JM, Oct 2026 - brewer.cmaps read on first use of a colour map
 """
 from __future__ import print_function
 
@@ -153,7 +154,23 @@ from __future__ import print_function
 # cmapfile = find_in_path('brewer.cmaps') # in jams_python
 import os
 cmapfile = os.path.join(os.path.dirname(__file__), 'brewer.cmaps') # in jams_python/jams
-exec(compile(open(cmapfile).read(), cmapfile, 'exec'))
+
+_cmaps_loaded = []
+
+def _load_cmaps():
+    """ Define the colour maps of brewer.cmaps in the module namespace on first use. """
+    if not _cmaps_loaded:
+        with open(cmapfile) as ff:
+            exec(compile(ff.read(), cmapfile, 'exec'), globals())
+        _cmaps_loaded.append(True)
+
+def __getattr__(name):
+    """ Colour maps of brewer.cmaps are loaded on first access of a colour map (Python >= 3.7). """
+    if not name.startswith('__'):
+        _load_cmaps()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError('module '+__name__+' has no attribute '+name)
 
 sequential_maps = ['ylgn3','ylgn4','ylgn5','ylgn6','ylgn7','ylgn8','ylgn9','ylgnbu3','ylgnbu4',
                    'ylgnbu5','ylgnbu6','ylgnbu7','ylgnbu8','ylgnbu9','gnbu3','gnbu4','gnbu5',
@@ -274,6 +291,7 @@ def register_brewer(cname='all', reverse=False, grey=False, gray=False):
     else:
         cmaps = [cname]
     cmaps = [ capitalise(cc) for cc in cmaps ]
+    _load_cmaps()
     for i in cmaps:
         d = {}
         if i in ncl_large_maps + ncl_small_maps + ncl_meteo_swiss_maps + mma_maps:
@@ -389,6 +407,7 @@ def get_brewer(cname=None, names=False, rgb=False, rgb256=False, reverse=False,
             return cmaps
     else:
         cname = capitalise(cname)
+        _load_cmaps()
         if rgb256:
             d = {}
             if cname in ncl_large_maps + ncl_small_maps + ncl_meteo_swiss_maps + mma_maps:
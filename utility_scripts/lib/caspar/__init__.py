@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+    Tools to plot and process CaSPAr NetCDF files.
+
+    Heavy packages (xarray, matplotlib, Basemap) are only imported inside the functions,
+    so that importing this package is fast.
+
+
+    Provided functions
+    ------------------
+    caspar_products    Map projections, parallels and meridians of the CaSPAr products
+    get_basemap        Basemap, parallels and meridians of a product (cached per process)
+    get_rotated_basemap Basemap in rotated coordinates of a rotated grid (cached per process)
+    set_plot_style     Set matplotlib backend and rc parameters for PDF, PNG or screen output
+    parse_timesteps    Time step indexes from 'all', 'i:j:k' or single index
+    colour_lut         RGBA uint8 look-up table of the colour map of the maps
+    draw_field         Draw a 2D field on a Basemap with the raster engine pcolor, pcolormesh or imshow
+    plot_caspar        Plot variable of a CaSPAr NetCDF file for several time steps
+    engines            Raster engines of plot_caspar
+    grid_geometry      Cell centres, corners and fingerprint of a grid (cached on disk per grid)
+    grid_fingerprint   Fingerprint of a grid from its cell centres
+    cell_centres       2D cell centres from 1D or 2D lon and lat
+    cell_corners       2D cell corners (boundaries) from 1D or 2D lon and lat
+    corners_version    Version of the cell corner algorithm in cache file names
+    cache_dir          On-disk cache directory (CASPAR_CACHE_DIR or ~/.cache/caspar)
+    save_npz           Save arrays to npz file in cache atomically
+    save_npy           Save array to memory-mappable npy file in cache atomically
+    save_pickle        Pickle object to file in cache atomically
+    save_json          Write object to json file atomically
+    project_grid       Map coordinates of cell centres or corners (cached on disk per product, projection and grid)
+    projection_key     Cache key of product, projection, grid and points
+    select_hyperslab   Lazy selection of time step, level and lat/lon bounding box of a variable
+    parse_bbox         Bounding box from string 'lonmin,latmin,lonmax,latmax'
+    peak_rss           Peak resident set size of the current process [MB]
+    lod_factors        Block size of grid cells for about one output pixel per block
+    block_reduce       Reduce 2D field by blocks with mean, max or nearest cell
+    coarsen_corners    Cell boundaries of the blocks of block_reduce
+    lod_modes          Block reductions of block_reduce
+    rotated2geo        Geographic coordinates of rotated latitudes and longitudes
+    geo2rotated        Rotated coordinates of geographic latitudes and longitudes
+    rotated_pole       Rotated north pole of the grid_mapping of a variable (None if not rotated)
+    draw_coastlines    Coastlines of detail from map extent as cached raster layer (PNG) or cached vector segments
+    coast_resolution   Basemap coastline resolution appropriate for the extent of a map
+    coast_segments     Projected and clipped coastline segments of a map (cached on disk)
+    coast_layer        Coastlines rendered as transparent layer of the axes pixels (cached on disk)
+    write_png          Write PNG file directly from RGBA numpy array
+    tile_lonlat        Longitudes and latitudes of the pixels of a Web-Mercator XYZ tile
+    tile_range         Tile rows of a zoom level covering a latitude range
+    grid_locator       Flat cell indexes of longitudes and latitudes on rotated or regular grids
+    grid_tiles         XYZ tiles of a zoom level overlapping a grid
+    render_tiles       Write XYZ tiles of some tile columns of a zoom level for several time steps
+    quicklook          Quick-look PNGs of a variable through a colour look-up table, without matplotlib
+    quicklook_lut      uint8 RGBA look-up table of 256 colours of a brewer colour map and a NaN colour
+    quicklook_rgba     RGBA image of a 2D field through a look-up table
+    regrid_weights     Sparse regridding matrix between two grids (cached on disk per pair of grids and method)
+    regrid             Field on target grid with one sparse matrix product
+    bilinear_weights   Sparse bilinear interpolation matrix from a grid to points
+    conservative_weights  Sparse area-weighted regridding matrix between two grids
+    regrid_key         Cache key of source grid, target grid and method
+    regrid_methods     Methods of regrid_weights
+    difference_dataset Difference of two variables at common valid times on one grid, e.g. forecast minus analysis
+    diff_cmap          Diverging colour map of differences
+    station_table      Table of time series at stations of many files (parallel, one read per file)
+    extract_stations   Time series at stations of one file, nearest cell or bilinear
+    station_weights    Cell indexes and weights of stations on a (curvilinear) grid
+    station_tree       KD-tree of the cell centres of a grid on the unit sphere (cached on disk per grid)
+    station_methods    Methods of station_weights
+    basin_weights      Sparse area weights of grid cells in basin polygons (cached on disk per grid and basins)
+    basin_means        Basin means of a field with the weights of basin_weights
+    read_basins        Ids and polygons of basins of a shapefile or JSON file
+    basin_key          Cache key of grid and basin polygons
+    write_r2c          Stream a variable of many files into an EnSim r2c file (Green Kenue, MESH, WATFLOOD)
+    format_frame       Text of a 2D field in fixed-width columns with vectorised digit formatting
+    r2c_header         Header of an r2c file of a regular longitude-latitude grid
+    r2c_grid           Regular longitude-latitude grid of the r2c file of a variable
+    scan_collection    SQLite index of the headers of many files, rescanning only new or changed files
+    open_collection    Lazy dataset of all indexed files along time without opening them
+    stitch             Best-estimate series of the lead window of consecutive forecast issues in one NetCDF file (resumable)
+    stitch_plan        Issue and time step of every valid time of a best-estimate series
+    lead_window        First and last lead hour of a lead window
+    issue_time         Issue time of a forecast file
+    global_scale       Minimum, maximum and quantiles of a variable over many files (parallel pre-pass)
+    scale_norm         Fixed matplotlib Normalize from global_scale for plot_caspar
+    file_sketch        Streamed colour scale sketch of all time steps of a file
+    ScaleSketch        Running minimum, maximum and random sample for approximate quantiles
+    ensemble_stats     Ensemble mean, spread and exceedance probability streamed member by member
+    welford_update     Online update of count, mean and sum of squared deviations with one member
+    member_dim         Member dimension of a variable of GEPS or REPS files
+    enable_profile     Switch on recording of wall time, CPU time and peak memory of stages as JSON lines
+    disable_profile    Switch off recording of stages
+    stage              Context manager marking a stage of the tools for profiling
+    profile_records    Records of all stages since enable_profile
+    dump_profile       Write cProfile statistics of the slowest stage
+    serve              Resident render server for plot_caspar jobs on a UNIX socket
+    submit             Send job to render server (None if no server is running)
+    default_socket     UNIX socket of the render server
+    synthetic_dataset  CaSPAr-like dataset on the nominal grid of a product for tests and benchmarks
+
+
+    Examples
+    --------
+    # import caspar
+    # caspar.set_plot_style('png')
+    # caspar.plot_caspar('RDPS_2017100212.nc', 'RDPS_P0_SFC', pngbase='RDPS_', timesteps='all')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+
+# product projections
+from .products          import caspar_products, get_basemap, get_rotated_basemap, rotpole_xoffset
+
+# on-disk cache
+from .cache             import cache_dir, save_npz, save_npy, save_pickle, save_json
+
+# grid geometry
+from .grid              import grid_fingerprint, cell_centres, cell_corners, grid_geometry, corners_version
+
+# projected coordinates
+from .projcache         import projection_key, project_grid
+
+# lazy hyperslab selection
+from .hyperslab         import parse_bbox, select_hyperslab, peak_rss
+
+# level of detail
+from .lod               import lod_modes, lod_factors, block_reduce, coarsen_corners
+
+# rotated grids
+from .rotated           import rotated2geo, geo2rotated, rotated_pole
+
+# plotting
+from .plot              import set_plot_style, parse_timesteps, colour_lut, draw_field, plot_caspar, engines
+
+# coastline overlays
+from .overlay           import coast_resolution, coast_segments, coast_layer, draw_coastlines
+
+# map tiles
+from .png               import write_png
+from .tiles             import tile_lonlat, tile_range, grid_locator, grid_tiles, render_tiles
+
+# quick looks
+from .quicklook         import quicklook_lut, quicklook_rgba, quicklook
+
+# regridding
+from .regrid            import bilinear_weights, conservative_weights, regrid_key, regrid_weights, regrid, regrid_methods
+
+# differences of two files
+from .compare           import difference_dataset, diff_cmap
+
+# station time series
+from .stations          import station_tree, station_weights, extract_stations, station_table, station_methods
+
+# basin weights
+from .basins            import read_basins, basin_key, basin_weights, basin_means
+
+# r2c files
+from .r2c               import r2c_header, format_frame, r2c_grid, write_r2c
+
+# collections of many files
+from .collection        import scan_collection, open_collection
+
+# best-estimate series of forecast issues
+from .stitch            import lead_window, issue_time, stitch_plan, stitch
+
+# colour scale over many files
+from .scale             import ScaleSketch, file_sketch, global_scale, scale_norm
+
+# ensemble statistics
+from .ensemble          import member_dim, welford_update, ensemble_stats
+
+# profiling of stages
+from .stages            import enable_profile, disable_profile, stage, profile_records, dump_profile
+
+# render server
+from .server            import default_socket, serve, submit
+
+# synthetic data
+from .synthetic         import synthetic_dataset
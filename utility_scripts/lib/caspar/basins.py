@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+"""
+    Area weights of grid cells in basin polygons for basin-averaged (lumped) forcings.
+
+    Every basin polygon is intersected exactly with the cell polygons of the grid, i.e. the
+    quadrilaterals of the cell corners lonh, lath of grid_geometry. The weight of a cell for a
+    basin is the area of their intersection divided by the area of the basin covered by the
+    grid, so that the basin mean of a field z is the sparse matrix-vector product W @ z.
+    W (nbasin, ncell) is stored in CSR format as npz in cache_dir('basins') per grid and set of
+    basins; later calls only read it.
+
+    Areas are computed in a sinusoidal (equal-area) projection centred on each basin, in which
+    the edges of basins and cells are straight lines between their vertices.
+    Candidate cells of a basin are found with the KD-tree of the cell centres of station_tree
+    (cached per grid), filtered by the bounding box of the basin, and the basin is clipped with
+    all candidate cells touched by its edges at once (Sutherland-Hodgman, vectorised over the
+    cells); cells not touched by an edge are inside or outside as a whole. Basins may have
+    several parts and holes (rings of opposite orientation as in shapefiles).
+
+
+    Definition
+    ----------
+    def read_basins(filename, idfield=None):
+    def basin_key(lon, lat, polygons):
+    def basin_weights(lon, lat, polygons, ids=None, nprocs=1, cache=True):
+    def basin_means(weights, zz):
+
+
+    Input
+    -----
+    filename    shapefile (.shp) of basin polygons, or JSON file with a dictionary of basin id
+                and list of [lon, lat] vertices as accepted by coords2shapefile
+    lon, lat    1D or 2D longitudes and latitudes of the cell centres of a grid
+    polygons    list of basins; every basin is a list of [lon, lat] vertices as accepted by
+                coords2shapefile, or a list of such rings (parts and holes)
+    weights     dictionary of basin_weights
+    zz          field on the grid (..., ny, nx)
+
+
+    Optional Input
+    --------------
+    idfield     attribute of the shapefile with the basin ids (default: None, i.e. record number)
+    ids         ids of the basins (default: None, i.e. 0, 1, 2, ...)
+    nprocs      number of processes clipping basins in parallel, with cache only
+                (default: 1; 0: number of cores)
+    cache       True: read from / write to on-disk cache (default: True)
+
+
+    Output
+    ------
+    read_basins     ids and polygons of the basins, polygons as list of rings
+    basin_key       hex string identifying grid and polygons
+    basin_weights   dictionary with
+                    'weights':   scipy.sparse.csr_matrix (nbasin, ncell); rows sum to 1
+                    'coverage':  fraction of the area of each basin covered by the grid
+                    'area':      area of each basin [km2]
+                    'ids':       basin ids
+    basin_means     basin means (..., nbasin); NaN for basins outside of the grid
+
+
+    Examples
+    --------
+    >>> lon, lat = np.arange(0., 4.), np.arange(0., 3.)
+    >>> ww = basin_weights(lon, lat, [[[0., 0.], [1., 0.], [1., 1.], [0., 1.]]], cache=False)
+    >>> print(np.round(ww['weights'].toarray().reshape(3, 4), 3))
+    [[0.25 0.25 0.   0.  ]
+     [0.25 0.25 0.   0.  ]
+     [0.   0.   0.   0.  ]]
+    >>> print(np.round(basin_means(ww, np.arange(12.).reshape(3, 4)), 3), np.round(ww['coverage'], 3))
+    [2.5] [1.]
+
+    # ids, polygons = read_basins('basins.shp', idfield='ID')
+    # ww  = basin_weights(capa['lon'].values, capa['lat'].values, polygons, ids=ids, nprocs=8)
+    # pre = basin_means(ww, capa['CaPA_fine_A_PR0_SFC'].values)     # (time, nbasin)
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import os
+import hashlib
+import numpy as np
+
+__all__ = ['read_basins', 'basin_key', 'basin_weights', 'basin_means']
+
+# radius of the Earth [km]
+_radius = 6371.
+
+# maximum distance of cell corners from cell centres on the unit sphere, per grid fingerprint
+_cellradius = {}
+
+# -------------------------------------------------------------------------------------------------
+
+def _rings(polygon):
+    """ List of rings (n,2) of a basin given as one ring or list of rings. """
+    pp = np.asarray(polygon[0], dtype=np.float64)
+    if (pp.ndim == 1):
+        polygon = [polygon]
+
+    return [ np.asarray(rr, dtype=np.float64).reshape(-1, 2) for rr in polygon ]
+
+def _sinusoidal(lon, lat, lon0):
+    """ Equal-area sinusoidal projection [km] centred on longitude lon0. """
+    dlon = np.mod(lon - lon0 + 180., 360.) - 180.
+
+    return np.deg2rad(dlon) * np.cos(np.deg2rad(lat)) * _radius, np.deg2rad(lat) * _radius
+
+def _signed_area(x, y):
+    """ Signed area of polygons (..., n): positive if counter-clockwise. """
+    return 0.5 * np.sum(x * np.roll(y, -1, axis=-1) - np.roll(x, -1, axis=-1) * y, axis=-1)
+
+def _clip(px, py, cx, cy):
+    """
+        Sutherland-Hodgman clipping of polygons px, py (k,n) with convex counter-clockwise
+        quadrilaterals cx, cy (k,4). Returns rows kept and clipped polygons; shorter polygons
+        are padded by repeating their last vertex, which does not change their area.
+    """
+    rows = np.arange(px.shape[0])
+    for ee in range(4):
+        ax, ay = cx[:,ee:ee+1], cy[:,ee:ee+1]
+        bx, by = cx[:,(ee+1)%4:(ee+1)%4+1], cy[:,(ee+1)%4:(ee+1)%4+1]
+        qx, qy = np.roll(px, -1, axis=1), np.roll(py, -1, axis=1)
+        dp = (bx - ax) * (py - ay) - (by - ay) * (px - ax)      # >= 0: inside
+        dq = (bx - ax) * (qy - ay) - (by - ay) * (qx - ax)
+        inp, inq = dp >= 0., dq >= 0.
+        cross = inp != inq
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tt = np.where(cross, dp / (dp - dq), 0.)
+        # every edge p -> q gives p if inside and the intersection if crossing
+        nx = np.stack([px, px + tt * (qx - px)], axis=2).reshape(px.shape[0], -1)
+        ny = np.stack([py, py + tt * (qy - py)], axis=2).reshape(py.shape[0], -1)
+        ok = np.stack([inp, cross], axis=2).reshape(px.shape[0], -1)
+        count = np.count_nonzero(ok, axis=1)
+        keep  = count >= 3
+        if not np.any(keep):
+            return rows[:0], px[:0], py[:0]
+        rows, nx, ny, ok, count = rows[keep], nx[keep], ny[keep], ok[keep], count[keep]
+        # compact vertices to the front; pad with the last vertex
+        ir, ic = np.nonzero(ok)
+        pos    = np.arange(ir.size) - np.repeat(np.cumsum(count) - count, count)
+        last   = np.cumsum(count) - 1
+        px     = np.repeat(nx[ir[last],ic[last]][:,np.newaxis], count.max(), axis=1)
+        py     = np.repeat(ny[ir[last],ic[last]][:,np.newaxis], count.max(), axis=1)
+        px[ir,pos] = nx[ir,ic]
+        py[ir,pos] = ny[ir,ic]
+        cx, cy = cx[keep], cy[keep]
+
+    return rows, px, py
+
+def _edge_cells(rx, ry, cx, cy):
+    """ True for quadrilaterals cx, cy (k,4) overlapping the bounding box of an edge of ring rx, ry (n). """
+    qx, qy = np.roll(rx, -1), np.roll(ry, -1)
+    ex0, ex1 = np.minimum(rx, qx), np.maximum(rx, qx)
+    ey0, ey1 = np.minimum(ry, qy), np.maximum(ry, qy)
+    edge = np.zeros(cx.shape[0], dtype=bool)
+    cx0, cx1 = cx.min(axis=1)[:,np.newaxis], cx.max(axis=1)[:,np.newaxis]
+    cy0, cy1 = cy.min(axis=1)[:,np.newaxis], cy.max(axis=1)[:,np.newaxis]
+    step = max(1, 2**22 // max(1, rx.size))
+    for kk in range(0, cx.shape[0], step):
+        sl = slice(kk, kk+step)
+        edge[sl] = np.any((cx1[sl] >= ex0) & (cx0[sl] <= ex1) & (cy1[sl] >= ey0) & (cy0[sl] <= ey1), axis=1)
+
+    return edge
+
+def _inside(rx, ry, x, y):
+    """ True for points x, y (k) inside ring rx, ry (n) (crossing number). """
+    qx, qy = np.roll(rx, -1), np.roll(ry, -1)
+    inside = np.zeros(x.shape, dtype=bool)
+    step   = max(1, 2**22 // max(1, rx.size))
+    for kk in range(0, x.size, step):
+        xk, yk = x[kk:kk+step,np.newaxis], y[kk:kk+step,np.newaxis]
+        spans  = (ry > yk) != (qy > yk)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = rx + (yk - ry) * (qx - rx) / (qy - ry)
+        inside[kk:kk+step] = np.count_nonzero(spans & (xk < xc), axis=1) % 2 == 1
+
+    return inside
+
+def _grid(lon, lat, cache=True):
+    """ Cell corners, KD-tree of cell centres and maximum cell radius of the grid. """
+    from .grid     import grid_geometry
+    from .stations import station_tree, _xyz
+    geometry = grid_geometry(lon, lat, cache=cache)
+    tree     = station_tree(geometry['lon'], geometry['lat'], cache=cache)
+    key      = geometry['fingerprint']
+    if key not in _cellradius:
+        lonh, lath = geometry['lonh'], geometry['lath']
+        centre = _xyz(geometry['lon'], geometry['lat'])
+        radius = 0.
+        for sy, sx in [(slice(None, -1), slice(None, -1)), (slice(None, -1), slice(1, None)),
+                       (slice(1, None), slice(None, -1)), (slice(1, None), slice(1, None))]:
+            radius = max(radius, np.linalg.norm(_xyz(lonh[sy,sx], lath[sy,sx]) - centre, axis=1).max())
+        _cellradius.clear()
+        _cellradius[key] = radius
+
+    return geometry, tree, _cellradius[key]
+
+def _basin_rows(args):
+    """ Cells, intersection areas and basin area of a chunk of basins. """
+    from .stations import _xyz
+    lon, lat, polygons, cache = args
+    if isinstance(lon, str):             # fingerprint: grid from on-disk cache in worker
+        from .grid import _geometry_file
+        with np.load(_geometry_file(lon)) as ff:
+            lon, lat = ff['lon'], ff['lat']
+    geometry, tree, cradius = _grid(lon, lat, cache=cache)
+    lonh, lath = geometry['lonh'], geometry['lath']
+    nx   = geometry['lon'].shape[1]
+    lmin = np.min(lonh)
+    rows = []
+    for polygon in polygons:
+        rings = _rings(polygon)
+        allv  = np.concatenate(rings)
+        # longitudes of the basin in the longitude range of the grid
+        allv[:,0] = lmin + np.mod(allv[:,0] - lmin, 360.)
+        lon0  = np.mean(allv[:,0])
+        # candidate cells: KD-tree ball around basin, then bounding box
+        xyz    = _xyz(allv[:,0], allv[:,1])
+        centre = np.mean(xyz, axis=0)
+        centre = centre / np.linalg.norm(centre)
+        rball  = np.linalg.norm(xyz - centre, axis=1).max() + cradius
+        cand   = np.array(tree.query_ball_point(centre, rball), dtype=np.int64)
+        bx, by = _sinusoidal(allv[:,0], allv[:,1], lon0)
+        cells, areas = [], []
+        if (cand.size > 0):
+            iy, ix = np.divmod(cand, nx)
+            cy = [ lath[iy+dy,ix+dx] for dy, dx in [(0, 0), (0, 1), (1, 1), (1, 0)] ]
+            cx = [ lonh[iy+dy,ix+dx] for dy, dx in [(0, 0), (0, 1), (1, 1), (1, 0)] ]
+            cx, cy = _sinusoidal(np.stack(cx, axis=1).astype(np.float64), np.stack(cy, axis=1).astype(np.float64), lon0)
+            inbox  = ((cx.max(axis=1) >= bx.min()) & (cx.min(axis=1) <= bx.max()) &
+                      (cy.max(axis=1) >= by.min()) & (cy.min(axis=1) <= by.max()))
+            cand, cx, cy = cand[inbox], cx[inbox], cy[inbox]
+            clockwise = _signed_area(cx, cy) < 0.
+            cx[clockwise], cy[clockwise] = cx[clockwise,::-1], cy[clockwise,::-1]
+            total = np.zeros(cand.size)
+            for rr in rings:
+                rx, ry = _sinusoidal(lmin + np.mod(rr[:,0] - lmin, 360.), rr[:,1], lon0)
+                rin    = ((cx.max(axis=1) >= rx.min()) & (cx.min(axis=1) <= rx.max()) &
+                          (cy.max(axis=1) >= ry.min()) & (cy.min(axis=1) <= ry.max()))
+                ii     = np.nonzero(rin)[0]
+                # cells touched by an edge of the ring are clipped; the others are inside or outside
+                edge   = _edge_cells(rx, ry, cx[ii], cy[ii])
+                step   = max(1, 2**20 // rx.size)       # bounded memory for detailed rings
+                for kk in range(0, np.count_nonzero(edge), step):
+                    jj = ii[edge][kk:kk+step]
+                    kept, px, py = _clip(np.broadcast_to(rx, (jj.size, rx.size)), np.broadcast_to(ry, (jj.size, ry.size)),
+                                         cx[jj], cy[jj])
+                    np.add.at(total, jj[kept], _signed_area(px, py))
+                jj     = ii[~edge]
+                inside = _inside(rx, ry, np.mean(cx[jj], axis=1), np.mean(cy[jj], axis=1))
+                orient = 1. if (_signed_area(rx, ry) >= 0.) else -1.
+                total[jj[inside]] += orient * _signed_area(cx[jj[inside]], cy[jj[inside]])
+            cells, areas = cand, total
+        # orientation of basin: outer rings dominate
+        barea = sum([ _signed_area(*_sinusoidal(lmin + np.mod(rr[:,0] - lmin, 360.), rr[:,1], lon0)) for rr in rings ])
+        sign  = 1. if (barea >= 0.) else -1.
+        areas = sign * np.asarray(areas)
+        keep  = areas > 0.
+        rows.append((np.asarray(cells)[keep], areas[keep], abs(barea)))
+
+    return rows
+
+# -------------------------------------------------------------------------------------------------
+
+def read_basins(filename, idfield=None):
+    """
+        Ids and polygons (lists of rings) of basins of a shapefile or JSON file.
+    """
+    if filename.lower().endswith('.json'):
+        import json
+        with open(filename) as ff:
+            basins = json.load(ff)
+        if isinstance(basins, dict):
+            ids = list(basins.keys())
+            return ids, [ _rings(basins[ii]) for ii in ids ]
+        return list(range(len(basins))), [ _rings(bb) for bb in basins ]
+
+    import shapefile
+    sf       = shapefile.Reader(filename)
+    fields   = [ ff[0] for ff in sf.fields[1:] ]
+    ids      = []
+    polygons = []
+    for irec, sr in enumerate(sf.iterShapeRecords()):
+        parts  = list(sr.shape.parts)
+        points = np.array(sr.shape.points, dtype=np.float64)
+        bounds = parts + [len(points)]
+        polygons.append([ points[bounds[ii]:bounds[ii+1]] for ii in range(len(parts)) ])
+        ids.append(irec if (idfield is None) else sr.record[fields.index(idfield)])
+
+    return ids, polygons
+
+def basin_key(lon, lat, polygons):
+    """
+        Hex key of grid and basin polygons.
+    """
+    from .grid import grid_fingerprint
+    hh = hashlib.sha1()
+    hh.update(grid_fingerprint(lon, lat).encode('ascii'))
+    for polygon in polygons:
+        for rr in _rings(polygon):
+            hh.update(str(rr.shape).encode('ascii'))
+            hh.update(np.ascontiguousarray(rr).view(np.uint8))
+
+    return hh.hexdigest()
+
+def basin_weights(lon, lat, polygons, ids=None, nprocs=1, cache=True):
+    """
+        Sparse area weights of the grid cells in the basins, from the on-disk cache if possible.
+    """
+    import scipy.sparse as sp
+    from .grid import cell_centres, grid_geometry
+    if ids is None:
+        ids = list(range(len(polygons)))
+    if (len(ids) != len(polygons)):
+        raise ValueError('basin_weights: ids and polygons must have the same length.')
+    lon, lat = cell_centres(lon, lat)
+    ncell    = lon.size
+
+    if cache:
+        from .cache import cache_dir, save_npz
+        key   = basin_key(lon, lat, polygons)
+        cfile = os.path.join(cache_dir('basins'), key+'.npz')
+        if os.path.exists(cfile):
+            with np.load(cfile) as ff:
+                return {'weights': sp.csr_matrix((ff['data'], ff['indices'], ff['indptr']), shape=tuple(ff['shape'])),
+                        'coverage': ff['coverage'], 'area': ff['area'], 'ids': list(ids)}
+
+    if (nprocs <= 0):
+        import multiprocessing as mp
+        nprocs = mp.cpu_count()
+    nprocs = min(nprocs, len(polygons)) if cache else 1
+
+    if (nprocs > 1):
+        import multiprocessing as mp
+        # grid geometry and KD-tree to disk cache before the workers start
+        fingerprint = _grid(lon, lat, cache=True)[0]['fingerprint']
+        nchunk  = max(1, min(256, len(polygons) // (4*nprocs)))
+        jobs    = [ (fingerprint, None, polygons[ii:ii+nchunk], True) for ii in range(0, len(polygons), nchunk) ]
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        results = pool.map(_basin_rows, jobs, chunksize=1)
+        pool.close()
+        pool.join()
+        rows    = [ rr for chunk in results for rr in chunk ]
+    else:
+        rows = _basin_rows((lon, lat, polygons, cache))
+
+    indptr  = np.cumsum([0] + [ rr[0].size for rr in rows ])
+    indices = np.concatenate([ rr[0] for rr in rows ]).astype(np.int64)
+    covered = np.array([ np.sum(rr[1]) for rr in rows ])
+    area    = np.array([ rr[2] for rr in rows ])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        data     = np.concatenate([ rr[1] / np.sum(rr[1]) for rr in rows ])
+        coverage = np.where(area > 0., covered / area, 0.)
+    ww = sp.csr_matrix((data, indices, indptr), shape=(len(polygons), ncell))
+    if cache:
+        save_npz(cfile, data=ww.data, indices=ww.indices, indptr=ww.indptr, shape=np.array(ww.shape),
+                 coverage=coverage, area=area)
+
+    return {'weights': ww, 'coverage': coverage, 'area': area, 'ids': list(ids)}
+
+def basin_means(weights, zz):
+    """
+        Basin means (..., nbasin) of field zz (..., ny, nx); NaN for basins outside of the grid.
+    """
+    from .regrid import regrid
+    return regrid(weights['weights'], zz, (weights['weights'].shape[0],))
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # relative imports and lib/ need the package: run the doctests of caspar.basins
+    import os
+    import sys
+    import doctest
+    import importlib
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # lib/
+    doctest.testmod(importlib.import_module('caspar.basins'), optionflags=doctest.NORMALIZE_WHITESPACE)
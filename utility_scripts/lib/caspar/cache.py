@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+    On-disk cache directory of the CaSPAr tools.
+
+    Grids, projections and interpolation weights of the CaSPAr products do not change,
+    so derived arrays are stored once and reused by later runs.
+    The cache directory is taken from the environment variable CASPAR_CACHE_DIR
+    and defaults to ~/.cache/caspar.
+
+
+    Definition
+    ----------
+    def cache_dir(subdir=''):
+    def save_npz(filename, **arrays):
+    def save_npy(filename, array):
+    def save_pickle(filename, obj):
+    def save_json(filename, obj):
+
+
+    Optional Input
+    --------------
+    cache_dir
+        subdir     sub-directory of the cache directory, e.g. 'grid' (default: '')
+
+
+    Output
+    ------
+    cache_dir   path of the (created) cache directory
+    save_npz    None; arrays are written to a temporary file first and then renamed,
+                so that concurrent processes never read half-written files
+    save_npy    None; same for a single array in an npy file, which can be memory-mapped
+                with np.load(filename, mmap_mode='r')
+    save_pickle None; same for any picklable object, e.g. a KD-tree
+    save_json   None; same for a JSON-serialisable object, e.g. a dictionary of metadata
+
+
+    Examples
+    --------
+    # cfile = os.path.join(cache_dir('grid'), fingerprint+'.npz')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - save_json
+"""
+from __future__ import print_function
+import os
+import numpy as np
+
+__all__ = ['cache_dir', 'save_npz', 'save_npy', 'save_pickle', 'save_json']
+
+# -------------------------------------------------------------------------------------------------
+
+def cache_dir(subdir=''):
+    """
+        Path of cache directory (and sub-directory); created if not existing.
+    """
+    cdir = os.environ.get('CASPAR_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'caspar'))
+    if subdir != '':
+        cdir = os.path.join(cdir, subdir)
+    if not os.path.isdir(cdir):
+        try:
+            os.makedirs(cdir)
+        except OSError:
+            if not os.path.isdir(cdir): # created by another process in the meantime
+                raise
+
+    return cdir
+
+# -------------------------------------------------------------------------------------------------
+
+def save_npz(filename, **arrays):
+    """
+        Save arrays uncompressed to npz file via temporary file and rename.
+    """
+    tmpfile = filename+'.'+str(os.getpid())+'.tmp.npz'
+    np.savez(tmpfile, **arrays)
+    os.rename(tmpfile, filename)
+
+# -------------------------------------------------------------------------------------------------
+
+def save_npy(filename, array):
+    """
+        Save array to npy file via temporary file and rename.
+    """
+    tmpfile = filename+'.'+str(os.getpid())+'.tmp.npy'
+    np.save(tmpfile, array)
+    os.rename(tmpfile, filename)
+
+# -------------------------------------------------------------------------------------------------
+
+def save_pickle(filename, obj):
+    """
+        Pickle object to file via temporary file and rename.
+    """
+    import pickle
+    tmpfile = filename+'.'+str(os.getpid())+'.tmp.pickle'
+    with open(tmpfile, 'wb') as ff:
+        pickle.dump(obj, ff, protocol=pickle.HIGHEST_PROTOCOL)
+    os.rename(tmpfile, filename)
+
+# -------------------------------------------------------------------------------------------------
+
+def save_json(filename, obj):
+    """
+        Write object to json file via temporary file and rename.
+    """
+    import json
+    tmpfile = filename+'.'+str(os.getpid())+'.tmp.json'
+    with open(tmpfile, 'w') as ff:
+        json.dump(obj, ff, indent=1)
+    os.rename(tmpfile, filename)
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
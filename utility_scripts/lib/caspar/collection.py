@@ -0,0 +1,447 @@
+#!/usr/bin/env python
+"""
+    Virtual aggregated dataset over many CaSPAr files with an SQLite index of their headers.
+
+    CaSPAr deliveries come as one NetCDF file per issue time. xr.open_mfdataset opens every file
+    and reads its header and coordinates each time a collection is opened, which takes minutes for
+    a year of hourly files. scan_collection reads the headers once and stores in an SQLite file
+    the names, sizes, modification times and time steps of all files, and only once for the whole
+    collection the variables with their dimensions, attributes, chunking and compression, the
+    values of all variables without time dimension (e.g. rlat, rlon, lon, lat, rotated_pole), and
+    the global attributes. Scanning again only reads files that are new or changed; files not
+    given anymore are removed from the index. The index is committed every few hundred files, so
+    that an interrupted scan continues where it stopped.
+
+    open_collection builds the dataset from the index alone, without opening any NetCDF file, as
+    xr.open_dataset would give it for the concatenation of all files along time: the time series
+    variables are lazy arrays, which open only the files holding the selected time steps and read
+    only the selected hyperslab of them. Time steps present in several files (e.g. overlapping
+    forecast issues) are taken from the last file in the order of the file names. The dataset works
+    with all functions taking lazily opened datasets, e.g. select_hyperslab.
+
+    The files must have the same variables, dimensions and data types, apart from the length of
+    the time dimension; files of a different layout are reported and not indexed.
+
+    The dataset keeps the size and modification time of every file from the index. These are
+    compared with the file each time data is read from it: a file changed since it was indexed
+    raises a ValueError until the collection is scanned and opened again, and handles kept open
+    of an earlier version of a file are closed. scan_collection closes the handles of the files it
+    indexes again.
+
+
+    Definition
+    ----------
+    def scan_collection(files, indexfile, tdim='time', nprocs=1):
+    def open_collection(indexfile):
+
+
+    Input
+    -----
+    files        list of CaSPAr NetCDF files
+    indexfile    name of SQLite index file
+
+
+    Optional Input
+    --------------
+    tdim         name of the time dimension along which the files are aggregated (default: 'time')
+    nprocs       number of processes scanning files; <= 0: number of cores (default: 1)
+
+
+    Output
+    ------
+    scan_collection  dictionary with number of files in index ('files'), scanned files ('scanned'),
+                     files removed from the index ('removed') and list of (file, error) of files
+                     that could not be indexed ('failed')
+    open_collection  lazy xarray dataset of all files
+
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> import pandas as pd
+    >>> import xarray as xr
+    >>> tmp = tempfile.mkdtemp()
+    >>> for ii in range(3):
+    ...     ds = xr.Dataset({'z': (('time', 'lat', 'lon'), np.full((2,2,3), ii, dtype=np.float32))},
+    ...                     coords={'time': pd.date_range('2017-10-02', periods=2, freq='6h') + pd.Timedelta(ii*6, 'h'),
+    ...                             'lat': [0., 1.], 'lon': [0., 1., 2.]})
+    ...     ds.to_netcdf(os.path.join(tmp, 'z_{:d}.nc'.format(ii)))
+    >>> files = sorted([ os.path.join(tmp, 'z_{:d}.nc'.format(ii)) for ii in range(3) ])
+    >>> print(scan_collection(files, os.path.join(tmp, 'z.sqlite'))['files'])
+    3
+    >>> ds = open_collection(os.path.join(tmp, 'z.sqlite'))
+    >>> print(ds['z'].shape)
+    (4, 2, 3)
+    >>> print(ds['z'][:,0,0].values)
+    [0. 1. 2. 2.]
+    >>> print(scan_collection(files, os.path.join(tmp, 'z.sqlite'))['scanned'])
+    0
+    >>> os.utime(files[2], (0, 0))
+    >>> print(ds['z'][:,0,0].values)   # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    ValueError: open_collection: file changed since it was indexed, scan_collection again: ...z_2.nc
+    >>> print(scan_collection(files, os.path.join(tmp, 'z.sqlite'))['scanned'])
+    1
+    >>> ds = open_collection(os.path.join(tmp, 'z.sqlite'))
+    >>> print(ds['z'][:,0,0].values)
+    [0. 1. 2. 2.]
+
+    # info = scan_collection(sorted(glob.glob('CaLDAS_2017*.nc')), 'CaLDAS_2017.sqlite', nprocs=8)
+    # ds   = open_collection('CaLDAS_2017.sqlite')
+    # zz   = ds['CaLDAS_A_TT_1.5m'].sel(time=slice('2017-07-01', '2017-07-31')).values
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - size and modification time checked before reading, stale handles closed
+"""
+from __future__ import print_function
+import os
+import json
+import numpy as np
+
+__all__ = ['scan_collection', 'open_collection']
+
+# number of NetCDF files kept open per process for reading
+nhandles = 32
+
+# NetCDF files open for reading in this process: path: (dataset, (size, mtime) when opened)
+_handles = {}
+
+# files scanned between commits of the index
+_ncommit = 256
+
+# -------------------------------------------------------------------------------------------------
+
+def _jsonable(value):
+    """ Attribute value that can be written with json. """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+
+    return value
+
+def _header(nc):
+    """ List of [name, dims, dtype, shape, attrs, encoding] of the variables of an open netCDF4 dataset. """
+    header = []
+    for name, var in nc.variables.items():
+        chunking = var.chunking()
+        encoding = {'contiguous': chunking == 'contiguous'}
+        if (chunking != 'contiguous'):
+            encoding['chunksizes'] = [ int(cc) for cc in chunking ]
+        filters = var.filters() or {}
+        for ff in ['zlib', 'shuffle', 'complevel', 'fletcher32']:
+            if ff in filters:
+                encoding[ff] = _jsonable(filters[ff])
+        attrs = dict([ (aa, _jsonable(var.getncattr(aa))) for aa in var.ncattrs() ])
+        header.append([name, list(var.dimensions), np.dtype(var.dtype).str,
+                       [ int(nc.dimensions[dd].size) for dd in var.dimensions ], attrs, encoding])
+
+    return header
+
+def _layout(header, tdim):
+    """ Variables, dimensions, data types and shapes apart from the time dimension as string. """
+    return json.dumps([ [name, dims, dtype, [ -1 if (dd == tdim) else ss for dd, ss in zip(dims, shape) ]]
+                        for name, dims, dtype, shape, attrs, encoding in header ])
+
+def _scan_file(args):
+    """ Size, modification time, time steps [ns], header and global attributes of a file in a worker. """
+    import netCDF4 as nc4
+    from xarray.coding.times import decode_cf_datetime
+    filename, tdim = args
+    try:
+        stat = os.stat(filename)
+        with nc4.Dataset(filename) as nc:
+            nc.set_auto_maskandscale(False)
+            if tdim not in nc.variables:
+                raise ValueError('no time variable '+tdim)
+            tvar  = nc.variables[tdim]
+            times = decode_cf_datetime(tvar[:], tvar.getncattr('units'),
+                                       tvar.getncattr('calendar') if ('calendar' in tvar.ncattrs()) else 'standard')
+            info  = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                     'times': np.asarray(times, dtype='datetime64[ns]').astype(np.int64),
+                     'header': _header(nc),
+                     'attrs': dict([ (aa, _jsonable(nc.getncattr(aa))) for aa in nc.ncattrs() ])}
+        error = ''
+    except Exception as e:
+        info  = None
+        error = type(e).__name__+': '+str(e)
+
+    return filename, info, error
+
+def _create(con):
+    """ Tables of the index. """
+    con.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    con.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, times BLOB)')
+    con.execute('CREATE TABLE IF NOT EXISTS variables (name TEXT PRIMARY KEY, dims TEXT, dtype TEXT, shape TEXT, '
+                'attrs TEXT, encoding TEXT, data BLOB)')
+
+def _close(paths):
+    """ Close the open handles of paths. """
+    for pp in paths:
+        if pp in _handles:
+            _handles.pop(pp)[0].close()
+
+def _dataset(path, stat=None):
+    """
+        netCDF4 dataset of path without masking and scaling, kept open for later reads.
+        stat is (size, mtime) of the file in the index; a file changed since raises ValueError.
+    """
+    st  = os.stat(path)
+    now = (st.st_size, st.st_mtime)
+    if (path in _handles) and (_handles[path][1] != now):
+        _close([path])                # opened before the file changed
+    if (stat is not None) and (tuple(stat) != now):
+        raise ValueError('open_collection: file changed since it was indexed, scan_collection again: '+path)
+    if path not in _handles:
+        import netCDF4 as nc4
+        if len(_handles) >= nhandles:
+            _close([next(iter(_handles))])
+        nc = nc4.Dataset(path)
+        nc.set_auto_maskandscale(False)
+        _handles[path] = (nc, now)
+
+    return _handles[path][0]
+
+def _collection_array():
+    """ Class of the lazy time series arrays; defined on first use so that xarray is imported late. """
+    from xarray.backends.common import BackendArray
+    from xarray.core import indexing
+
+    class _CollectionArray(BackendArray):
+        """
+            Variable concatenated along time over files: time step i is step lidx[i] of file paths[fidx[i]],
+            which had (size, mtime) stats[fidx[i]] when it was indexed.
+        """
+
+        def __init__(self, paths, stats, fidx, lidx, name, taxis, shape, dtype):
+            self.paths = paths
+            self.stats = stats
+            self.fidx  = fidx
+            self.lidx  = lidx
+            self.name  = name
+            self.taxis = taxis
+            self.shape = tuple(shape)
+            self.dtype = np.dtype(dtype)
+
+        def __getitem__(self, key):
+            return indexing.explicit_indexing_adapter(key, self.shape, indexing.IndexingSupport.OUTER,
+                                                      self._getitem)
+
+        def _getitem(self, key):
+            # read slices of the other axes; indexes are applied after reading, integers drop the axis
+            read = []
+            post = []
+            for ax, kk in enumerate(key):
+                if (ax == self.taxis):
+                    read.append(None)
+                    post.append(None)
+                elif isinstance(kk, slice) and (kk.step in (None, 1)):
+                    read.append(kk)
+                    post.append(None)
+                else:
+                    ii = np.arange(self.shape[ax])[kk]
+                    lo = int(ii.min()) if (ii.size > 0) else 0
+                    hi = int(ii.max())+1 if (ii.size > 0) else 0
+                    read.append(slice(lo, hi))
+                    post.append(ii - lo)
+            it     = np.arange(self.shape[self.taxis])[key[self.taxis]]
+            single = np.ndim(it) == 0
+            it     = np.atleast_1d(it)
+            fi, li = self.fidx[it], self.lidx[it]
+            # consecutive time steps of the same file are read at once
+            starts = np.nonzero(np.r_[True, fi[1:] != fi[:-1]])[0] if (it.size > 0) else np.array([], dtype=np.intp)
+            ends   = np.r_[starts[1:], it.size]
+            blocks = []
+            for ss, ee in zip(starts, ends):
+                ll  = li[ss:ee]
+                lo  = int(ll.min())
+                sel = list(read)
+                sel[self.taxis] = slice(lo, int(ll.max())+1)
+                nc    = _dataset(self.paths[fi[ss]], self.stats[fi[ss]])
+                block = np.asarray(nc.variables[self.name][tuple(sel)])
+                blocks.append(block if np.all(np.diff(ll) == 1) and (ll[0] == lo) else np.take(block, ll-lo, axis=self.taxis))
+            if (len(blocks) == 0):
+                shape = [ len(range(*rr.indices(nn))) if (rr is not None) else 0 for rr, nn in zip(read, self.shape) ]
+                out   = np.empty(shape, dtype=self.dtype)
+            else:
+                out = np.concatenate(blocks, axis=self.taxis)
+            for ax in range(len(key)-1, -1, -1):
+                if (ax == self.taxis):
+                    if single:
+                        out = out.take(0, axis=ax)
+                elif (post[ax] is not None):
+                    out = out.take(post[ax], axis=ax)
+
+            return out
+
+    return _CollectionArray
+
+# -------------------------------------------------------------------------------------------------
+
+def scan_collection(files, indexfile, tdim='time', nprocs=1):
+    """
+        Index of the headers of new or changed files in SQLite file indexfile.
+    """
+    import sqlite3
+    files = [ os.path.abspath(ff) for ff in files ]
+    con   = sqlite3.connect(indexfile)
+    _create(con)
+    meta  = dict(con.execute('SELECT key, value FROM meta').fetchall())
+    if ('tdim' in meta) and (json.loads(meta['tdim']) != tdim):
+        raise ValueError('scan_collection: index '+indexfile+' aggregates along '+json.loads(meta['tdim'])+', not '+tdim)
+
+    # files that are new, changed or gone
+    known   = dict([ (pp, (ss, mm)) for pp, ss, mm in con.execute('SELECT path, size, mtime FROM files') ])
+    given   = set(files)
+    removed = [ pp for pp in known if pp not in given ]
+    todo    = []
+    for ff in files:
+        stat = os.stat(ff) if os.path.exists(ff) else None
+        if (stat is None) or (known.get(ff) != (stat.st_size, stat.st_mtime)):
+            todo.append(ff)
+    con.executemany('DELETE FROM files WHERE path = ?', [ (pp,) for pp in removed+todo ])
+    _close(removed+todo)
+    if (con.execute('SELECT COUNT(*) FROM files').fetchone()[0] == 0):
+        # new collection: layout of the first readable file
+        con.execute('DELETE FROM variables')
+        con.execute('DELETE FROM meta')
+        meta = {}
+    con.commit()
+
+    jobs = [ (ff, tdim) for ff in todo ]
+    if (nprocs <= 0):
+        import multiprocessing as mp
+        nprocs = mp.cpu_count()
+    nprocs = min(nprocs, len(jobs))
+    if (nprocs > 1):
+        import multiprocessing as mp
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        iresult = pool.imap_unordered(_scan_file, jobs, chunksize=16)
+    else:
+        iresult = map(_scan_file, jobs)
+
+    failed  = []
+    scanned = 0
+    for filename, info, error in iresult:
+        if (error == ''):
+            layout = _layout(info['header'], tdim)
+            if ('layout' not in meta):
+                _store_layout(con, filename, info, tdim)
+                meta = dict(con.execute('SELECT key, value FROM meta').fetchall())
+            if (layout != meta['layout']):
+                error = 'ValueError: variables, dimensions or data types differ from the collection'
+        if (error != ''):
+            failed.append((filename, error))
+            continue
+        con.execute('INSERT INTO files VALUES (?, ?, ?, ?)', (filename, info['size'], info['mtime'],
+                                                            info['times'].tobytes()))
+        scanned += 1
+        if (scanned % _ncommit == 0):
+            con.commit()
+    if (nprocs > 1):
+        pool.close()
+        pool.join()
+    con.commit()
+    nfiles = con.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+    con.close()
+
+    return {'files': nfiles, 'scanned': scanned, 'removed': len(removed), 'failed': failed}
+
+def _store_layout(con, filename, info, tdim):
+    """ Variables, values of variables without time dimension and global attributes of the first file. """
+    import netCDF4 as nc4
+    rows = []
+    with nc4.Dataset(filename) as nc:
+        nc.set_auto_maskandscale(False)
+        for name, dims, dtype, shape, attrs, encoding in info['header']:
+            data = None if (tdim in dims) else np.ascontiguousarray(nc.variables[name][...], dtype=dtype).tobytes()
+            rows.append((name, json.dumps(dims), dtype, json.dumps(shape), json.dumps(attrs), json.dumps(encoding), data))
+    con.executemany('INSERT INTO variables VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+    con.executemany('INSERT INTO meta VALUES (?, ?)', [('tdim', json.dumps(tdim)),
+                                                       ('layout', _layout(info['header'], tdim)),
+                                                       ('attrs', json.dumps(info['attrs']))])
+
+def open_collection(indexfile):
+    """
+        Lazy dataset of all files of the index, concatenated along time.
+    """
+    import sqlite3
+    import xarray as xr
+    from xarray.core import indexing
+    if not os.path.exists(indexfile):
+        raise ValueError('open_collection: index file does not exist: '+indexfile)
+    con  = sqlite3.connect(indexfile)
+    meta = dict(con.execute('SELECT key, value FROM meta').fetchall())
+    rows = con.execute('SELECT path, size, mtime, times FROM files ORDER BY path').fetchall()
+    vrows = con.execute('SELECT name, dims, dtype, shape, attrs, encoding, data FROM variables').fetchall()
+    con.close()
+    if (len(rows) == 0):
+        raise ValueError('open_collection: no files in index: '+indexfile)
+    tdim = json.loads(meta['tdim'])
+
+    # time steps of all files; the last file wins for time steps in several files
+    paths = [ rr[0] for rr in rows ]
+    stats = [ (rr[1], rr[2]) for rr in rows ]
+    times = [ np.frombuffer(rr[3], dtype=np.int64) for rr in rows ]
+    fidx  = np.repeat(np.arange(len(paths)), [ tt.size for tt in times ])
+    lidx  = np.concatenate([ np.arange(tt.size) for tt in times ])
+    times = np.concatenate(times)
+    order = np.argsort(times, kind='stable')
+    last  = np.r_[times[order][1:] != times[order][:-1], True]
+    order = order[last]
+    fidx, lidx, times = fidx[order], lidx[order], times[order]
+
+    CollectionArray = _collection_array()
+    variables = {}
+    for name, dims, dtype, shape, attrs, encoding, data in vrows:
+        dims, shape = json.loads(dims), json.loads(shape)
+        attrs, encoding = json.loads(attrs), json.loads(encoding)
+        if (name == tdim):
+            encoding.update(dict([ (aa, attrs.pop(aa)) for aa in ['units', 'calendar'] if aa in attrs ]))
+            variables[name] = xr.Variable(dims, times.astype('datetime64[ns]'), attrs=attrs, encoding=encoding)
+        elif (data is None):
+            taxis = dims.index(tdim)
+            shape[taxis] = times.size
+            lazy  = CollectionArray(paths, stats, fidx, lidx, name, taxis, shape, dtype)
+            variables[name] = xr.Variable(dims, indexing.LazilyIndexedArray(lazy), attrs=attrs, encoding=encoding)
+        else:
+            variables[name] = xr.Variable(dims, np.frombuffer(data, dtype=dtype).reshape(shape), attrs=attrs,
+                                          encoding=encoding)
+    ds = xr.decode_cf(xr.Dataset(variables, attrs=json.loads(meta['attrs'])))
+    ds.encoding['source'] = os.path.abspath(indexfile)
+
+    return ds
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    import pandas as pd
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+    Differences of two CaSPAr variables on different grids, e.g. forecast minus analysis.
+
+    The time steps with the same valid time in both files are selected. One field is regridded
+    onto the grid of the other with the cached sparse weights of regrid_weights, and the
+    difference is returned as a dataset like a CaSPAr file on that grid, which can be plotted
+    with plot_caspar. Differences are best shown with a diverging colour map (diff_cmap) and a
+    colour scale symmetric around zero.
+
+    The difference is written one time step at a time to a NetCDF file (by default one file per
+    pair of inputs in cache_dir('compare')), which is returned opened lazily. Only one field of
+    each input and of the difference is in memory, however many time steps are compared.
+
+
+    Definition
+    ----------
+    def difference_dataset(inputfile1, variable1, inputfile2, variable2, onto=2, timesteps='all',
+                           method='bilinear', cache=True, outfile=None):
+
+
+    Input
+    -----
+    inputfile1  name of CaSPAr NetCDF file of first variable, e.g. RDPS or HRDPS forecast
+    variable1   name of first variable
+    inputfile2  name of CaSPAr NetCDF file of second variable, e.g. CaPA analysis
+    variable2   name of second variable
+
+
+    Optional Input
+    --------------
+    onto        grid of the difference: 1: grid of first variable, 2: grid of second variable (default: 2)
+    timesteps   time steps among the common valid times: single index, 'all' or slice 'i:j:k' (default: 'all')
+    method      regridding method of regrid_weights (default: 'bilinear')
+    cache       True: read weights from / write to on-disk cache (default: True)
+    outfile     NetCDF file of the difference; overwritten if existing
+                (default: diff_<key>.nc in cache_dir('compare'))
+
+
+    Output
+    ------
+    xarray.Dataset, opened lazily from outfile, with variable '<variable1>_minus_<variable2>'
+    (time, y, x) on the grid of onto, its coordinates and grid mapping, and attribute 'absmax',
+    the maximum absolute difference
+
+
+    Examples
+    --------
+    # diff = difference_dataset('RDPS_2017100212.nc', 'RDPS_P_PR_SFC', 'CaPA_coarse_2017100212.nc', 'CaPA_coarse_A_PR0_SFC')
+    # plot_caspar(diff, 'RDPS_P_PR_SFC_minus_CaPA_coarse_A_PR0_SFC', pngbase='diff_', timesteps='all',
+    #             cmap=diff_cmap, norm=[-diff.attrs['absmax'], diff.attrs['absmax']])
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - difference written step by step to NetCDF file, opened lazily
+"""
+from __future__ import print_function
+import os
+import hashlib
+import warnings
+import numpy as np
+
+__all__ = ['difference_dataset', 'diff_cmap']
+
+# diverging brewer colour map of differences: brown negative, green positive
+diff_cmap = 'brbg11'
+
+# -------------------------------------------------------------------------------------------------
+
+def difference_dataset(inputfile1, variable1, inputfile2, variable2, onto=2, timesteps='all',
+                       method='bilinear', cache=True, outfile=None):
+    """
+        Difference variable1 - variable2 at common valid times on the grid of variable onto.
+    """
+    import netCDF4 as nc4
+    import xarray as xr
+    from .cache  import cache_dir
+    from .plot   import parse_timesteps
+    from .grid   import grid_fingerprint
+    from .regrid import regrid_weights, regrid
+
+    ds1 = xr.open_dataset(inputfile1)
+    ds2 = xr.open_dataset(inputfile2)
+
+    # common valid times
+    times, it1, it2 = np.intersect1d(ds1['time'].values, ds2['time'].values, return_indices=True)
+    if (times.size == 0):
+        raise ValueError('difference_dataset: no common valid times in '+str(inputfile1)+' and '+str(inputfile2))
+    isel = parse_timesteps(timesteps, times.size)
+    if (ds1[variable1].attrs.get('units', '') != ds2[variable2].attrs.get('units', '')):
+        warnings.warn('difference_dataset: units differ: '+ds1[variable1].attrs.get('units', '')+' and '+
+                      ds2[variable2].attrs.get('units', ''))
+
+    if (onto == 1):
+        tgt, tgtvar, src, srcvar = ds1, variable1, ds2, variable2
+    elif (onto == 2):
+        tgt, tgtvar, src, srcvar = ds2, variable2, ds1, variable1
+    else:
+        raise ValueError('difference_dataset: onto must be 1 or 2: '+str(onto))
+    shape = tgt[tgtvar].shape[-2:]
+    same  = ((src[srcvar].shape[-2:] == shape) and
+             (grid_fingerprint(src['lon'].values, src['lat'].values) == grid_fingerprint(tgt['lon'].values, tgt['lat'].values)))
+    ww    = None if same else regrid_weights(src, srcvar, tgt, tgtvar, method=method, cache=cache)
+
+    # CaSPAr-like file on target grid: coordinates first, difference and grid mapping appended
+    name   = variable1+'_minus_'+variable2
+    ydim, xdim = tgt[tgtvar].dims[-2:]
+    attrs  = {'units': ds1[variable1].attrs.get('units', ''),
+              'long_name': ds1[variable1].attrs.get('long_name', variable1)+' minus '+
+                           ds2[variable2].attrs.get('long_name', variable2)}
+    if ('grid_mapping' in tgt[tgtvar].attrs):
+        attrs['grid_mapping'] = tgt[tgtvar].attrs['grid_mapping']
+    out = xr.Dataset(coords={'time': times[isel]})
+    for cc in ['lon', 'lat', ydim, xdim]:
+        if (cc in tgt.variables):
+            out.coords[cc] = tgt[cc].load()
+    out.attrs = dict(tgt.attrs)
+    if outfile is None:
+        hh = hashlib.sha1()
+        hh.update('\n'.join([os.path.abspath(inputfile1), variable1, os.path.abspath(inputfile2), variable2,
+                             str(onto), str(timesteps), method]).encode('utf-8'))
+        outfile = os.path.join(cache_dir('compare'), 'diff_'+hh.hexdigest()[:16]+'.nc')
+    tmpfile = outfile+'.'+str(os.getpid())+'.tmp'
+    out.to_netcdf(tmpfile)
+
+    # one time step at a time: read both fields, regrid one, write difference
+    absmax = 0.
+    with nc4.Dataset(tmpfile, 'a') as nc:
+        for dd, nn in zip([ydim, xdim], shape):
+            if (dd not in nc.dimensions):
+                nc.createDimension(dd, nn)
+        var = nc.createVariable(name, 'f4', ('time', ydim, xdim), fill_value=np.float32(np.nan),
+                                chunksizes=(1,)+tuple(shape))
+        var.setncatts(attrs)
+        if ('grid_mapping' in attrs) and (attrs['grid_mapping'] in tgt.variables):
+            with nc4.Dataset(tgt.encoding['source']) as tnc:
+                tnc.set_auto_maskandscale(False)
+                gm   = tnc.variables[attrs['grid_mapping']]
+                gvar = nc.createVariable(gm.name, gm.dtype, gm.dimensions)
+                gvar.setncatts(dict([ (aa, gm.getncattr(aa)) for aa in gm.ncattrs() ]))
+                gvar[...] = gm[...]
+        for ii, itime in enumerate(isel):
+            zz = []
+            for ds, vv, it in [(ds1, variable1, it1), (ds2, variable2, it2)]:
+                sel = dict([ (dd, 0) for dd in ds[vv].dims[1:-2] ])   # first level or member if any
+                sel['time'] = it[itime]
+                z = ds[vv].isel(sel).values
+                if (ds is src) and (ww is not None):
+                    z = regrid(ww, z, shape)
+                zz.append(z)
+            diff    = (zz[0] - zz[1]).astype(np.float32)
+            var[ii] = diff
+            if np.any(np.isfinite(diff)):
+                absmax = max(absmax, float(np.nanmax(np.abs(diff))))
+        nc.absmax = absmax
+    ds1.close()
+    ds2.close()
+    os.rename(tmpfile, outfile)
+
+    return xr.open_dataset(outfile)
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
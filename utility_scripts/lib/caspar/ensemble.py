@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""
+    Ensemble mean, spread and exceedance probability of GEPS and REPS forecasts.
+
+    The members are read one at a time, either from the member dimension of one file or from
+    several files (with one member each or with a member dimension each), and reduced with
+    Welford's online algorithm for mean and variance. Only the running statistics of one chunk
+    (a band of grid rows of some time steps) are in memory per process, never all members.
+    The chunks are independent and reduced in parallel by a pool of processes.
+    Members with missing values (NaN) are skipped cell by cell.
+
+
+    Definition
+    ----------
+    def member_dim(ds, variable):
+    def welford_update(count, mean, m2, x):
+    def ensemble_stats(inputfiles, variable, itimes=[0], threshold=None, nprocs=1, chunksize=2**22):
+
+
+    Input
+    -----
+    member_dim
+        ds          xarray dataset
+        variable    name of variable
+    welford_update
+        count       number of valid members per cell so far (int array)
+        mean        running mean per cell (float64 array)
+        m2          running sum of squared deviations from the mean per cell (float64 array)
+        x           field of the next member (same shape; NaN is skipped)
+    ensemble_stats
+        inputfiles  CaSPAr NetCDF file with member dimension or list of files with one member or
+                    a member dimension each
+        variable    name of variable with dimensions (time, [member,] y, x)
+
+
+    Optional Input
+    --------------
+    itimes      time step indexes (default: [0])
+    threshold   probability of exceeding threshold is calculated if given (default: None)
+    nprocs      number of processes reducing spatial chunks in parallel (default: 1; 0: number of cores)
+    chunksize   maximum number of grid cells times time steps per chunk (default: 2**22)
+
+
+    Output
+    ------
+    member_dim      name of member dimension: 'member', 'ensemble', 'realization' or 'number'
+                    if present, else first dimension besides time, y and x; None if there is none
+    welford_update  None; count, mean and m2 are updated in place
+    ensemble_stats  xarray.Dataset like a CaSPAr file with the selected time steps and the variables
+                    <variable>_mean, <variable>_spread (standard deviation of the members) and
+                    <variable>_prob (fraction of members > threshold); attribute 'nmembers'
+
+
+    Examples
+    --------
+    >>> count = np.zeros(3, dtype=np.int32)
+    >>> mean  = np.zeros(3)
+    >>> m2    = np.zeros(3)
+    >>> for x in [[1., 2., np.nan], [3., 2., 5.], [5., 2., np.nan]]:
+    ...     welford_update(count, mean, m2, np.array(x))
+    >>> print(count, mean, np.sqrt(m2[:2]/(count[:2]-1)))
+    [3 3 1] [3. 2. 5.] [2. 0.]
+
+    # stats = ensemble_stats('REPS_2017100200.nc', 'REPS_P_PR_SFC', itimes=[0, 6, 12], threshold=1., nprocs=8)
+    # stats.to_netcdf('REPS_2017100200_stats.nc')
+    # plot_caspar('REPS_2017100200_stats.nc', 'REPS_P_PR_SFC_prob', pngbase='REPS_prob_', timesteps='all')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - chunks bounded over time steps, member dimensions of several files
+"""
+from __future__ import print_function
+import numpy as np
+
+__all__ = ['member_dim', 'welford_update', 'ensemble_stats']
+
+# usual names of member dimensions
+_member_names = ['member', 'ensemble', 'realization', 'number']
+
+# -------------------------------------------------------------------------------------------------
+
+def member_dim(ds, variable):
+    """
+        Name of member dimension of variable; None if it has none.
+    """
+    dims   = ds[variable].dims
+    others = [ dd for dd in dims[:-2] if dd != 'time' ]
+    for dd in others:
+        if dd in _member_names:
+            return dd
+    if (len(others) > 0):
+        return others[0]
+
+    return None
+
+def welford_update(count, mean, m2, x):
+    """
+        Add field x of one member to running count, mean and m2 (in place, NaN skipped).
+    """
+    ok         = np.isfinite(x)
+    count     += ok
+    delta      = np.where(ok, x - mean, 0.)
+    mean      += np.where(ok, delta / np.maximum(count, 1), 0.)
+    m2        += np.where(ok, delta * (x - mean), 0.)
+
+# -------------------------------------------------------------------------------------------------
+
+def _members(inputfiles, variable):
+    """ List of (file, member index or None) of all members; member dimensions of several files are expanded. """
+    import xarray as xr
+    members = []
+    for inputfile in inputfiles:
+        ds   = xr.open_dataset(inputfile)
+        mdim = member_dim(ds, variable)
+        if (mdim is None) and (len(inputfiles) == 1):
+            ds.close()
+            raise ValueError('ensemble_stats: '+variable+' has no member dimension in '+inputfile)
+        if (mdim is None):
+            members.append((inputfile, None))
+        else:
+            members.extend([ (inputfile, im) for im in range(ds.sizes[mdim]) ])
+        ds.close()
+
+    return members
+
+def _chunk_stats(job):
+    """ Statistics of rows job['rows'] and time steps job['times'], reading one member at a time. """
+    import xarray as xr
+
+    y0, y1    = job['rows']
+    t0, t1    = job['times']
+    itimes    = job['itimes'][t0:t1]
+    threshold = job['threshold']
+    shape     = (len(itimes), y1-y0, job['nx'])
+    count     = np.zeros(shape, dtype=np.int32)
+    mean      = np.zeros(shape)
+    m2        = np.zeros(shape)
+    nexceed   = np.zeros(shape, dtype=np.int32) if (threshold is not None) else None
+
+    ds     = None
+    dsfile = ''
+    for inputfile, imember in job['members']:
+        if (inputfile != dsfile):
+            if ds is not None:
+                ds.close()
+            ds     = xr.open_dataset(inputfile)
+            dsfile = inputfile
+        var  = ds[job['variable']]
+        dims = var.dims
+        sel  = { dims[-2]: slice(y0, y1) }
+        mdim = member_dim(ds, job['variable'])
+        for dd in dims[:-2]:
+            if (dd != 'time'):
+                sel[dd] = 0
+        if (imember is not None):
+            sel[mdim] = imember
+        for ii, itime in enumerate(itimes):
+            sel['time'] = itime
+            x = var.isel(sel).values.astype(np.float64)   # one member, one time step, one band of rows
+            welford_update(count[ii], mean[ii], m2[ii], x)
+            if (threshold is not None):
+                nexceed[ii] += (x > threshold)
+    ds.close()
+
+    return job['rows'], job['times'], count, mean, m2, nexceed
+
+# -------------------------------------------------------------------------------------------------
+
+def ensemble_stats(inputfiles, variable, itimes=[0], threshold=None, nprocs=1, chunksize=2**22):
+    """
+        Ensemble mean, spread and exceedance probability of variable streamed member by member.
+    """
+    import xarray as xr
+
+    if isinstance(inputfiles, str):
+        inputfiles = [inputfiles]
+    members = _members(inputfiles, variable)
+
+    # template: grid, coordinates and attributes of first file
+    ds    = xr.open_dataset(inputfiles[0])
+    var   = ds[variable]
+    ydim, xdim = var.dims[-2:]
+    ny, nx     = var.shape[-2:]
+
+    if (nprocs <= 0):
+        import multiprocessing as mp
+        nprocs = mp.cpu_count()
+    # chunks of time steps and bands of rows of at most chunksize cells; at least one chunk per process
+    ntime  = len(itimes)
+    nsteps = max(1, min(ntime, chunksize // nx))
+    nrows  = max(1, min(chunksize // (nsteps * nx), -(-ny // nprocs)))
+    jobs   = [ {'members': members, 'variable': variable, 'itimes': list(itimes), 'threshold': threshold,
+                'times': (t0, min(t0+nsteps, ntime)), 'rows': (y0, min(y0+nrows, ny)), 'nx': nx}
+               for t0 in range(0, ntime, nsteps) for y0 in range(0, ny, nrows) ]
+    nprocs = min(nprocs, len(jobs))
+
+    if (nprocs > 1):
+        import multiprocessing as mp
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        results = pool.imap_unordered(_chunk_stats, jobs, chunksize=1)
+    else:
+        pool    = None
+        results = map(_chunk_stats, jobs)
+
+    shape  = (len(itimes), ny, nx)
+    mean   = np.full(shape, np.nan, dtype=np.float32)
+    spread = np.full(shape, np.nan, dtype=np.float32)
+    prob   = np.full(shape, np.nan, dtype=np.float32) if (threshold is not None) else None
+    for (y0, y1), (t0, t1), count, cmean, m2, nexceed in results:
+        valid = count > 0
+        mean[t0:t1,y0:y1]   = np.where(valid, cmean, np.nan)
+        spread[t0:t1,y0:y1] = np.where(count > 1, np.sqrt(m2 / np.maximum(count-1, 1)), np.nan)
+        if (threshold is not None):
+            prob[t0:t1,y0:y1] = np.where(valid, nexceed / np.maximum(count, 1.), np.nan)
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    # CaSPAr-like dataset of the statistics
+    dims   = ('time', ydim, xdim)
+    unit   = var.attrs.get('units', '')
+    lname  = var.attrs.get('long_name', variable)
+    attrs  = dict([ (kk, var.attrs[kk]) for kk in ['grid_mapping'] if kk in var.attrs ])
+    stats  = {variable+'_mean':   (dims, mean,   dict(attrs, units=unit, long_name='Ensemble mean of '+lname)),
+              variable+'_spread': (dims, spread, dict(attrs, units=unit, long_name='Ensemble spread of '+lname))}
+    if (threshold is not None):
+        stats[variable+'_prob'] = (dims, prob, dict(attrs, units='1', threshold=threshold,
+                                                    long_name='Probability of '+lname+' > {:g}'.format(threshold)))
+    out = xr.Dataset(stats, coords={'time': ds['time'].values[list(itimes)]})
+    for cc in ['lon', 'lat', ydim, xdim]:
+        if (cc in ds.variables):
+            out.coords[cc] = ds[cc]
+    if ('grid_mapping' in attrs) and (attrs['grid_mapping'] in ds.variables):
+        out[attrs['grid_mapping']] = ds[attrs['grid_mapping']]
+    out.attrs = dict(ds.attrs)
+    out.attrs['nmembers'] = len(members)
+    ds.close()
+
+    return out
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+"""
+    Geometry of CaSPAr grids: cell centres, cell corners (boundaries) and a grid fingerprint.
+
+    1D longitudes and latitudes are expanded to 2D with broadcast views (no copies).
+    On regular grids, cell corners are the usual half-way boundaries, extrapolated at the outer
+    edges and with latitudes limited to the poles. On curvilinear grids, e.g. rotated RDPS and
+    HRDPS, cell corners are the means of the four surrounding cell centres taken as unit vectors
+    on the sphere (outer corners extrapolated linearly), so that cells across the date line and
+    around the pole keep their size. Their longitudes are given within 180 degree of the
+    neighbouring cell centre, i.e. in the longitude range of the input.
+    Corners keep the floating point precision of the input coordinates.
+
+    The geometry of each grid is stored on disk (cache_dir('grid')) in an npz file named
+    after the grid fingerprint and the version of the corner algorithm (corners_version)
+    so that later runs on the same product grid only load it.
+
+
+    Definition
+    ----------
+    def grid_fingerprint(lon, lat):
+    def cell_centres(lon, lat):
+    def cell_corners(lon, lat):
+    def grid_geometry(lon, lat, cache=True):
+
+
+    Input
+    -----
+    lon, lat   1D (nlon), (nlat) or 2D (nlat,nlon) longitudes and latitudes of cell centres
+
+
+    Optional Input
+    --------------
+    grid_geometry
+        cache      True: read from / write to on-disk cache and keep the last ngeometries (8) grids
+                   in memory of the process (default: True)
+
+
+    Output
+    ------
+    grid_fingerprint  hex string identifying the grid (shape, dtype and coordinate values)
+    cell_centres      2D lon, lat (nlat,nlon); read-only broadcast views for 1D input
+    cell_corners      2D lonh, lath (nlat+1,nlon+1)
+    grid_geometry     dictionary with 'lon', 'lat', 'lonh', 'lath' and 'fingerprint'
+
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> lonh, lath = cell_corners(np.array([0., 1., 2.]), np.array([10., 12.]))
+    >>> print(lonh[0,:])
+    [-0.5  0.5  1.5  2.5]
+
+    >>> print(lath[:,0])
+    [ 9. 11. 13.]
+
+    >>> lon, lat = cell_centres(np.array([0., 1., 2.]), np.array([10., 12.]))
+    >>> lonh2, lath2 = cell_corners(lon, lat)
+    >>> print(np.all(lonh2 == lonh), np.all(lath2 == lath))
+    True True
+
+    >>> print(grid_fingerprint(lon, lat) == grid_fingerprint(np.array([0., 1., 2.]), np.array([10., 12.])))
+    True
+
+    Cells across the date line
+    >>> lon, lat = np.meshgrid(np.array([178., 180., -178.]), np.array([10., 12.]))
+    >>> lonh, lath = cell_corners(lon+0.1*lat, lat)
+    >>> print(np.round(lonh[1,:], 2))
+    [ 178.1  180.1  182.1 -175.9]
+    >>> print(np.round(np.mod(np.diff(lonh[1,:]), 360.), 2))
+    [2. 2. 2.]
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026 - from cell boundaries lonh, lath of plot_CaSPAr_data.py
+    Modified, JM, Oct 2026 - corners of curvilinear grids from unit vectors, corners_version in cache file name
+    Modified, JM, Oct 2026 - ValueError for grids of only one row or column
+"""
+from __future__ import print_function
+import os
+import hashlib
+import numpy as np
+
+__all__ = ['grid_fingerprint', 'cell_centres', 'cell_corners', 'grid_geometry', 'corners_version']
+
+# version of the cell corner algorithm; part of the names of cached corners
+corners_version = 2
+
+# grid geometries kept in memory per process, e.g. in the render server
+ngeometries = 8
+_geometries = {}
+
+# -------------------------------------------------------------------------------------------------
+
+def _edges1d(x):
+    """ Boundaries of 1D cell centres x, extrapolated at both ends. """
+    e = np.empty(x.shape[0]+1, dtype=x.dtype)
+    e[1:-1] = 0.5*(x[:-1] + x[1:])
+    e[0]    = x[0]  - 0.5*(x[1]  - x[0])
+    e[-1]   = x[-1] + 0.5*(x[-1] - x[-2])
+
+    return e
+
+def _pad2d(x):
+    """ 2D field x extended by one linearly extrapolated row and column on every side. """
+    ny, nx = x.shape
+    p = np.empty((ny+2, nx+2), dtype=x.dtype)
+    p[1:-1,1:-1] = x
+    p[0,1:-1]    = 2.*x[0,:]  - x[1,:]
+    p[-1,1:-1]   = 2.*x[-1,:] - x[-2,:]
+    p[:,0]       = 2.*p[:,1]  - p[:,2]
+    p[:,-1]      = 2.*p[:,-2] - p[:,-3]
+
+    return p
+
+def _corners2d(x):
+    """ Corners of 2D cell centres x: mean of the four neighbouring centres of the linearly extrapolated field. """
+    p = _pad2d(x)
+
+    return 0.25*(p[:-1,:-1] + p[1:,:-1] + p[:-1,1:] + p[1:,1:])
+
+def _sphere_corners2d(lon, lat):
+    """ Corners of 2D cell centres lon, lat: mean of the unit vectors of the four neighbouring centres. """
+    lam = np.deg2rad(lon.astype(np.float64))
+    phi = np.deg2rad(lat.astype(np.float64))
+    cc  = np.stack([ _corners2d(xx) for xx in [np.cos(phi)*np.cos(lam), np.cos(phi)*np.sin(lam), np.sin(phi)] ],
+                   axis=-1)
+    cc /= np.linalg.norm(cc, axis=-1)[...,np.newaxis]
+    lonh = np.rad2deg(np.arctan2(cc[...,1], cc[...,0]))
+    lath = np.rad2deg(np.arcsin(np.clip(cc[...,2], -1., 1.)))
+    # longitudes within 180 degree of the neighbouring (extrapolated) cell centre
+    ref  = _pad2d(lon.astype(np.float64))[:-1,:-1]
+    lonh = ref + np.mod(lonh - ref + 180., 360.) - 180.
+
+    return lonh.astype(lon.dtype), lath.astype(lat.dtype)
+
+def _regular(lon, lat):
+    """ True if 2D lon, lat are the same along columns and rows, respectively. """
+    return bool(np.all(lat == lat[:,:1]) and np.all(lon == lon[:1,:]))
+
+def _geometry_file(fingerprint):
+    """ Name of the on-disk cache file of the grid geometry. """
+    from .cache import cache_dir
+    return os.path.join(cache_dir('grid'), '{:s}_c{:d}.npz'.format(fingerprint, corners_version))
+
+def _keep_geometry(geometry):
+    """ Keep geometry in memory of the process; only the last ngeometries grids. """
+    if len(_geometries) >= ngeometries:
+        del _geometries[next(iter(_geometries))]
+    _geometries[geometry['fingerprint']] = geometry
+
+    return geometry
+
+def _float(x):
+    """ Coordinates as floating point array keeping single precision. """
+    x = np.asarray(x)
+    return x.astype(np.result_type(x.dtype, np.float32), copy=False)
+
+# -------------------------------------------------------------------------------------------------
+
+def grid_fingerprint(lon, lat):
+    """
+        Hex fingerprint of the grid given by its cell centres.
+        1D and the equivalent 2D coordinates give the same fingerprint.
+    """
+    lon, lat = cell_centres(lon, lat)
+    hh = hashlib.sha1()
+    hh.update(str((lon.shape, lon.dtype.str, lat.dtype.str)).encode('ascii'))
+    hh.update(np.ascontiguousarray(lon).view(np.uint8))
+    hh.update(np.ascontiguousarray(lat).view(np.uint8))
+
+    return hh.hexdigest()
+
+# -------------------------------------------------------------------------------------------------
+
+def cell_centres(lon, lat):
+    """
+        2D longitudes and latitudes of cell centres; 1D input gives broadcast views.
+    """
+    lon = _float(lon)
+    lat = _float(lat)
+    if (lon.ndim == 1) and (lat.ndim == 1):
+        shape = (lat.shape[0], lon.shape[0])
+        lon = np.broadcast_to(lon[np.newaxis,:], shape)
+        lat = np.broadcast_to(lat[:,np.newaxis], shape)
+    elif (lon.ndim == 2) and (lat.ndim == 2):
+        if lon.shape != lat.shape:
+            raise ValueError('cell_centres: 2D lon and lat must have the same shape.')
+    else:
+        raise ValueError('cell_centres: lon and lat has to be either 1D or 2D')
+
+    return lon, lat
+
+# -------------------------------------------------------------------------------------------------
+
+def cell_corners(lon, lat):
+    """
+        2D longitudes and latitudes of cell corners (nlat+1,nlon+1).
+    """
+    lon = _float(lon)
+    lat = _float(lat)
+    if (min(lon.shape + lat.shape) < 2):
+        raise ValueError('cell_corners: grid needs at least two cells along each axis: '+str((lon.shape, lat.shape)))
+    if (lon.ndim == 2) and (lat.ndim == 2) and (lon.shape == lat.shape) and _regular(lon, lat):
+        lon, lat = lon[0,:], lat[:,0]
+    if (lon.ndim == 1) and (lat.ndim == 1):
+        lonh = _edges1d(lon)
+        lath = np.clip(_edges1d(lat), -90., 90.)
+        shape = (lath.shape[0], lonh.shape[0])
+        lonh = np.broadcast_to(lonh[np.newaxis,:], shape)
+        lath = np.broadcast_to(lath[:,np.newaxis], shape)
+    else:
+        lon, lat   = cell_centres(lon, lat)
+        lonh, lath = _sphere_corners2d(lon, lat)
+
+    return lonh, lath
+
+# -------------------------------------------------------------------------------------------------
+
+def grid_geometry(lon, lat, cache=True):
+    """
+        Cell centres, cell corners and fingerprint of a grid, from the on-disk cache if possible.
+    """
+    lon, lat    = cell_centres(lon, lat)
+    fingerprint = grid_fingerprint(lon, lat)
+
+    if cache:
+        if fingerprint in _geometries:
+            return _geometries[fingerprint]
+        from .cache import save_npz
+        cfile = _geometry_file(fingerprint)
+        if os.path.exists(cfile):
+            with np.load(cfile) as ff:
+                geometry = {'lon': ff['lon'], 'lat': ff['lat'], 'lonh': ff['lonh'], 'lath': ff['lath'],
+                            'fingerprint': fingerprint}
+            return _keep_geometry(geometry)
+
+    lonh, lath = cell_corners(lon, lat)
+    geometry   = {'lon': lon, 'lat': lat, 'lonh': lonh, 'lath': lath, 'fingerprint': fingerprint}
+    if cache:
+        save_npz(cfile, lon=lon, lat=lat, lonh=lonh, lath=lath, fingerprint=fingerprint)
+        _keep_geometry(geometry)
+
+    return geometry
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+    Lazy selection of time steps, levels and a lat/lon bounding box in CaSPAr datasets.
+
+    The selection is done with isel on the lazily opened dataset, i.e. before any data of the
+    variable is read. Only the HDF5 chunks of the selected hyperslab are later decompressed
+    when the data are accessed, e.g. with ds[variable][itime].values.
+
+
+    Definition
+    ----------
+    def parse_bbox(bbox):
+    def select_hyperslab(ds, variable, time=None, level=None, bbox=None):
+    def peak_rss():
+
+
+    Input
+    -----
+    parse_bbox
+        bbox      'lonmin,latmin,lonmax,latmax' as string or sequence of 4 numbers [degree]
+    select_hyperslab
+        ds        lazily opened xarray dataset, e.g. xr.open_dataset(inputfile)
+        variable  name of variable with dimensions (time, [level,] y, x)
+
+
+    Optional Input
+    --------------
+    select_hyperslab
+        time      time step as index (int or string of int) or ISO datetime '2017-10-02T18:00'
+                  (default: None, i.e. all time steps)
+        level     index of level if variable has a dimension between time and y, x
+                  (default: None, i.e. first level)
+        bbox      bounding box 'lonmin,latmin,lonmax,latmax' (see parse_bbox);
+                  longitudes can be given in -180..180 or 0..360
+                  (default: None, i.e. whole domain)
+
+
+    Output
+    ------
+    parse_bbox        list [lonmin, latmin, lonmax, latmax]
+    select_hyperslab  lazy dataset with the selected hyperslab of variable and the matching lon, lat;
+                      variable has dimensions (time, y, x)
+    peak_rss          peak resident set size of the current process [MB]
+
+
+    Examples
+    --------
+    >>> print(parse_bbox('-80,40,-70,50'))
+    [-80.0, 40.0, -70.0, 50.0]
+
+    >>> print(_in_lon(np.array([350., 10., 20., 190.]), -20., 15.))
+    [ True  True False False]
+
+    # ds = xr.open_dataset('HRDPS_2017100212.nc')
+    # ds = select_hyperslab(ds, 'HRDPS_P_PR_SFC', time='2017-10-02T18:00', bbox='-80,40,-70,50')
+    # zz = ds['HRDPS_P_PR_SFC'][0].values    # reads only the chunks of one time step in the box
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - renamed select.py to hyperslab.py, which does not shadow the standard module select
+    Modified, JM, Oct 2026 - reject bounding boxes of only one row or column
+"""
+from __future__ import print_function
+import sys
+import numpy as np
+
+__all__ = ['parse_bbox', 'select_hyperslab', 'peak_rss']
+
+# -------------------------------------------------------------------------------------------------
+
+def _in_lon(lon, lonmin, lonmax):
+    """ Mask of longitudes within [lonmin, lonmax] independent of -180..180 or 0..360 convention. """
+    if (lonmax - lonmin) >= 360.:
+        return np.ones(np.shape(lon), dtype=bool)
+
+    return np.mod(lon - lonmin, 360.) <= np.mod(lonmax - lonmin, 360.)
+
+def _index_slice(mask):
+    """ Slice from first to last True of 1D mask. """
+    ii = np.nonzero(mask)[0]
+
+    return slice(int(ii[0]), int(ii[-1])+1)
+
+# -------------------------------------------------------------------------------------------------
+
+def parse_bbox(bbox):
+    """
+        Bounding box [lonmin, latmin, lonmax, latmax] from string 'lonmin,latmin,lonmax,latmax' or sequence.
+    """
+    if isinstance(bbox, str):
+        bbox = bbox.split(',')
+    bbox = [ float(bb) for bb in bbox ]
+    if (len(bbox) != 4):
+        raise ValueError('parse_bbox: bounding box must be lonmin,latmin,lonmax,latmax: '+str(bbox))
+    if (bbox[1] > bbox[3]):
+        raise ValueError('parse_bbox: latmin > latmax: '+str(bbox))
+
+    return bbox
+
+# -------------------------------------------------------------------------------------------------
+
+def select_hyperslab(ds, variable, time=None, level=None, bbox=None):
+    """
+        Lazy selection of time step, level and bounding box of variable in dataset with isel.
+    """
+    dims   = ds[variable].dims
+    ydim   = dims[-2]
+    xdim   = dims[-1]
+    others = [ dd for dd in dims[:-2] if dd != 'time' ]
+
+    sel = {}
+
+    # time
+    if (time is not None):
+        try:
+            sel['time'] = [int(time)]
+        except ValueError:
+            times = ds['time'].values
+            itime = np.nonzero(times == np.datetime64(time).astype(times.dtype))[0]
+            if (itime.size == 0):
+                raise ValueError('select_hyperslab: time '+str(time)+' not in file: '+
+                                 str(times[0])+' to '+str(times[-1]))
+            sel['time'] = [int(itime[0])]
+
+    # level
+    if (len(others) > 0):
+        sel[others[0]] = 0 if (level is None) else int(level)
+    elif (level is not None):
+        raise ValueError('select_hyperslab: variable has no level dimension: '+variable+' '+str(dims))
+
+    # bounding box
+    if (bbox is not None):
+        lonmin, latmin, lonmax, latmax = parse_bbox(bbox)
+        lon = ds['lon'].values
+        lat = ds['lat'].values
+        if (np.ndim(lon) == 1):
+            inlon = _in_lon(lon, lonmin, lonmax)
+            inlat = (lat >= latmin) & (lat <= latmax)
+            ydim  = ds['lat'].dims[0]
+            xdim  = ds['lon'].dims[0]
+        else:
+            inbox = _in_lon(lon, lonmin, lonmax) & (lat >= latmin) & (lat <= latmax)
+            inlat = np.any(inbox, axis=1)
+            inlon = np.any(inbox, axis=0)
+        if (not np.any(inlon)) or (not np.any(inlat)):
+            raise ValueError('select_hyperslab: bounding box does not intersect grid: '+str(bbox))
+        sel[ydim] = _index_slice(inlat)
+        sel[xdim] = _index_slice(inlon)
+        # cell corners need at least two cells per axis
+        if (sel[ydim].stop - sel[ydim].start < 2) or (sel[xdim].stop - sel[xdim].start < 2):
+            raise ValueError('select_hyperslab: bounding box covers only one row or column of the grid, '
+                             'enlarge it: '+str(bbox))
+
+    if (len(sel) == 0):
+        return ds
+
+    return ds.isel(sel)
+
+# -------------------------------------------------------------------------------------------------
+
+def peak_rss():
+    """
+        Peak resident set size of the current process in MB.
+    """
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if (sys.platform == 'darwin'):
+        return rss / 1024.**2   # bytes
+    else:
+        return rss / 1024.      # kilobytes
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
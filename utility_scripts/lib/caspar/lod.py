@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+    Level of detail: reduce a grid to the pixel resolution of the output before rendering.
+
+    Many grid cells of the fine products (e.g. HRDPS, CaLDAS) fall onto a single pixel of the
+    map panel. The field is therefore block-reduced by integer factors so that about one block
+    covers one output pixel. Centres of the blocks are the means of the cell centres and the
+    block boundaries are every fy-th and fx-th cell boundary, i.e. lonh/lath (or their map
+    coordinates) are coarsened consistently with the field. The number of cells handed to
+    matplotlib then depends on the output size only, not on the resolution of the product.
+
+
+    Definition
+    ----------
+    def lod_factors(xx, yy, sub, map, dpi):
+    def block_reduce(zz, fy, fx, how='mean'):
+    def coarsen_corners(xxh, fy, fx):
+
+
+    Input
+    -----
+    lod_factors
+        xx, yy     2D map coordinates of cell centres
+        sub        matplotlib axes of the map
+        map        Basemap instance
+        dpi        resolution of the output [dots per inch]
+    block_reduce
+        zz         2D field (ny,nx)
+        fy, fx     block size in y and x direction
+    coarsen_corners
+        xxh        2D cell boundaries (ny+1,nx+1)
+        fy, fx     block size in y and x direction
+
+
+    Optional Input
+    --------------
+    block_reduce
+        how        'mean':    mean of valid cells in block (default)
+                   'max':     maximum of valid cells in block
+                   'nearest': cell in the middle of the block
+
+
+    Output
+    ------
+    lod_factors      block size fy, fx (>= 1) so that a block is about one pixel of the output
+    block_reduce     reduced field (ceil(ny/fy),ceil(nx/fx)); incomplete blocks at the end are kept
+    coarsen_corners  reduced cell boundaries (ceil(ny/fy)+1,ceil(nx/fx)+1)
+
+
+    Examples
+    --------
+    >>> zz = np.arange(20.).reshape(4,5)
+    >>> print(block_reduce(zz, 2, 2))
+    [[ 3.   5.   6.5]
+     [13.  15.  16.5]]
+
+    >>> print(block_reduce(zz, 2, 2, how='max'))
+    [[ 6.  8.  9.]
+     [16. 18. 19.]]
+
+    >>> print(block_reduce(zz, 2, 2, how='nearest'))
+    [[ 6.  8.  9.]
+     [16. 18. 19.]]
+
+    >>> print(coarsen_corners(np.arange(30.).reshape(5,6), 2, 2))
+    [[ 0.  2.  4.  5.]
+     [12. 14. 16. 17.]
+     [24. 26. 28. 29.]]
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import warnings
+import numpy as np
+
+__all__ = ['lod_modes', 'lod_factors', 'block_reduce', 'coarsen_corners']
+
+# block reductions of block_reduce
+lod_modes = ['mean', 'max', 'nearest']
+
+# -------------------------------------------------------------------------------------------------
+
+def _blocks(n, f):
+    """ Start indexes of blocks of size f in 0..n plus end n. """
+    return np.append(np.arange(0, n, f), n)
+
+def _cell_size(xx, yy, axis):
+    """ Median distance between neighbouring cell centres along axis (every 8th row/column). """
+    if (axis == 0):
+        xx, yy = xx[:,::8], yy[:,::8]
+    else:
+        xx, yy = xx[::8,:], yy[::8,:]
+    dd = np.hypot(np.diff(xx, axis=axis), np.diff(yy, axis=axis))
+    dd = dd[np.isfinite(dd) & (dd > 0.)]
+    if (dd.size == 0):
+        return np.inf
+
+    return np.median(dd)
+
+# -------------------------------------------------------------------------------------------------
+
+def lod_factors(xx, yy, sub, map, dpi):
+    """
+        Block size (fy, fx) so that one block is about one output pixel of the map panel.
+    """
+    fig    = sub.get_figure()
+    pos    = sub.get_position()
+    width  = pos.width  * fig.get_figwidth()  * dpi   # pixels
+    height = pos.height * fig.get_figheight() * dpi
+    # map keeps aspect ratio, i.e. the larger ratio determines the size of one pixel
+    pixel  = max((map.urcrnrx - map.llcrnrx) / width, (map.urcrnry - map.llcrnry) / height)
+
+    fy = max(1, int(pixel / _cell_size(xx, yy, 0)))
+    fx = max(1, int(pixel / _cell_size(xx, yy, 1)))
+
+    return fy, fx
+
+# -------------------------------------------------------------------------------------------------
+
+def block_reduce(zz, fy, fx, how='mean'):
+    """
+        Reduce 2D field by blocks of fy x fx cells with mean, max or nearest (middle) cell.
+    """
+    ny, nx = np.shape(zz)
+    if (how == 'nearest'):
+        iy = np.minimum(_blocks(ny, fy)[:-1] + fy//2, ny-1)
+        ix = np.minimum(_blocks(nx, fx)[:-1] + fx//2, nx-1)
+        return np.asarray(zz)[np.ix_(iy, ix)]
+
+    my = -(-ny // fy)
+    mx = -(-nx // fx)
+    pp = np.full((my*fy, mx*fx), np.nan, dtype=np.result_type(np.asarray(zz).dtype, np.float32))
+    pp[:ny,:nx] = zz
+    pp = pp.reshape(my, fy, mx, fx)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)   # all-NaN blocks
+        if (how == 'mean'):
+            return np.nanmean(pp, axis=(1,3))
+        elif (how == 'max'):
+            return np.nanmax(pp, axis=(1,3))
+        else:
+            raise ValueError('block_reduce: how must be one of '+', '.join(lod_modes)+': '+str(how))
+
+# -------------------------------------------------------------------------------------------------
+
+def coarsen_corners(xxh, fy, fx):
+    """
+        Cell boundaries of the blocks of block_reduce: every fy-th and fx-th boundary plus the last.
+    """
+    ny, nx = np.shape(xxh)
+
+    return np.asarray(xxh)[np.ix_(_blocks(ny-1, fy), _blocks(nx-1, fx))]
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
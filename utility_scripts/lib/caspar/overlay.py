@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""
+    Cached coastline overlays of the maps of the CaSPAr products.
+
+    Basemap projects and clips all coastlines of its resolution when it is created, which takes
+    seconds for the finer resolutions, and every saved frame draws all their vertices again.
+    Here the coastline detail is chosen from the extent of the map, so that continental maps
+    only carry coarse coastlines, and the coastlines are cached at two levels:
+
+        segments  projected and clipped coastline segments per (projection, extent, resolution),
+                  stored as npz in cache_dir('coast'); drawn as one LineCollection (vector)
+        layer     coastlines rendered once per (projection, extent, resolution, figure size,
+                  axes position, dpi) as transparent layer (alpha channel), stored as npy in
+                  cache_dir('coast'); composited as image onto every frame
+
+    The raster layer is meant for PNG output at a fixed dpi. PDF and screen output use the
+    vector segments, which stay sharp at any zoom.
+
+
+    Definition
+    ----------
+    def coast_resolution(map):
+    def coast_segments(map, resolution, cache=True):
+    def coast_layer(map, sub, dpi, resolution, linewidth=1., cache=True):
+    def draw_coastlines(map, sub, dpi=None, resolution=None, linewidth=1., color='k', cache=True):
+
+
+    Input
+    -----
+    map          Basemap instance (of get_basemap or get_rotated_basemap)
+    resolution   Basemap coastline resolution 'c', 'l', 'i', 'h' or 'f'
+    sub          matplotlib axes of the map
+    dpi          resolution of the PNG output [dots per inch]
+
+
+    Optional Input
+    --------------
+    draw_coastlines
+        dpi         resolution of PNG output: coastlines as cached raster layer;
+                    None: coastlines as vector LineCollection (default: None)
+        resolution  coastline resolution (default: None, i.e. coast_resolution(map))
+        color       colour of coastlines (default: 'k')
+    coast_layer, draw_coastlines
+        linewidth   line width of coastlines [points] (default: 1.)
+    coast_segments, coast_layer, draw_coastlines
+        cache       True: read from / write to on-disk cache (default: True)
+
+
+    Output
+    ------
+    coast_resolution  coarsest resolution of the coastlines appropriate for the map extent,
+                      limited to the resolutions installed with Basemap
+    coast_segments    list of (n,2) arrays of map coordinates of coastline segments
+    coast_layer       uint8 alpha channel (ny,nx) of the coastlines in the pixels of sub; first row is the top
+    draw_coastlines   matplotlib artist (AxesImage or LineCollection)
+
+
+    Examples
+    --------
+    # map, parallels, meridians = get_basemap('RDPS')
+    # print(coast_resolution(map))
+    # c
+    # draw_coastlines(map, sub, dpi=600)
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import os
+import hashlib
+import numpy as np
+
+__all__ = ['coast_resolution', 'coast_segments', 'coast_layer', 'draw_coastlines']
+
+# coarsest resolution for maps with a longer side of at least this many km
+_resolutions = [(10000., 'c'), (3000., 'l'), (800., 'i'), (200., 'h'), (0., 'f')]
+
+# segments and layers already used in this process
+_coasts = {}
+
+# -------------------------------------------------------------------------------------------------
+
+def _map_key(map, *args):
+    """ Hex key of projection parameters, map corners and further arguments. """
+    projparams = sorted([ (kk, str(vv)) for kk, vv in map.projparams.items() ])
+    corners    = [ repr(float(cc)) for cc in (map.llcrnrx, map.llcrnry, map.urcrnrx, map.urcrnry) ]
+    hh = hashlib.sha1()
+    hh.update(str((projparams, corners) + args).encode('ascii'))
+
+    return hh.hexdigest()
+
+def _installed(resolution):
+    """ True if the coastline data of resolution are installed with Basemap. """
+    from mpl_toolkits.basemap import basemap_datadir
+    return os.path.exists(os.path.join(basemap_datadir, 'gshhs_'+resolution+'.dat'))
+
+# -------------------------------------------------------------------------------------------------
+
+def coast_resolution(map):
+    """
+        Coastline resolution from the extent of the map, limited to installed resolutions.
+    """
+    size = max(map.urcrnrx - map.llcrnrx, map.urcrnry - map.llcrnry)
+    if (map.projection in ['cyl', 'rotpole']):
+        size *= 111.2        # degree to km
+    else:
+        size *= 0.001        # m to km
+    levels = [ rr for ss, rr in _resolutions ]
+    ires   = [ size >= ss for ss, rr in _resolutions ].index(True)
+    # finest installed resolution not finer than needed
+    for rr in levels[ires::-1]:
+        if _installed(rr):
+            return rr
+
+    return levels[0]
+
+def coast_segments(map, resolution, cache=True):
+    """
+        Projected and clipped coastline segments of map at resolution, from the on-disk cache if possible.
+    """
+    key = _map_key(map, resolution)
+    if key in _coasts:
+        return _coasts[key]
+
+    if cache:
+        from .cache import cache_dir, save_npz
+        cfile = os.path.join(cache_dir('coast'), key+'_segments.npz')
+        if os.path.exists(cfile):
+            with np.load(cfile) as ff:
+                _coasts[key] = np.split(ff['xy'], ff['offsets'][1:-1])
+            return _coasts[key]
+
+    if (resolution == map.resolution):
+        segments = map.coastsegs
+    else:
+        from mpl_toolkits.basemap import Basemap
+        from .products import _basemap_kwargs
+        if id(map) not in _basemap_kwargs:
+            raise ValueError('coast_segments: map not created by get_basemap or get_rotated_basemap; '
+                             'resolution must be map.resolution: '+str(map.resolution))
+        segments = Basemap(**dict(_basemap_kwargs[id(map)], resolution=resolution)).coastsegs
+    segments = [ np.asarray(ss, dtype=np.float64).reshape(-1, 2) for ss in segments ]
+    if cache:
+        offsets = np.cumsum([0] + [ ss.shape[0] for ss in segments ])
+        xy      = np.concatenate(segments) if (len(segments) > 0) else np.empty((0, 2))
+        save_npz(cfile, xy=xy, offsets=offsets)
+    _coasts[key] = segments
+
+    return segments
+
+def coast_layer(map, sub, dpi, resolution, linewidth=1., cache=True):
+    """
+        Alpha channel of the coastlines of map rendered in the pixels of axes sub at dpi, cached.
+    """
+    fig      = sub.get_figure()
+    position = tuple([ round(pp, 6) for pp in sub.get_position(original=True).bounds ])
+    figsize  = tuple([ round(ff, 6) for ff in fig.get_size_inches() ])
+    key      = _map_key(map, resolution, figsize, position, float(dpi), float(linewidth))
+    if key in _coasts:
+        return _coasts[key]
+
+    if cache:
+        from .cache import cache_dir, save_npy
+        cfile = os.path.join(cache_dir('coast'), key+'_layer.npy')
+        if os.path.exists(cfile):
+            _coasts[key] = np.load(cfile)
+            return _coasts[key]
+
+    # same figure size, axes position and map limits as sub, in a figure without pyplot
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    lfig   = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(lfig)
+    lfig.patch.set_alpha(0.)
+    ax     = lfig.add_axes(position)
+    ax.add_collection(LineCollection(coast_segments(map, resolution, cache=cache), colors='k',
+                                     linewidths=linewidth, antialiaseds=True))
+    ax.set_xlim((map.llcrnrx, map.urcrnrx))
+    ax.set_ylim((map.llcrnry, map.urcrnry))
+    ax.set_aspect('equal' if map.fix_aspect else 'auto', anchor=map.anchor)
+    ax.set_axis_off()
+    canvas.draw()
+    rgba   = np.asarray(canvas.buffer_rgba())
+    bbox   = ax.get_window_extent()
+    ny     = rgba.shape[0]
+    x0, x1 = int(round(bbox.x0)), int(round(bbox.x1))
+    y0, y1 = int(round(bbox.y0)), int(round(bbox.y1))
+    layer  = np.ascontiguousarray(rgba[ny-y1:ny-y0,x0:x1,3])
+    if cache:
+        save_npy(cfile, layer)
+    _coasts[key] = layer
+
+    return layer
+
+# -------------------------------------------------------------------------------------------------
+
+def draw_coastlines(map, sub, dpi=None, resolution=None, linewidth=1., color='k', cache=True):
+    """
+        Draw coastlines of map in axes sub: cached raster layer if dpi is given, else vector segments.
+    """
+    if resolution is None:
+        resolution = coast_resolution(map)
+
+    if dpi is None:
+        from matplotlib.collections import LineCollection
+        coastlines = LineCollection(coast_segments(map, resolution, cache=cache), colors=color,
+                                    linewidths=linewidth, antialiaseds=True)
+        coastlines.set_label('_nolabel_')
+        sub.add_collection(coastlines)
+    else:
+        import matplotlib as mpl
+        alpha = coast_layer(map, sub, dpi, resolution, linewidth=linewidth, cache=cache)
+        rgba  = np.empty(alpha.shape+(4,), dtype=np.uint8)
+        rgba[...,:3] = np.round(np.array(mpl.colors.to_rgb(color))*255.)
+        rgba[...,3]  = alpha
+        # above the field like the LineCollection (zorder 2)
+        coastlines = sub.imshow(rgba, extent=(map.llcrnrx, map.urcrnrx, map.llcrnry, map.urcrnry), origin='upper',
+                                interpolation='nearest', aspect='equal' if map.fix_aspect else 'auto', zorder=2)
+    map.set_axes_limits(ax=sub)
+
+    return coastlines
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
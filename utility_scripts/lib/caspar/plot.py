@@ -0,0 +1,654 @@
+#!/usr/bin/env python
+"""
+    Plots one variable of a CaSPAr NetCDF file on a map with colour bar.
+
+    The figure, the Basemap, the cell boundaries and the projected coordinates are set up
+    only once per call; every time step then only updates the data, the colour limits and
+    the title of the map before it is written to PNG or PDF (or shown on screen).
+
+    Coastlines have a detail appropriate for the map extent. In PNG output they are rendered only
+    once per projection, extent, figure size and dpi and composited onto every frame as cached
+    transparent layer (see caspar.overlay).
+
+    In PDF output, the field is rasterised at rasterdpi while coastlines, graticules, labels and
+    colour bar stay vector graphics, so that every page holds one image of the field instead of
+    one vector path per grid cell. With the matplotlib versions in pdf_flush_versions, whose
+    PdfFile keeps all images in memory until the file is closed, the images of every page are
+    written to the PDF file as soon as the page is saved, so that memory does not grow with the
+    number of pages (flush_pdf = False switches this off). Other versions write the images
+    only when the PDF file is closed.
+
+    Fields on rotated latitude-longitude grids (e.g. RDPS, HRDPS, CaPA) can be drawn natively with
+    engine 'native': the map is then the rotated-pole projection of the grid, the field is a
+    regular image in rotated coordinates and only coastlines and graticules are transformed,
+    so that no cell of the grid is reprojected.
+
+    The stages open, edges, map, projection, read, draw and savefig are marked for
+    profiling with caspar.stages.stage (see enable_profile).
+
+
+    Definition
+    ----------
+    def set_plot_style(outtype='x', usetex=False):
+    def parse_timesteps(timesteps, ntime):
+    def colour_lut():
+    def draw_field(map, sub, engine, xx, yy, xxh, yyh, zz, cmap):
+    def plot_caspar(inputfile, variable, pngbase='', pdffile='', timesteps='0', usetex=False,
+                    engine='auto', seltime=None, level=None, bbox=None, lod='none', norm=None,
+                    rasterdpi=150, cmap=None, verbose=True):
+
+
+    Input
+    -----
+    set_plot_style
+        None
+    colour_lut
+        None
+    parse_timesteps
+        timesteps  single index, 'all' or Python slice 'i:j:k' as string
+        ntime      number of time steps in file
+    draw_field
+        map        Basemap instance
+        sub        matplotlib axes
+        engine     'pcolor', 'pcolormesh' or 'imshow' (see plot_caspar)
+        xx, yy     map coordinates of cell centres (nlat,nlon)
+        xxh, yyh   map coordinates of cell boundaries (nlat+1,nlon+1); only used by 'pcolormesh'
+        zz         2D field (nlat,nlon)
+        cmap       colour map
+    plot_caspar
+        inputfile  name of CaSPAr NetCDF file or xarray.Dataset like it (e.g. of difference_dataset)
+        variable   name of variable to plot
+
+
+    Optional Input
+    --------------
+    set_plot_style
+        outtype    'pdf', 'png' or 'x' (screen) (default: 'x')
+        usetex     True: use LaTeX to render text (default: False)
+    plot_caspar
+        pngbase    name basis for PNG output files; one file per time step (default: '')
+        pdffile    name of PDF output file or open matplotlib PdfPages; one page per time step
+                   (default: '')
+                   if pngbase and pdffile are both empty, the plot is shown on screen;
+                   pages are appended to an open PdfPages, which is not closed, e.g. to write
+                   several variables into one PDF file
+        timesteps  time steps to plot: single index, 'all' or slice 'i:j:k' (default: '0');
+                   counted within the selection of seltime
+        usetex     True: use LaTeX to render text (default: False)
+        engine     raster engine to draw the field (default: 'auto')
+                   'pcolor':     one polygon per grid cell (PolyCollection) at cell centres
+                   'pcolormesh': curvilinear QuadMesh on the cell boundaries lonh/lath
+                   'imshow':     image; only for grids that are rectilinear in map coordinates
+                                 (e.g. 1D lat/lon on cylindrical projections)
+                   'native':     image in the rotated coordinates rlon/rlat on a rotated-pole map;
+                                 only for grid_mapping 'rotated_latitude_longitude'
+                   'auto':       'imshow' for rectilinear grids, 'pcolormesh' otherwise
+        seltime    select one time step before reading: index or ISO datetime (default: None)
+        level      select level index before reading (default: None, i.e. first level if any)
+        bbox       select 'lonmin,latmin,lonmax,latmax' before reading (default: None)
+                   only the selected hyperslab is read, one time step at a time (see select_hyperslab)
+        lod        level of detail: block-reduce field and cell boundaries to about one block per
+                   output pixel before drawing (default: 'none')
+                   'none': draw every grid cell
+                   'mean', 'max', 'nearest': reduction of the cells in a block (see block_reduce)
+        norm       fixed colour scale of all time steps: matplotlib Normalize or [vmin, vmax]
+                   (default: None, i.e. minimum and maximum of each time step; see global_scale)
+        rasterdpi  resolution of the rasterised field in PDF output (default: 150);
+                   0 or None: field as vector graphics
+        cmap       colour map: matplotlib Colormap or name of colour map of color.get_brewer,
+                   e.g. 'brbg11' for differences (default: None, i.e. reversed dark_rainbow_256)
+        verbose    True: print progress, timing and peak memory (default: True)
+
+
+    Output
+    ------
+    set_plot_style   None; sets matplotlib backend and rc parameters
+    parse_timesteps  list of time step indexes
+    colour_lut       RGBA uint8 look-up table (256,4) of the colour map (reversed dark_rainbow_256)
+    draw_field       artist, set_data; set_data(zz) updates the artist with a new field
+    plot_caspar      dictionary with 'nframes', 'setup' and 'render' time [s], used 'engine',
+                     'peakrss' [MB] before and after reading and plotting and 'lod' block size
+
+
+    Examples
+    --------
+    >>> print(parse_timesteps('all', 4))
+    [0, 1, 2, 3]
+
+    >>> print(parse_timesteps('1:', 4))
+    [1, 2, 3]
+
+    >>> print(parse_timesteps('::2', 5))
+    [0, 2, 4]
+
+    >>> print(parse_timesteps('3', 5))
+    [3]
+
+    # set_plot_style('png')
+    # plot_caspar('CaLDAS_2017100218.nc', 'CaLDAS_A_I0_Profile', pngbase='CaLDAS_2017100200_')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026 - from plot_CaSPAr_data.py
+    Modified, JM, Oct 2026 - flush of PDF page images only for pdf_flush_versions of matplotlib
+"""
+from __future__ import print_function
+import numpy as np
+import time
+
+__all__ = ['set_plot_style', 'parse_timesteps', 'colour_lut', 'draw_field', 'plot_caspar', 'engines']
+
+# raster engines of plot_caspar
+engines = ['auto', 'pcolor', 'pcolormesh', 'imshow', 'native']
+
+# write the images of every PDF page when the page is saved; only with the matplotlib versions
+# [first, last) whose PdfFile internals (_images, writeImages) were checked
+flush_pdf          = True
+pdf_flush_versions = ((3, 6), (3, 11))
+
+# -------------------------------------------------------------------------
+# Customize plots
+#
+
+# Main plot
+nrow        = 3           # # of rows of subplots per figure
+ncol        = 1           # # of columns of subplots per figure
+hspace      = 0.05        # x-space between subplots
+vspace      = 0.04        # y-space between subplots
+textsize    = 7           # standard text size
+lwidth      = 1.5         # linewidth
+alwidth     = 1.0         # axis line width
+dobw        = False       # True: black & white
+
+# PNG
+dpi           = 600
+transparent   = False
+bbox_inches   = 'tight'
+pad_inches    = 0.035
+
+# -------------------------------------------------------------------------------------------------
+
+def set_plot_style(outtype='x', usetex=False):
+    """
+        Set matplotlib backend and rc parameters for output type 'pdf', 'png' or 'x'.
+        Has to be called before matplotlib.pyplot is imported.
+    """
+    import matplotlib as mpl
+    if (outtype == 'pdf'):
+        mpl.use('PDF') # set directly after import matplotlib
+        # Customize: http://matplotlib.sourceforge.net/users/customizing.html
+        mpl.rc('ps', papersize='a4', usedistiller='xpdf') # ps2pdf
+        mpl.rc('figure', figsize=(8.27,11.69)) # a4 portrait
+        if usetex:
+            mpl.rc('text', usetex=True)
+        else:
+            mpl.rc('font',**{'family':'sans-serif','sans-serif':['Helvetica']})
+            #mpl.rc('font',**{'family':'serif','serif':['times']})
+    elif (outtype == 'png'):
+        mpl.use('Agg') # set directly after import matplotlib
+        mpl.rc('figure', figsize=(8.27,11.69)) # a4 portrait
+        if usetex:
+            mpl.rc('text', usetex=True)
+        else:
+            mpl.rc('font',**{'family':'sans-serif','sans-serif':['Helvetica']})
+            #mpl.rc('font',**{'family':'serif','serif':['times']})
+        mpl.rc('savefig', dpi=dpi, format='png')
+    else:
+        mpl.rc('figure', figsize=(4./5.*8.27,4./5.*11.69)) # a4 portrait
+    mpl.rc('font', size=textsize)
+    mpl.rc('lines', linewidth=lwidth, color='black')
+    mpl.rc('axes', linewidth=alwidth, labelcolor='black')
+    mpl.rc('path', simplify=False) # do not remove
+
+# -------------------------------------------------------------------------------------------------
+
+def parse_timesteps(timesteps, ntime):
+    """
+        Indexes of time steps given as single index, 'all' or slice 'i:j:k'.
+    """
+    if (timesteps == 'all'):
+        itimes = list(range(ntime))
+    elif (':' in timesteps):
+        islice = [ int(ii) if ii != '' else None for ii in timesteps.split(':') ]
+        itimes = list(range(ntime))[slice(*islice)]
+    else:
+        itimes = [ int(timesteps) ]
+    if (len(itimes) == 0):
+        raise ValueError('parse_timesteps: no time steps selected with: '+timesteps)
+
+    return itimes
+
+# -------------------------------------------------------------------------------------------------
+
+_cmaps = {}
+
+def _colours():
+    """ RGB [0-1] colours of the maps. """
+    import color                      # in lib/
+    if dobw:
+        c = [ (0.7, 0.7, 0.7) for i in range(256) ]
+    else:
+        c = color.get_brewer('dark_rainbow_256', rgb=True)
+        c = c[::-1] # reverse colors
+
+    return c
+
+def _get_cmap(cname=None):
+    """ Colour map of the maps or brewer colour map cname (interpolated to 256 colours), created once per process. """
+    key = 'map' if (cname is None) else cname
+    if key not in _cmaps:
+        import matplotlib as mpl
+        if (cname is None):
+            _cmaps[key] = mpl.colors.ListedColormap(_colours())
+        else:
+            import color                  # in lib/
+            _cmaps[key] = mpl.colors.LinearSegmentedColormap.from_list(cname, color.get_brewer(cname, rgb=True), N=256)
+
+    return _cmaps[key]
+
+# -------------------------------------------------------------------------------------------------
+
+def colour_lut():
+    """
+        RGBA uint8 look-up table (256,4) of the colour map of the maps, created once per process.
+    """
+    if 'lut' not in _cmaps:
+        lut = np.full((256, 4), 255, dtype=np.uint8)
+        lut[:,:3] = np.round(np.array(_colours())*255.)
+        _cmaps['lut'] = lut
+
+    return _cmaps['lut']
+
+# -------------------------------------------------------------------------------------------------
+
+def _pdf_flushable(pdf_pages):
+    """ True if the images of PdfPages can be flushed with _flush_pdf_images. """
+    import matplotlib as mpl
+    version = tuple([ int(vv) for vv in mpl.__version__.split('.')[:2] ])
+    if not (flush_pdf and (pdf_flush_versions[0] <= version < pdf_flush_versions[1])):
+        return False
+    pdffile = getattr(pdf_pages, '_file', None)
+
+    return isinstance(getattr(pdffile, '_images', None), dict) and hasattr(pdffile, 'writeImages')
+
+def _flush_pdf_images(pdf_pages):
+    """
+        Write the images of the pages saved so far to the PDF file and free their pixels.
+        matplotlib's PdfFile otherwise keeps all images in memory until the file is closed.
+        Only called for the matplotlib versions of pdf_flush_versions (see _pdf_flushable).
+    """
+    pdffile = pdf_pages._file
+    images  = pdffile._images
+    if not hasattr(pdffile, '_caspar_writeImages'):
+        # finalize writes only the images not yet flushed
+        pdffile._caspar_writeImages = pdffile.writeImages
+        pdffile.writeImages         = lambda: _flush_pdf_images(pdf_pages)
+
+    pending = dict([ (kk, vv) for kk, vv in images.items() if vv[0] is not None ])
+    if (len(pending) == 0):
+        return
+    pdffile._images = pending
+    try:
+        pdffile._caspar_writeImages()
+    finally:
+        pdffile._images = images
+    # keep name and object for the XObject dictionary, drop pixels; new key so that the id
+    # of a freed image cannot be matched by a new image
+    for kk, (image, name, ob) in pending.items():
+        del images[kk]
+        images[('flushed', name)] = (None, name, ob)
+
+def _is_rectilinear(xx, yy):
+    """ True if map coordinates xx, yy form a rectilinear grid, i.e. x only varies along columns and y along rows. """
+    if (xx.strides[0] == 0) and (yy.strides[1] == 0):
+        return True   # 1D axes broadcast to 2D
+    tol = 1.e-6 * max(np.ptp(xx), np.ptp(yy))
+    return (np.all(np.abs(xx - xx[0:1,:]) <= tol) and np.all(np.abs(yy - yy[:,0:1]) <= tol))
+
+def draw_field(map, sub, engine, xx, yy, xxh, yyh, zz, cmap):
+    """
+        Draw 2D field zz with the given raster engine on the Basemap map in axes sub.
+
+        xx, yy are the map coordinates of the cell centres, xxh, yyh of the cell boundaries.
+        Returns the drawn artist and a function setting new data of the same shape, i.e.
+        set_data(zz) redraws a new time step without redoing the geometry.
+    """
+    if (engine == 'pcolor'):
+        variable_plot = map.pcolor(xx, yy, zz, cmap=cmap, ax=sub)
+        # older matplotlib versions store only the cells inside the projection limb as flat array;
+        # newer ones draw one cell around every centre (shading 'nearest') and store all values flat
+        ncells = np.size(variable_plot.get_array())
+        if (np.ndim(variable_plot.get_array()) == 1) and (ncells != np.size(zz)):
+            xymask = (xx > 1.e20) | (yy > 1.e20)
+            xymask = xymask[:-1,:-1] | xymask[1:,1:] | xymask[:-1,1:] | xymask[1:,:-1]
+            icells = np.where(~xymask.ravel())[0]
+            def set_data(zz):
+                variable_plot.set_array(zz[:-1,:-1].ravel()[icells])
+        elif (np.ndim(variable_plot.get_array()) == 1):
+            def set_data(zz):
+                variable_plot.set_array(np.ravel(zz))
+        else:
+            def set_data(zz):
+                variable_plot.set_array(zz)
+    elif (engine == 'pcolormesh'):
+        # cells with corners outside of the projection limb (or at infinity, e.g. opposite pole)
+        badcorner = ~np.isfinite(xxh) | ~np.isfinite(yyh) | (xxh > 1.e20) | (yyh > 1.e20)
+        limbmask  = badcorner[:-1,:-1] | badcorner[1:,1:] | badcorner[:-1,1:] | badcorner[1:,:-1]
+        if np.any(badcorner):
+            xxh = np.where(badcorner, 0., xxh)
+            yyh = np.where(badcorner, 0., yyh)
+            zz  = np.where(limbmask, np.nan, zz)
+        variable_plot = map.pcolormesh(xxh, yyh, zz, cmap=cmap, ax=sub, shading='flat')
+        ravel    = (np.ndim(variable_plot.get_array()) == 1) # older matplotlib versions
+        def set_data(zz):
+            if np.any(limbmask):
+                zz = np.where(limbmask, np.nan, zz)
+            if ravel:
+                zz = zz.ravel()
+            variable_plot.set_array(zz)
+    elif (engine == 'imshow'):
+        if not _is_rectilinear(xx, yy):
+            raise ValueError('draw_field: imshow only possible for grids that are rectilinear in map coordinates.')
+        x = xx[0,:]
+        y = yy[:,0]
+        # image needs increasing coordinates
+        xflip = x[-1] < x[0]
+        yflip = y[-1] < y[0]
+        if xflip: x = x[::-1]
+        if yflip: y = y[::-1]
+        def _flip(zz):
+            if xflip: zz = zz[:,::-1]
+            if yflip: zz = zz[::-1,:]
+            return zz
+        dx = np.diff(x)
+        dy = np.diff(y)
+        extent = (x[0]-0.5*dx[0], x[-1]+0.5*dx[-1], y[0]-0.5*dy[0], y[-1]+0.5*dy[-1])
+        if np.allclose(dx, dx[0]) and np.allclose(dy, dy[0]):
+            variable_plot = sub.imshow(_flip(zz), cmap=cmap, origin='lower', extent=extent,
+                                       interpolation='nearest')
+            def set_data(zz):
+                variable_plot.set_data(_flip(zz))
+        else:
+            # e.g. Miller projection: regular in x but not in y
+            from matplotlib.image import NonUniformImage
+            variable_plot = NonUniformImage(sub, cmap=cmap, interpolation='nearest', extent=extent)
+            variable_plot.set_data(x, y, _flip(zz))
+            sub.add_image(variable_plot)
+            def set_data(zz):
+                variable_plot.set_data(x, y, _flip(zz))
+        map.set_axes_limits(ax=sub)
+    else:
+        raise ValueError('draw_field: engine not known: '+engine)
+
+    return variable_plot, set_data
+
+# -------------------------------------------------------------------------------------------------
+
+def plot_caspar(inputfile, variable, pngbase='', pdffile='', timesteps='0', usetex=False,
+                engine='auto', seltime=None, level=None, bbox=None, lod='none', norm=None,
+                rasterdpi=150, cmap=None, verbose=True):
+    """
+        Plot variable of CaSPAr NetCDF file for the given time steps to PNG, PDF or screen.
+    """
+    import xarray as xr
+    import pandas as pd
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    from position   import position   # in lib/
+    from str2tex    import str2tex    # in lib/
+    from .products  import get_basemap, get_rotated_basemap, rotpole_xoffset
+    from .rotated   import rotated_pole
+    from .overlay   import draw_coastlines
+    from .grid      import grid_geometry
+    from .projcache import project_grid
+    from .hyperslab import select_hyperslab, peak_rss
+    from .lod       import lod_factors, block_reduce, coarsen_corners
+    from .stages    import stage
+
+    if (pdffile != '') and (pngbase != ''):
+        raise ValueError('plot_caspar: PDF and PNG are mutually exclusive.')
+    if (pdffile == ''):
+        if (pngbase == ''):
+            outtype = 'x'
+        else:
+            outtype = 'png'
+    else:
+        outtype = 'pdf'
+
+    if not isinstance(cmap, mpl.colors.Colormap):
+        cmap = _get_cmap(cmap)
+
+    # file, PDF and figure are closed also if reading or drawing fails
+    dsfile    = None
+    pdf_pages = None
+    fig       = None
+    done      = False
+    try:
+        # open lazily and select hyperslab before any data is read
+        with stage('open', inputfile=inputfile if isinstance(inputfile, str) else '<dataset>', variable=variable):
+            dsfile   = inputfile if isinstance(inputfile, xr.Dataset) else xr.open_dataset(inputfile)
+            rss      = [peak_rss()]
+            ds       = select_hyperslab(dsfile, variable, time=seltime, level=level, bbox=bbox)
+
+            # Latlon
+            lon      = ds['lon'].values      # 1D or 2D field
+            lat      = ds['lat'].values      # 1D or 2D field
+            vardata  = ds[variable]          # lazy 3D field (time, lat, lon); read one time step at a time
+            product  = ds.attrs['product']
+
+            # native drawing on rotated grids needs only the 1D rotated axes
+            if (engine == 'native'):
+                pole = rotated_pole(ds, variable)
+                if (pole is None):
+                    raise ValueError('plot_caspar: engine native only for rotated latitude-longitude grids: '+variable)
+                rlon = ds[vardata.dims[-1]].values
+                rlat = ds[vardata.dims[-2]].values
+
+            # time steps to plot
+            itimes = parse_timesteps(timesteps, vardata.shape[0])
+
+            if (product == 'GDPS' or product == 'GEPS'):
+                lon = np.where(lon<0., lon+360., lon)
+                if (bbox is None):
+                    lon[...,-1] = 359.999999   # this is a hack
+            elif (np.ndim(lon) == 1) and (bbox is None):
+                lon = lon.copy()
+                lon[-1] = 359.999999       # this is a hack
+
+            # all time steps as strings in nice format
+            timestrs = pd.to_datetime(ds['time'].data)                 # DatetimeIndex(['2017-10-02 18:00:00', ...])
+            timestrs = timestrs.strftime('%d %h %Y %H:%M:%S')+' UTC'   # '02 Oct 2017 18:00:00 UTC'
+
+            # some variable properties
+            unit      = ds[variable].attrs['units']
+            longname  = ds[variable].attrs['long_name']
+
+        # 1D or 2D lats and lons: 2D cell centres and boundaries between lats and lons (cached per grid)
+        if (engine != 'native'):
+            with stage('edges'):
+                geometry = grid_geometry(lon, lat)
+                lon      = geometry['lon']
+                lat      = geometry['lat']
+
+        # -------------------------------------------------------------------------
+        # Plot
+        # -------------------------------------------------------------------------
+
+        if verbose:
+            if (outtype == 'pdf'):
+                print('Plot PDF ', pdffile)
+            elif (outtype == 'png'):
+                print('Plot PNG ', pngbase)
+            else:
+                print('Plot X')
+        if (outtype == 'pdf'):
+            from matplotlib.backends.backend_pdf import PdfPages
+            if isinstance(pdffile, PdfPages):
+                pdf_pages = pdffile
+            else:
+                pdf_pages = PdfPages(pdffile)
+            rasterdpi = rasterdpi if rasterdpi else None
+
+        ifig = 0
+
+        # -------------------------------------------------------------------------
+        # Fig 1 :: map with color bar (whole domain)
+        #          set up once; only data and title change with the time steps
+        # -------------------------------------------------------------------------
+        tstart = time.time()
+        fig = plt.figure()
+
+        # -------------------------------------------------------------------------
+        # (1a) map:: glb
+        # -------------------------------------------------------------------------
+        sub    = fig.add_axes(position(nrow,ncol,1,hspace=hspace,vspace=vspace) )
+
+        with stage('map', product=product):
+            if (engine == 'native'):
+                map, parallels, meridians = get_rotated_basemap(product, pole[0], pole[1], rlon, rlat)
+            else:
+                map, parallels, meridians = get_basemap(product)
+
+            # plot coastlines, draw label meridians and parallels.
+            # labels = [left, right, top, bottom]
+            # coastline detail from map extent; cached raster layer in PNG output (see draw_coastlines)
+            draw_coastlines(map, sub, dpi=dpi if (outtype == 'png') else None)
+            map.drawparallels(parallels,labels=[1,0,0,0],linewidth=0.5,ax=sub)
+            map.drawmeridians(meridians,labels=[0,1,0,1],linewidth=0.5,ax=sub)
+
+        with stage('projection', product=product):
+            if (engine == 'native'):
+                # map coordinates are the rotated axes: nothing to project
+                xx = np.broadcast_to((rlon + rotpole_xoffset)[np.newaxis,:], (rlat.size, rlon.size))
+                yy = np.broadcast_to(rlat[:,np.newaxis], (rlat.size, rlon.size))
+            else:
+                # geo-referenced (cached per product, projection and grid)
+                xx, yy = project_grid(map, product, geometry, points='centres')
+            if (engine == 'auto'):
+                engine = 'imshow' if _is_rectilinear(xx, yy) else 'pcolormesh'
+            if (engine == 'pcolormesh'):
+                xxh, yyh = project_grid(map, product, geometry, points='corners')
+            else:
+                xxh, yyh = None, None
+
+            # level of detail: about one block of cells per output pixel
+            if (lod != 'none'):
+                odpi   = {'x': fig.dpi, 'png': dpi, 'pdf': rasterdpi or dpi}[outtype]
+                fy, fx = lod_factors(xx, yy, sub, map, odpi)
+            else:
+                fy, fx = 1, 1
+            if (fy > 1) or (fx > 1):
+                if verbose: print('Reduce ', xx.shape, ' cells by blocks of ', (fy, fx), ' (', lod, ')')
+                xx = block_reduce(xx, fy, fx)
+                yy = block_reduce(yy, fy, fx)
+                if (xxh is not None):
+                    xxh = coarsen_corners(xxh, fy, fx)
+                    yyh = coarsen_corners(yyh, fy, fx)
+                reduce = lambda zz: block_reduce(zz, fy, fx, how=lod)
+            else:
+                reduce = lambda zz: zz
+
+        with stage('read', frame=itimes[0]):
+            zz = vardata[itimes[0]].values
+
+        with stage('draw', engine=engine):
+            variable_plot, set_data = draw_field(map, sub, 'imshow' if (engine == 'native') else engine,
+                                                 xx, yy, xxh, yyh, reduce(zz), cmap)
+            if (norm is not None):
+                if not isinstance(norm, mpl.colors.Normalize):
+                    norm = mpl.colors.Normalize(vmin=norm[0], vmax=norm[1])
+                variable_plot.set_norm(norm)
+            if (outtype == 'pdf') and (rasterdpi is not None):
+                variable_plot.set_rasterized(True)   # field as image; map and labels stay vector
+
+            # set title as time step
+            title = sub.set_title(timestrs[itimes[0]],fontsize=textsize)
+
+            # -------------------------------------------------------------------------
+            # (1b) Colorbar
+            # -------------------------------------------------------------------------
+            sub    = fig.add_axes(position(1,1,1,hspace=hspace,vspace=vspace, left=0.3, right=0.7, top=0.642, bottom=0.632) )
+
+            # colorbar follows the colour limits of the map
+            cbar = fig.colorbar(variable_plot, cax=sub, orientation='horizontal')
+            cbar.set_label(variable+': '+longname+' [$'+str2tex(unit.replace('**','^').replace('-1','{-1}').replace('_','\_'),usetex=usetex)+'$]')
+
+        tsetup = time.time() - tstart
+
+        # -------------------------------------------------------------------------
+        # Loop over time steps :: update data, colour limits and title only
+        # -------------------------------------------------------------------------
+        tstart = time.time()
+        for itime in itimes:
+            ifig += 1
+            if verbose: print('Plot - Fig ', ifig, ' ::  ', timestrs[itime])
+
+            if (itime != itimes[0]):
+                with stage('read', frame=itime):
+                    zz = vardata[itime].values  # 2D field
+            var = zz
+            with stage('savefig', frame=itime, outtype=outtype):
+                set_data(reduce(var))
+                # minimal and maximal value; fixed colour scale if norm is given
+                if (norm is None):
+                    variable_plot.set_clim(vmin=np.nanmin(var), vmax=np.nanmax(var))
+                title.set_text(timestrs[itime])
+
+                if (outtype == 'pdf'):
+                    if (rasterdpi is not None):
+                        pdf_pages.savefig(fig, dpi=rasterdpi)
+                        if _pdf_flushable(pdf_pages):
+                            _flush_pdf_images(pdf_pages)
+                    else:
+                        pdf_pages.savefig(fig)
+                elif (outtype == 'png'):
+                    pngfile = pngbase+"{0:04d}".format(ifig)+".png"
+                    fig.savefig(pngfile, transparent=transparent, bbox_inches=bbox_inches, pad_inches=pad_inches)
+                elif (len(itimes) > 1):
+                    plt.pause(0.001)
+        trender = time.time() - tstart
+
+        rss.append(peak_rss())
+
+        if verbose:
+            print('Peak RSS before reading data: {:.1f} MB; after plotting: {:.1f} MB'.format(rss[0], rss[1]))
+            print('Set up figure, map and projection in {:.2f} s (engine: {:s})'.format(tsetup, engine))
+            print('Rendered {:d} frames in {:.2f} s ({:.2f} frames per second)'.format(len(itimes), trender, len(itimes)/trender))
+
+        done = True
+        return {'nframes': len(itimes), 'setup': tsetup, 'render': trender, 'engine': engine,
+                'peakrss': rss, 'lod': (fy, fx)}
+    finally:
+        if (pdf_pages is not None) and (pdf_pages is not pdffile):
+            pdf_pages.close()
+        if (fig is not None) and ((outtype != 'x') or not done):
+            plt.close(fig)
+        if (dsfile is not None) and (dsfile is not inputfile):
+            dsfile.close()
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
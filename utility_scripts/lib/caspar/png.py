@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+    Write PNG files directly from numpy arrays without matplotlib.
+
+    Used for map tiles and quick looks where the image is already a coloured array and
+    the figure machinery of matplotlib would only cost time.
+
+
+    Definition
+    ----------
+    def write_png(filename, rgba, level=6):
+
+
+    Input
+    -----
+    filename  name of PNG output file
+    rgba      uint8 array (ny,nx,4) with RGBA or (ny,nx,3) with RGB; first row is the top of the image
+
+
+    Optional Input
+    --------------
+    level     zlib compression level 0-9 (default: 6)
+
+
+    Output
+    ------
+    None; PNG file is written via temporary file and rename
+
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> rgba = np.zeros((2,3,4), dtype=np.uint8)
+    >>> rgba[0,:,0] = 255
+    >>> rgba[...,3] = 255
+    >>> tmpdir = tempfile.mkdtemp()
+    >>> write_png(os.path.join(tmpdir, 'red.png'), rgba)
+    >>> print(open(os.path.join(tmpdir, 'red.png'), 'rb').read()[1:4])
+    b'PNG'
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import os
+import struct
+import zlib
+import numpy as np
+
+__all__ = ['write_png']
+
+# -------------------------------------------------------------------------------------------------
+
+def _chunk(tag, data):
+    """ PNG chunk: length, tag, data and CRC. """
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+# -------------------------------------------------------------------------------------------------
+
+def write_png(filename, rgba, level=6):
+    """
+        Write uint8 RGBA (ny,nx,4) or RGB (ny,nx,3) array as 8-bit PNG file.
+    """
+    rgba = np.ascontiguousarray(rgba, dtype=np.uint8)
+    ny, nx, nc = rgba.shape
+    if nc not in (3, 4):
+        raise ValueError('write_png: array must have 3 (RGB) or 4 (RGBA) channels: '+str(rgba.shape))
+
+    # filter type 0 (None) in front of every row
+    raw = np.empty((ny, nx*nc+1), dtype=np.uint8)
+    raw[:,0]  = 0
+    raw[:,1:] = rgba.reshape(ny, nx*nc)
+
+    header = struct.pack('>IIBBBBB', nx, ny, 8, 6 if (nc == 4) else 2, 0, 0, 0)
+    png    = (b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', header) +
+              _chunk(b'IDAT', zlib.compress(raw.tobytes(), level)) + _chunk(b'IEND', b''))
+
+    tmpfile = filename+'.'+str(os.getpid())+'.tmp'
+    with open(tmpfile, 'wb') as ff:
+        ff.write(png)
+    os.rename(tmpfile, filename)
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
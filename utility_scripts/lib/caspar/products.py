@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+    Map projections and nominal grids of the CaSPAr products and a per-process cache of their Basemaps.
+
+
+    Definition
+    ----------
+    caspar_products = {product: {'basemap': dict(...), 'parallels': (start, stop, step), 'meridians': (...),
+                                 'grid': dict(...)}}
+    def get_basemap(product):
+    def get_rotated_basemap(product, pole_lon, pole_lat, rlon, rlat):
+
+    The grid entries give the nominal size and resolution of the product grids for synthetic test
+    data and benchmarks; the geo-referencing of real files always comes from the files themselves:
+        {'type': 'rotated', 'shape': (nrlat, nrlon), 'dlat': ..., 'dlon': ..., 'pole_lat': ..., 'pole_lon': ...}
+        {'type': 'latlon',  'shape': (nlat, nlon)}
+
+
+    Input
+    -----
+    product    product name as given in the global attribute 'product' of the CaSPAr NetCDF files,
+               e.g. 'RDPS', 'HRDPS', 'CaPA_coarse', 'GDPS', ...
+    pole_lon   geographic longitude of the rotated north pole (grid_north_pole_longitude)
+    pole_lat   geographic latitude of the rotated north pole (grid_north_pole_latitude)
+    rlon, rlat 1D rotated longitudes and latitudes of the cell centres of the grid
+
+
+    Output
+    ------
+    map, parallels, meridians
+        map        Basemap instance (created only once per product and process)
+        parallels  latitudes of parallels to draw
+        meridians  longitudes of meridians to draw
+    get_rotated_basemap: Basemap in the rotated coordinates of the grid (projection 'rotpole')
+        covering the cells; map coordinates are x = rlon + rotpole_xoffset and y = rlat,
+        so that a field on the grid is a regular image and only coastlines and graticules
+        are transformed
+
+
+    Examples
+    --------
+    >>> print(caspar_products['RDPS']['basemap']['projection'])
+    npstere
+
+    >>> print(caspar_products['HRDPS']['grid']['shape'])
+    (1290, 2540)
+
+    # map, parallels, meridians = get_basemap('RDPS')
+    # map.drawcoastlines(ax=sub)
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026 - product if-chain of plot_CaSPAr_data.py
+"""
+from __future__ import print_function
+import numpy as np
+
+__all__ = ['caspar_products', 'get_basemap', 'get_rotated_basemap', 'rotpole_xoffset']
+
+# -------------------------------------------------------------------------------------------------
+
+# map projections
+_npstere_north   = {'basemap':   dict(projection='npstere', boundinglat=10, lon_0=270, resolution='c'),
+                    'parallels': (-80, 80, 20),
+                    'meridians': (-360, 1, 40)}
+_npstere_south   = {'basemap':   dict(projection='npstere', boundinglat=-10, lon_0=270, resolution='c'),
+                    'parallels': (-80, 80, 20),
+                    'meridians': (-360, 1, 40)}
+_miller          = {'basemap':   dict(projection='mill', lon_0=180),
+                    'parallels': (-90, 90, 30),
+                    'meridians': (-360, 1, 60)}
+
+# nominal product grids
+_rotated_pole = dict(pole_lat=31.758312, pole_lon=87.597031)
+_grid_10km    = dict(_rotated_pole, type='rotated', shape=(824, 935),   dlat=0.09,   dlon=0.09)
+_grid_15km    = dict(_rotated_pole, type='rotated', shape=(580, 650),   dlat=0.135,  dlon=0.135)
+_grid_2p5km   = dict(_rotated_pole, type='rotated', shape=(1290, 2540), dlat=0.0225, dlon=0.0225)
+_grid_rdrs_v2 = dict(_rotated_pole, type='rotated', shape=(1050, 1360), dlat=0.09,   dlon=0.09)
+_grid_25km    = dict(type='latlon', shape=(751, 1500))
+_grid_50km    = dict(type='latlon', shape=(361, 720))
+
+caspar_products = {
+    'CaPA_coarse':     dict(_npstere_north, grid=_grid_10km),    # Polar Stereographic Projection
+    'CaPA_coarse_exp': dict(_npstere_north, grid=_grid_10km),    # Polar Stereographic Projection
+    'CaPA_fine':       dict(_npstere_north, grid=_grid_2p5km),   # Polar Stereographic Projection
+    'GDPS':            dict(_miller,        grid=_grid_25km),    # Miller projection
+    'GEPS':            dict(_miller,        grid=_grid_50km),    # Miller projection
+    'RDRS':            dict(_npstere_south, grid=_grid_10km),    # Polar Stereographic Projection
+    'RDRS_v2':         dict(_npstere_south, grid=_grid_rdrs_v2), # Polar Stereographic Projection
+    'RDPS':            dict(_npstere_south, grid=_grid_10km),    # Polar Stereographic Projection
+    'REPS':            dict(_npstere_north, grid=_grid_15km),    # Polar Stereographic Projection
+    'CaLDAS':          dict(_npstere_north, grid=_grid_2p5km),   # Polar Stereographic Projection
+    'HRDPS':           dict(_npstere_north, grid=_grid_2p5km),   # Polar Stereographic Projection
+    '':                dict(_npstere_north, grid=_grid_10km),    # Polar Stereographic Projection
+    }
+
+# Basemaps already created in this process
+_basemaps = {}
+
+# keyword arguments of the Basemaps of this process by id, e.g. to create them at other coastline resolutions
+_basemap_kwargs = {}
+
+# map x of rotated Basemaps is rlon + 180 (o_lon_p=180): continuous for grids around rlon=0
+rotpole_xoffset = 180.
+
+# -------------------------------------------------------------------------------------------------
+
+def get_basemap(product):
+    """
+        Basemap, parallels and meridians of a CaSPAr product.
+
+        The Basemap is created only once per product and process and reused afterwards,
+        i.e. draw with the keyword ax=sub to use it with several figures.
+    """
+    if product not in caspar_products:
+        raise ValueError('Product not implemented: '+product)
+
+    if product not in _basemaps:
+        from mpl_toolkits.basemap import Basemap
+        props = caspar_products[product]
+        _basemaps[product] = Basemap(**props['basemap'])
+        _basemap_kwargs[id(_basemaps[product])] = dict(props['basemap'])
+
+    props     = caspar_products[product]
+    parallels = np.arange(*props['parallels'])
+    meridians = np.arange(*props['meridians'])
+
+    return _basemaps[product], parallels, meridians
+
+def get_rotated_basemap(product, pole_lon, pole_lat, rlon, rlat):
+    """
+        Basemap in rotated coordinates covering the cells of the 1D axes rlon, rlat,
+        with parallels and meridians of the product.
+
+        Created once per product, pole and extent and process.
+    """
+    if product not in caspar_products:
+        raise ValueError('Product not implemented: '+product)
+
+    from .grid import _edges1d
+    redges = _edges1d(np.sort(np.asarray(rlon, dtype=np.float64)))
+    aedges = _edges1d(np.sort(np.asarray(rlat, dtype=np.float64)))
+    extent = (redges[0], aedges[0], redges[-1], aedges[-1])
+    key    = ('rotpole', product, pole_lon, pole_lat) + tuple([ round(ee, 6) for ee in extent ])
+    if key not in _basemaps:
+        from mpl_toolkits.basemap import Basemap
+        kwargs = dict(projection='rotpole', lon_0=pole_lon-180., o_lat_p=pole_lat, o_lon_p=rotpole_xoffset,
+                      llcrnrx=extent[0]+rotpole_xoffset, llcrnry=extent[1],
+                      urcrnrx=extent[2]+rotpole_xoffset, urcrnry=extent[3],
+                      resolution=caspar_products[product]['basemap'].get('resolution', 'c'))
+        _basemaps[key] = Basemap(**kwargs)
+        _basemap_kwargs[id(_basemaps[key])] = kwargs
+
+    props     = caspar_products[product]
+    parallels = np.arange(*props['parallels'])
+    meridians = np.arange(*props['meridians'])
+
+    return _basemaps[key], parallels, meridians
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+    Cache of map coordinates of CaSPAr grids projected with a Basemap.
+
+    The product grids never change, so the map coordinates of cell centres and corners are
+    projected only once per (product, projection parameters, grid fingerprint; corners also
+    per corners_version of grid) and stored as npy files in cache_dir('proj'). Later calls return read-only memory maps of these
+    files, i.e. the coordinates are only read from disk when they are accessed.
+
+
+    Definition
+    ----------
+    def projection_key(map, product, fingerprint, points='centres'):
+    def project_grid(map, product, geometry, points='centres', cache=True):
+
+
+    Input
+    -----
+    map          Basemap instance
+    product      product name, e.g. 'RDPS'
+    fingerprint  grid fingerprint, e.g. geometry['fingerprint']
+    geometry     dictionary of grid_geometry with 'lon', 'lat', 'lonh', 'lath' and 'fingerprint'
+
+
+    Optional Input
+    --------------
+    points       'centres': project cell centres lon, lat (default)
+                 'corners': project cell corners lonh, lath
+    cache        True: read from / write to on-disk cache (default: True)
+
+
+    Output
+    ------
+    projection_key  hex string identifying product, projection, grid and points
+    project_grid    x, y map coordinates; numpy.memmap if read from cache
+
+
+    Examples
+    --------
+    # map, parallels, meridians = get_basemap('RDPS')
+    # geometry = grid_geometry(lon, lat)
+    # xx,  yy  = project_grid(map, 'RDPS', geometry)
+    # xxh, yyh = project_grid(map, 'RDPS', geometry, points='corners')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - corners_version in key of corners
+"""
+from __future__ import print_function
+import os
+import hashlib
+import numpy as np
+
+__all__ = ['projection_key', 'project_grid']
+
+# -------------------------------------------------------------------------------------------------
+
+def projection_key(map, product, fingerprint, points='centres'):
+    """
+        Hex key of product, projection parameters, map corners, grid fingerprint and points.
+    """
+    from .grid import corners_version
+    if points == 'corners':
+        points = 'corners_c{:d}'.format(corners_version)
+    projparams = sorted([ (kk, str(vv)) for kk, vv in map.projparams.items() ])
+    corners    = [ repr(float(cc)) for cc in (map.llcrnrx, map.llcrnry, map.urcrnrx, map.urcrnry) ]
+    hh = hashlib.sha1()
+    hh.update(str((product, projparams, corners, fingerprint, points)).encode('ascii'))
+
+    return hh.hexdigest()
+
+# -------------------------------------------------------------------------------------------------
+
+def project_grid(map, product, geometry, points='centres', cache=True):
+    """
+        Map coordinates of cell centres or corners, from the on-disk cache if possible.
+    """
+    if points == 'centres':
+        lon, lat = geometry['lon'], geometry['lat']
+    elif points == 'corners':
+        lon, lat = geometry['lonh'], geometry['lath']
+    else:
+        raise ValueError('project_grid: points must be centres or corners: '+points)
+
+    if cache:
+        from .cache import cache_dir, save_npy
+        key   = projection_key(map, product, geometry['fingerprint'], points=points)
+        xfile = os.path.join(cache_dir('proj'), key+'_x.npy')
+        yfile = os.path.join(cache_dir('proj'), key+'_y.npy')
+        if os.path.exists(xfile) and os.path.exists(yfile):
+            return np.load(xfile, mmap_mode='r'), np.load(yfile, mmap_mode='r')
+
+    x, y = map(np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+    if cache:
+        save_npy(xfile, x)
+        save_npy(yfile, y)
+
+    return x, y
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+    Quick-look images of CaSPAr variables without matplotlib.
+
+    For checking many files, e.g. every file of a nightly download, only a small image per
+    file and time step is needed. The field is optionally block-reduced, mapped through a
+    precomputed 256-entry uint8 colour look-up table with a dedicated colour for missing
+    values (NaN), and written directly as PNG with write_png. There is no map, coastline,
+    title or colour bar; north is up. Neither matplotlib nor Basemap are imported, so that
+    a process starts fast and a file takes only as long as reading it.
+
+
+    Definition
+    ----------
+    def quicklook_lut(cname=None, nancolour=(200,200,200,255)):
+    def quicklook_rgba(zz, lut, vmin=None, vmax=None):
+    def quicklook(inputfile, variable, pngbase, timesteps='0', maxsize=None, how='nearest',
+                  vmin=None, vmax=None, cname=None, nancolour=(200,200,200,255), level=1):
+
+
+    Input
+    -----
+    quicklook_rgba
+        zz         2D field (ny,nx); first row is the top of the image
+        lut        uint8 look-up table (257,4) of quicklook_lut
+    quicklook
+        inputfile  name of CaSPAr NetCDF file
+        variable   name of variable
+        pngbase    name basis for PNG output files; one file per time step
+
+
+    Optional Input
+    --------------
+    quicklook_lut, quicklook
+        cname      name of colour map of color.get_brewer, e.g. 'rdbu11'
+                   (default: None, i.e. colour map of plot_caspar)
+        nancolour  RGBA of missing values (default: (200,200,200,255), light grey)
+    quicklook_rgba, quicklook
+        vmin, vmax colour scale; None: minimum and maximum of the field (default: None)
+    quicklook
+        timesteps  time steps: single index, 'all' or slice 'i:j:k' (default: '0')
+        maxsize    maximum number of pixels of the longer image side; larger fields are
+                   block-reduced (default: None, i.e. one pixel per grid cell)
+        how        reduction of the cells of a block: 'nearest', 'mean' or 'max' (default: 'nearest')
+        level      zlib compression level of PNG (default: 1)
+
+
+    Output
+    ------
+    quicklook_lut   uint8 RGBA look-up table (257,4): 256 colours of the colour map and
+                    the NaN colour as last entry
+    quicklook_rgba  uint8 RGBA image (ny,nx,4)
+    quicklook       dictionary with 'nframes', 'setup' and 'render' time [s], 'block' size and
+                    per time step 'stats' (minimum, maximum, fraction of NaN) of the full-resolution
+                    field, i.e. before block reduction
+
+
+    Examples
+    --------
+    >>> lut = quicklook_lut('blues4', nancolour=(255,0,0,255))
+    >>> print(lut.shape, lut.dtype)
+    (257, 4) uint8
+    >>> rgba = quicklook_rgba(np.array([[0., 1.], [np.nan, 0.5]]), lut)
+    >>> print(rgba[1,0], np.all(rgba[0,0] == lut[0]), np.all(rgba[0,1] == lut[255]))
+    [255   0   0 255] True True
+
+    # quicklook('CaPA_fine_2017100212.nc', 'CaPA_fine_A_PR0_SFC', 'ql/CaPA_fine_2017100212_', maxsize=256)
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - minimum, maximum and NaN fraction of the full-resolution field
+"""
+from __future__ import print_function
+import time
+import warnings
+import numpy as np
+
+__all__ = ['quicklook_lut', 'quicklook_rgba', 'quicklook']
+
+# look-up tables already created in this process
+_luts = {}
+
+# -------------------------------------------------------------------------------------------------
+
+def quicklook_lut(cname=None, nancolour=(200,200,200,255)):
+    """
+        uint8 RGBA look-up table (257,4): 256 colours and NaN colour, created once per process.
+    """
+    key = (cname, tuple(nancolour))
+    if key not in _luts:
+        lut = np.empty((257, 4), dtype=np.uint8)
+        if cname is None:
+            from .plot import colour_lut
+            lut[:256] = colour_lut()
+        else:
+            import color                      # in lib/
+            cc = np.array(color.get_brewer(cname, rgb=True), dtype=np.float64)
+            # interpolate colours of the map to 256 entries
+            xc = np.linspace(0., 1., cc.shape[0])
+            xl = np.linspace(0., 1., 256)
+            for ii in range(3):
+                lut[:256,ii] = np.round(np.interp(xl, xc, cc[:,ii])*255.)
+            lut[:256,3] = 255
+        lut[256] = nancolour
+        _luts[key] = lut
+
+    return _luts[key]
+
+def quicklook_rgba(zz, lut, vmin=None, vmax=None):
+    """
+        RGBA image of 2D field zz through look-up table lut; NaN gets the last entry of lut.
+    """
+    zz = np.asarray(zz, dtype=np.float32)
+    ok = np.isfinite(zz)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)   # all-NaN field
+        if vmin is None: vmin = np.nanmin(zz)
+        if vmax is None: vmax = np.nanmax(zz)
+    scale = 256. / (vmax - vmin) if (vmax > vmin) else 0.
+    ic    = np.clip((np.where(ok, zz, vmin) - vmin) * scale, 0., 255.).astype(np.uint16)
+    ic[~ok] = 256
+
+    return lut[ic]
+
+# -------------------------------------------------------------------------------------------------
+
+def _north_up(ds, variable):
+    """ True if the rows of variable run from south to north, i.e. must be flipped for an image. """
+    ydim = ds[variable].dims[-2]
+    if (ydim in ds.variables) and (ds[ydim].ndim == 1) and (ds[ydim].size > 1):
+        y = ds[ydim].values
+        return bool(y[-1] > y[0])
+    lat = ds['lat']
+    if (lat.ndim == 1):
+        return bool(lat.values[-1] > lat.values[0])
+    ix = lat.shape[-1] // 2
+
+    return bool(lat[-1,ix].values > lat[0,ix].values)
+
+def quicklook(inputfile, variable, pngbase, timesteps='0', maxsize=None, how='nearest',
+              vmin=None, vmax=None, cname=None, nancolour=(200,200,200,255), level=1):
+    """
+        Write one quick-look PNG per time step of variable of CaSPAr NetCDF file.
+    """
+    import xarray as xr
+    from .plot import parse_timesteps
+    from .lod  import block_reduce
+    from .png  import write_png
+
+    tstart = time.time()
+    lut    = quicklook_lut(cname=cname, nancolour=nancolour)
+    ds     = xr.open_dataset(inputfile)
+    var    = ds[variable]
+    itimes = parse_timesteps(timesteps, var.shape[0])
+    flip   = _north_up(ds, variable)
+    ny, nx = var.shape[-2:]
+    block  = 1 if (maxsize is None) else max(1, -(-max(ny, nx) // maxsize))
+    sel    = dict([ (dd, 0) for dd in var.dims[1:-2] ])   # first level or member if any
+    tsetup = time.time() - tstart
+
+    tstart = time.time()
+    stats  = []
+    for ifig, itime in enumerate(itimes):
+        sel[var.dims[0]] = itime
+        zz = var.isel(sel).values
+        # statistics of the full-resolution field, before any block reduction
+        nnan = np.count_nonzero(np.isnan(zz))
+        if (nnan < zz.size):
+            zmin, zmax = float(np.nanmin(zz)), float(np.nanmax(zz))
+        else:
+            zmin, zmax = np.nan, np.nan
+        stats.append((zmin, zmax, nnan / float(zz.size)))
+        if (block > 1):
+            zz = block_reduce(zz, block, block, how=how)
+        if flip:
+            zz = zz[::-1,:]
+        rgba = quicklook_rgba(zz, lut, vmin=zmin if (vmin is None) else vmin, vmax=zmax if (vmax is None) else vmax)
+        write_png(pngbase+'{0:04d}.png'.format(ifig+1), rgba, level=level)
+    ds.close()
+    trender = time.time() - tstart
+
+    return {'nframes': len(itimes), 'setup': tsetup, 'render': trender, 'block': block, 'stats': stats}
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # relative imports and lib/ need the package: run the doctests of caspar.quicklook
+    import os
+    import sys
+    import doctest
+    import importlib
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # lib/
+    doctest.testmod(importlib.import_module('caspar.quicklook'), optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+"""
+    Conversion of CaSPAr variables to EnSim r2c files (Green Kenue, MESH, WATFLOOD).
+
+    r2c files are ASCII grids on a regular longitude-latitude grid (projection LATLONG) with one
+    frame per time step. Variables on regular longitude-latitude grids (e.g. GDPS) are written on
+    their own grid. Variables on rotated grids (e.g. RDPS, HRDPS, CaPA) are interpolated
+    bilinearly or conservatively onto a regular longitude-latitude grid covering the rotated
+    grid, with the cached sparse weights of regrid_weights; the default spacing is the spacing
+    of the rotated grid.
+
+    The files are streamed: a block of time steps is read, and every frame is formatted as a
+    whole and appended to the r2c file, so that memory does not grow with the number of frames.
+    Frames are formatted with numpy arithmetic on the decimal digits into a fixed-width text
+    buffer, which gives the numbers of '%.4f' formatting (up to the rounding of exact ties)
+    several times faster than np.savetxt. Time steps present in several files are written once.
+
+
+    Definition
+    ----------
+    def r2c_header(name, units, xorigin, yorigin, xdelta, ydelta, nx, ny, sourcefile=''):
+    def format_frame(zz, decimals=4):
+    def r2c_grid(ds, variable, resolution=None, bbox=None):
+    def write_r2c(files, variable, r2cfile, decimals=4, resolution=None, bbox=None, nodata=-999.,
+                  method='bilinear', chunksize=2**24, cache=True):
+
+
+    Input
+    -----
+    name         name of the attribute, e.g. variable name
+    units        units of the attribute
+    xorigin      longitude of the lower left corner of the grid
+    yorigin      latitude of the lower left corner of the grid
+    xdelta       longitude spacing of the grid
+    ydelta       latitude spacing of the grid
+    nx, ny       number of cells in longitude and latitude
+    zz           2D field (ny,nx); first row is written first
+    ds           xarray dataset
+    files        list of CaSPAr NetCDF files
+    variable     name of variable with dimensions (time, [level or member,] y, x)
+    r2cfile      name of r2c output file
+
+
+    Optional Input
+    --------------
+    sourcefile   name of source file in header (default: '')
+    decimals     number of decimals of the values (default: 4)
+    resolution   spacing [degree] of the regular grid of rotated grids (default: None, i.e. spacing of the rotated grid)
+    bbox         bounding box 'lonmin,latmin,lonmax,latmax' of the r2c grid (see parse_bbox);
+                 rotated grids covering the pole and the date line need a bounding box, otherwise
+                 the regular grid spans all longitudes (default: None, i.e. whole grid)
+    nodata       value written for missing values and outside of the rotated grid (default: -999.)
+    method       regridding method of rotated grids, see regrid_methods (default: 'bilinear')
+    chunksize    maximum number of values read at once from file (default: 2**24)
+    cache        True: read interpolation weights from / write to on-disk cache (default: True)
+
+
+    Output
+    ------
+    r2c_header    header of r2c file as string
+    format_frame  bytes of the frame, one line per row
+    r2c_grid      dictionary with 'xorigin', 'yorigin', 'xdelta', 'ydelta', 'nx', 'ny' of the regular
+                  grid and 'flip' (True if rows of variable run north to south)
+    write_r2c     dictionary with 'nframes', 'read', 'regrid', 'format' and 'write' time [s]
+
+
+    Examples
+    --------
+    >>> print(format_frame(np.array([[1., -2.5], [np.pi, 10.]]), decimals=2).decode())
+      1.00 -2.50
+      3.14 10.00
+    <BLANKLINE>
+
+    # write_r2c(sorted(glob.glob('CaPA_fine_*.nc')), 'CaPA_fine_A_PR0_SFC', 'CaPA_fine_A_PR0_SFC.r2c')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - minus sign inside the digit columns, same columns in the general formatting
+"""
+from __future__ import print_function
+import os
+import time
+import numpy as np
+
+__all__ = ['r2c_header', 'format_frame', 'r2c_grid', 'write_r2c']
+
+# -------------------------------------------------------------------------------------------------
+
+def r2c_header(name, units, xorigin, yorigin, xdelta, ydelta, nx, ny, sourcefile=''):
+    """
+        Header of r2c file of a regular longitude-latitude grid.
+    """
+    lines = ['########################################',
+             ':FileType r2c  ASCII  EnSim 1.0',
+             '#',
+             '# DataType               2D Rect Cell',
+             '#',
+             ':Application             EnSimHydrologic',
+             ':Version                 2.1.23',
+             ':WrittenBy               CaSPAr utility_scripts',
+             ':CreationDate            '+time.strftime('%Y-%m-%d %H:%M'),
+             '#',
+             '#---------------------------------------',
+             '#',
+             ':Name                    '+name,
+             '#',
+             ':Projection              LATLONG',
+             ':Ellipsoid               WGS84',
+             '#',
+             ':xOrigin                 {:.6f}'.format(xorigin),
+             ':yOrigin                 {:.6f}'.format(yorigin),
+             '#',
+             ':SourceFile              '+sourcefile,
+             '#',
+             ':AttributeName           1 '+name,
+             ':AttributeUnits          '+units,
+             '#',
+             ':xCount                  {:d}'.format(nx),
+             ':yCount                  {:d}'.format(ny),
+             ':xDelta                  {:.6f}'.format(xdelta),
+             ':yDelta                  {:.6f}'.format(ydelta),
+             '#',
+             '#',
+             ':endHeader']
+
+    return '\n'.join(lines)+'\n'
+
+def format_frame(zz, decimals=4):
+    """
+        Text of 2D field zz as bytes, one line per row, values as '%.<decimals>f' in fixed-width columns.
+    """
+    zz     = np.asarray(zz, dtype=np.float64)
+    ny, nx = zz.shape
+    scale  = 10**decimals
+    amax   = np.max(np.abs(zz)) if (zz.size > 0) else 0.
+    if (not np.isfinite(amax)) or (amax * scale >= 2.**62):
+        # no fixed-point digits: slow but general
+        vals  = [ ('%.'+str(decimals)+'f') % vv for vv in zz.ravel().tolist() ]
+        width = max([ len(vv) for vv in vals ])
+        fmt   = ((' %'+str(width)+'s')*nx+'\n')*ny
+        return (fmt % tuple(vals)).encode('ascii')
+
+    aa    = np.round(np.abs(zz.ravel()) * scale).astype(np.int64)
+    neg   = (zz.ravel() < 0.) & (aa > 0)
+    # digits of each value, at least one before the decimal point
+    point = 1 if (decimals > 0) else 0
+    ndig  = np.maximum(np.searchsorted(10**np.arange(19, dtype=np.int64), aa, side='right'), decimals+1)
+    nmax  = int(ndig.max()) if (aa.size > 0) else decimals+1
+    # the minus sign needs its own column only for negative values with nmax digits
+    nsign = 1 if np.any(neg & (ndig == nmax)) else 0
+    width = 1 + nmax + point + nsign                       # leading space
+    chars = np.empty((width, aa.size), dtype=np.uint8)     # column-wise for contiguous writes
+    chars[0] = ord(' ')
+    col   = width - 1
+    sign  = np.where(neg, ord('-'), ord(' ')).astype(np.uint8)
+    for kk in range(nmax):
+        if (kk == decimals) and (point == 1):
+            chars[col] = ord('.')
+            col -= 1
+        digit = (aa % 10).astype(np.uint8) + ord('0')
+        if (kk <= decimals):
+            chars[col] = digit
+        else:
+            # leading zeros become blanks, the minus sign goes in front of the first digit
+            lead = aa == 0
+            chars[col] = np.where(lead, sign, digit)
+            sign = np.where(lead, ord(' '), sign).astype(np.uint8)
+        aa //= 10
+        col -= 1
+    if (col >= 1):
+        chars[col] = sign
+        col -= 1
+    chars[1:col+1] = ord(' ')
+    chars = chars.T
+    lines = np.empty((ny, nx*width+1), dtype=np.uint8)
+    lines[:,:-1] = chars.reshape((ny, nx*width))
+    lines[:,-1]  = ord('\n')
+
+    return lines.tobytes()
+
+# -------------------------------------------------------------------------------------------------
+
+def r2c_grid(ds, variable, resolution=None, bbox=None):
+    """
+        Regular longitude-latitude grid of r2c file of variable and interpolation weights for rotated grids.
+    """
+    from .rotated import rotated_pole
+    ydim, xdim = ds[variable].dims[-2:]
+    pole = rotated_pole(ds, variable)
+    if (pole is None):
+        lat = ds['lat'].values
+        lon = ds['lon'].values
+        if (np.ndim(lon) == 2):
+            if not (np.all(lat == lat[:,:1]) and np.all(lon == lon[:1,:])):
+                raise ValueError('r2c_grid: grid is neither rotated nor regular in longitude and latitude: '+variable)
+            lon = lon[0,:]
+            lat = lat[:,0]
+        dlon, dlat = np.diff(lon), np.diff(lat)
+        if (lon.size < 2) or (lat.size < 2) or (not np.allclose(dlon, dlon[0], rtol=1.e-4)) or (not np.allclose(dlat, dlat[0], rtol=1.e-4)):
+            raise ValueError('r2c_grid: longitudes and latitudes not equally spaced: '+variable)
+        flip = bool(dlat[0] < 0.)
+        return {'xorigin': float(lon[0] - 0.5*dlon[0]), 'yorigin': float(min(lat[0], lat[-1]) - 0.5*abs(dlat[0])),
+                'xdelta': float(dlon[0]), 'ydelta': float(abs(dlat[0])), 'nx': lon.size, 'ny': lat.size,
+                'flip': flip}
+
+    # rotated grid: regular grid covering its cell centres
+    if resolution is None:
+        resolution = float(np.abs(np.median(np.diff(ds[xdim].values))))
+    if (bbox is None):
+        lon = np.mod(ds['lon'].values + 180., 360.) - 180.
+        lat = ds['lat'].values
+        lonmin, latmin, lonmax, latmax = np.min(lon), np.min(lat), np.max(lon), np.max(lat)
+    else:
+        from .hyperslab import parse_bbox
+        lonmin, latmin, lonmax, latmax = parse_bbox(bbox)
+    x0  = np.floor(lonmin / resolution) * resolution
+    y0  = np.floor(latmin / resolution) * resolution
+    nx  = max(1, int(np.ceil((lonmax - x0) / resolution)))
+    ny  = max(1, int(np.ceil((latmax - y0) / resolution)))
+
+    return {'xorigin': float(x0), 'yorigin': float(y0), 'xdelta': resolution, 'ydelta': resolution,
+            'nx': nx, 'ny': ny, 'flip': False}
+
+def _target(grid):
+    """ Dataset of the regular grid of r2c_grid for regrid_weights. """
+    import xarray as xr
+    lon = grid['xorigin'] + grid['xdelta'] * (np.arange(grid['nx']) + 0.5)
+    lat = grid['yorigin'] + grid['ydelta'] * (np.arange(grid['ny']) + 0.5)
+    return xr.Dataset({'r2c': (('lat', 'lon'), np.broadcast_to(np.float32(0.), (grid['ny'], grid['nx'])))},
+                      coords={'lat': lat, 'lon': lon})
+
+# -------------------------------------------------------------------------------------------------
+
+def write_r2c(files, variable, r2cfile, decimals=4, resolution=None, bbox=None, nodata=-999.,
+              method='bilinear', chunksize=2**24, cache=True):
+    """
+        Stream variable of files into one r2c file, one frame per time step.
+    """
+    import xarray as xr
+    import pandas as pd
+    from .rotated import rotated_pole
+    from .regrid  import regrid_weights, regrid
+    from .hyperslab import select_hyperslab
+    # hyperslab of bounding box; first level or member if any
+    open_slab = lambda ff: select_hyperslab(xr.open_dataset(ff), variable, bbox=bbox)
+
+    ttime = {'read': 0., 'regrid': 0., 'format': 0., 'write': 0.}
+    files = list(files)
+    ds    = open_slab(files[0])
+    grid  = r2c_grid(ds, variable, resolution=resolution, bbox=bbox)
+    units = ds[variable].attrs.get('units', '')
+    rotated = rotated_pole(ds, variable) is not None
+    if rotated:
+        tstart = time.time()
+        ww = regrid_weights(ds, variable, _target(grid), 'r2c', method=method, cache=cache)
+        ttime['regrid'] += time.time() - tstart
+    ds.close()
+
+    tmpfile = r2cfile+'.'+str(os.getpid())+'.tmp'
+    nframes = 0
+    written = set()
+    try:
+        with open(tmpfile, 'wb') as fo:
+            fo.write(r2c_header(variable, units, grid['xorigin'], grid['yorigin'], grid['xdelta'], grid['ydelta'],
+                                grid['nx'], grid['ny'], sourcefile=os.path.basename(files[0])).encode('ascii'))
+            for ff in files:
+                ds   = open_slab(ff)
+                var  = ds[variable]
+                sel  = {}
+                nt   = var.shape[0]
+                step = max(1, chunksize // int(np.prod(var.shape[-2:])))
+                times = pd.to_datetime(ds[var.dims[0]].values)
+                for it in range(0, nt, step):
+                    tstart = time.time()
+                    sel[var.dims[0]] = slice(it, it+step)
+                    zz = var.isel(sel).values
+                    ttime['read'] += time.time() - tstart
+                    if rotated:
+                        tstart = time.time()
+                        zz = regrid(ww, zz, (grid['ny'], grid['nx']))
+                        ttime['regrid'] += time.time() - tstart
+                    elif grid['flip']:
+                        zz = zz[:,::-1,:]
+                    for kk in range(zz.shape[0]):
+                        tt = times[it+kk]
+                        if tt in written:
+                            continue
+                        written.add(tt)
+                        nframes += 1
+                        tstart = time.time()
+                        frame = format_frame(np.where(np.isfinite(zz[kk]), zz[kk], nodata), decimals=decimals)
+                        ttime['format'] += time.time() - tstart
+                        tstart = time.time()
+                        fo.write(':Frame {:7d} {:7d} "{:s}"\n'.format(nframes, nframes, tt.strftime('%Y/%m/%d %H:%M:%S.000')).encode('ascii'))
+                        fo.write(frame)
+                        fo.write(b':EndFrame\n')
+                        ttime['write'] += time.time() - tstart
+                ds.close()
+    except:
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)            # no half-written r2c file
+        raise
+    os.rename(tmpfile, r2cfile)
+    ttime['nframes'] = nframes
+
+    return ttime
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+"""
+    Regridding of CaSPAr fields with sparse interpolation matrices cached on disk.
+
+    The weights of the cells of the source grid for every cell of the target grid form a sparse
+    matrix W (ntarget, nsource) in CSR format. It is computed once per pair of grids and method
+    and stored as npz in cache_dir('regrid'); later calls only read it. Regridding a field is
+    then the sparse matrix-vector product W @ z, which takes milliseconds per field; fields with
+    leading dimensions, e.g. (time, y, x), are regridded with one sparse matrix-matrix product.
+
+    Bilinear weights interpolate in the native coordinates of the source grid, i.e. in rotated
+    longitude and latitude on rotated grids (rotated_latitude_longitude) and in longitude and
+    latitude on regular grids. Target cells outside of the source grid have no weights and get NaN.
+
+    Conservative weights are the areas of the intersections of every target cell with the source
+    cells, divided by the covered area of the target cell, so that the regridded field keeps the
+    area mean, e.g. of precipitation when HRDPS is put onto the RDPS grid. The cells are spanned by
+    the corners lonh, lath as for plotting (see cell_corners; curvilinear grids are averaged as unit
+    vectors so that cells across the date line stay intact) and are intersected in an equal-area
+    sinusoidal projection centred on every target cell (the clipping of basin_weights). Target
+    cells partially covered by the source grid get the mean over the covered part.
+
+
+    Definition
+    ----------
+    def bilinear_weights(src, srcvar, lon, lat):
+    def conservative_weights(src, srcvar, tgt, tgtvar, chunksize=2**14, cache=True):
+    def regrid_key(src, srcvar, tgt, tgtvar, method='bilinear'):
+    def regrid_weights(src, srcvar, tgt, tgtvar, method='bilinear', cache=True):
+    def regrid(weights, zz, shape):
+
+
+    Input
+    -----
+    src, tgt     xarray datasets of source and target grid
+    srcvar       name of variable on the source grid
+    tgtvar       name of variable on the target grid
+    lon, lat     geographic longitudes and latitudes of the target points (any shape)
+    weights      sparse matrix of regrid_weights
+    zz           field on source grid (..., ny, nx)
+    shape        shape (ny, nx) of the target grid
+
+
+    Optional Input
+    --------------
+    method       'bilinear' or 'conservative' (default: 'bilinear')
+    chunksize    number of target cells intersected at once (default: 2**14)
+    cache        True: read from / write to on-disk cache (default: True)
+
+
+    Output
+    ------
+    bilinear_weights  scipy.sparse.csr_matrix (lon.size, nsource)
+    conservative_weights  scipy.sparse.csr_matrix (ntarget, nsource)
+    regrid_key        hex string identifying source grid, target grid and method
+    regrid_weights    scipy.sparse.csr_matrix (ntarget, nsource)
+    regrid            field on target grid (..., shape[0], shape[1]); NaN outside of the source grid
+
+
+    Examples
+    --------
+    >>> import xarray as xr
+    >>> src = xr.Dataset({'z': (('lat', 'lon'), np.arange(6.).reshape(2,3))},
+    ...                  coords={'lat': [0., 1.], 'lon': [0., 1., 2.]})
+    >>> ww  = bilinear_weights(src, 'z', np.array([0.5, 1.5, 9.]), np.array([0.5, 0.25, 0.]))
+    >>> print(regrid(ww, src['z'].values, (3,)))
+    [2.   2.25  nan]
+
+    >>> tgt = xr.Dataset({'z': (('lat', 'lon'), np.zeros((2,2)))}, coords={'lat': [0.25, 0.75], 'lon': [0.5, 1.5]})
+    >>> ww  = conservative_weights(src, 'z', tgt, 'z', cache=False)
+    >>> print(np.round(ww[0].toarray(), 3))
+    [[0.5 0.5 0.  0.  0.  0. ]]
+    >>> print(np.round(regrid(ww, src['z'].values, (2,2)), 3))
+    [[0.5 1.5]
+     [3.5 4.5]]
+
+    # ww   = regrid_weights(rdps, 'RDPS_P_PR_SFC', capa, 'CaPA_fine_A_PR0_SFC')
+    # hrdps_on_rdps = regrid(regrid_weights(hrdps, 'HRDPS_P_PR_SFC', rdps, 'RDPS_P_PR_SFC', method='conservative'),
+    #                        hrdps['HRDPS_P_PR_SFC'].values, rdps['RDPS_P_PR_SFC'].shape[-2:])
+    # rdps_on_capa = regrid(ww, rdps['RDPS_P_PR_SFC'][0].values, capa['CaPA_fine_A_PR0_SFC'].shape[-2:])
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - cell corners of conservative weights from cell_corners
+"""
+from __future__ import print_function
+import os
+import hashlib
+import numpy as np
+
+__all__ = ['bilinear_weights', 'conservative_weights', 'regrid_key', 'regrid_weights', 'regrid', 'regrid_methods']
+
+# methods of regrid_weights
+regrid_methods = ['bilinear', 'conservative']
+
+# weights already used in this process
+_weights = {}
+
+# -------------------------------------------------------------------------------------------------
+
+def _axis_weights(axis, v, periodic=False):
+    """
+        Neighbouring indexes i0, i1 in 1D axis of cell centres, weight w1 of i1 and mask of v
+        inside the cells of the axis; v between the outermost centre and edge gets the outermost cell.
+    """
+    from .grid import _edges1d
+    axis  = np.asarray(axis, dtype=np.float64)
+    v     = np.asarray(v, dtype=np.float64)
+    order = np.argsort(axis)
+    a     = axis[order]
+    n     = a.size
+    edges = _edges1d(a)
+    if periodic:
+        v = edges[0] + np.mod(v - edges[0], 360.)
+        if (edges[-1] - edges[0] >= 360. - 1.e-6):   # global: interpolate across the wrap
+            a      = np.append(a, a[0] + 360.)
+            inside = np.ones(v.shape, dtype=bool)
+            p  = np.clip(v, a[0], a[-1])
+            i0 = np.clip(np.searchsorted(a, p, side='right') - 1, 0, n-1)
+            w1 = (p - a[i0]) / (a[i0+1] - a[i0])
+            return order[i0], order[(i0+1) % n], w1, inside
+    inside = (v >= edges[0]) & (v <= edges[-1])
+    if (n == 1):
+        zero = np.zeros(v.shape, dtype=np.intp)
+        return zero, zero, np.zeros(v.shape), inside
+    p  = np.clip(v, a[0], a[-1])
+    i0 = np.clip(np.searchsorted(a, p, side='right') - 1, 0, n-2)
+    w1 = (p - a[i0]) / (a[i0+1] - a[i0])
+
+    return order[i0], order[i0+1], w1, inside
+
+def _native_axes(ds, variable):
+    """ 1D y and x axes of the grid of variable and transform of geographic to these coordinates. """
+    from .rotated import rotated_pole, geo2rotated
+    ydim, xdim = ds[variable].dims[-2:]
+    pole = rotated_pole(ds, variable)
+    if (pole is not None):
+        return ds[ydim].values, ds[xdim].values, (lambda lon, lat: geo2rotated(lon, lat, pole[0], pole[1]))
+    lon = ds['lon'].values
+    lat = ds['lat'].values
+    if (np.ndim(lon) == 2):
+        if not (np.all(lat == lat[:,:1]) and np.all(lon == lon[:1,:])):
+            raise ValueError('regrid: grid is neither rotated nor regular in longitude and latitude: '+variable)
+        lon = lon[0,:]
+        lat = lat[:,0]
+
+    return lat, lon, (lambda lon, lat: (lon, lat))
+
+def _chord(lon1, lat1, lon2, lat2):
+    """ Distance on the unit sphere (chord) between points lon1, lat1 and lon2, lat2 [degree]. """
+    dphi = np.deg2rad(lat2 - lat1)
+    dlam = np.deg2rad(lon2 - lon1)
+    hav  = np.sin(0.5*dphi)**2 + np.cos(np.deg2rad(lat1)) * np.cos(np.deg2rad(lat2)) * np.sin(0.5*dlam)**2
+
+    return 2. * np.sqrt(np.clip(hav, 0., 1.))
+
+def _sphere_corners(lon, lat):
+    """
+        Cell corners (ny+1,nx+1) of cell_corners and maximum distance of corners from centre on
+        the unit sphere of cells lon, lat (ny,nx).
+    """
+    from .grid import cell_corners
+    lonh, lath = cell_corners(lon, lat)
+    lonh, lath = np.asarray(lonh, dtype=np.float64), np.asarray(lath, dtype=np.float64)
+    radius = np.zeros(lon.shape)
+    for sy, sx in [(slice(None, -1), slice(None, -1)), (slice(None, -1), slice(1, None)),
+                   (slice(1, None), slice(None, -1)), (slice(1, None), slice(1, None))]:
+        radius = np.maximum(radius, _chord(lon, lat, lonh[sy,sx], lath[sy,sx]))
+
+    return lonh, lath, np.ravel(radius)
+
+def _quads(lonh, lath, cells):
+    """ Longitudes and latitudes (k,4) of the corners of cells, counter-clockwise in index space. """
+    iy, ix = np.divmod(cells, lonh.shape[1]-1)
+    qlon   = np.stack([ lonh[iy+dy,ix+dx] for dy, dx in [(0, 0), (0, 1), (1, 1), (1, 0)] ], axis=1)
+    qlat   = np.stack([ lath[iy+dy,ix+dx] for dy, dx in [(0, 0), (0, 1), (1, 1), (1, 0)] ], axis=1)
+
+    return qlon, qlat
+
+def _counter_clockwise(x, y):
+    """ Quadrilaterals x, y (k,4) in counter-clockwise order. """
+    from .basins import _signed_area
+    clockwise = _signed_area(x, y) < 0.
+    x[clockwise], y[clockwise] = x[clockwise,::-1], y[clockwise,::-1]
+
+    return x, y
+
+# -------------------------------------------------------------------------------------------------
+
+def bilinear_weights(src, srcvar, lon, lat):
+    """
+        Sparse bilinear interpolation matrix from the grid of srcvar to the points lon, lat.
+    """
+    import scipy.sparse as sp
+    yaxis, xaxis, transform = _native_axes(src, srcvar)
+    ny, nx = yaxis.size, xaxis.size
+    xx, yy = transform(np.ravel(lon), np.ravel(lat))
+    iy0, iy1, wy, yin = _axis_weights(yaxis, yy)
+    ix0, ix1, wx, xin = _axis_weights(xaxis, xx, periodic=True)
+    ok   = yin & xin
+    rows = np.nonzero(ok)[0]
+    iy0, iy1, wy = iy0[ok], iy1[ok], wy[ok]
+    ix0, ix1, wx = ix0[ok], ix1[ok], wx[ok]
+    cols = np.concatenate([iy0*nx+ix0, iy0*nx+ix1, iy1*nx+ix0, iy1*nx+ix1])
+    data = np.concatenate([(1.-wy)*(1.-wx), (1.-wy)*wx, wy*(1.-wx), wy*wx]).astype(np.float32)
+    ww   = sp.csr_matrix((data, (np.tile(rows, 4), cols)), shape=(np.size(lon), ny*nx))
+    ww.eliminate_zeros()
+
+    return ww
+
+def conservative_weights(src, srcvar, tgt, tgtvar, chunksize=2**14, cache=True):
+    """
+        Sparse area-weighted (first-order conservative) regridding matrix from the grid of srcvar to the grid of tgtvar.
+    """
+    import scipy.sparse as sp
+    from .grid     import cell_centres
+    from .basins   import _sinusoidal, _signed_area, _clip
+    from .stations import station_tree, _xyz
+    slon, slat = cell_centres(src['lon'].values, src['lat'].values)
+    tlon, tlat = cell_centres(tgt['lon'].values, tgt['lat'].values)
+    slonh, slath, sradius = _sphere_corners(slon.astype(np.float64), slat.astype(np.float64))
+    tlonh, tlath, tradius = _sphere_corners(tlon.astype(np.float64), tlat.astype(np.float64))
+    stree = station_tree(slon, slat, cache=cache)
+    clon  = np.ravel(tlon).astype(np.float64)
+    clat  = np.ravel(tlat).astype(np.float64)
+    ntgt  = clon.size
+    rows, cols, areas = [], [], []
+    for kk in range(0, ntgt, chunksize):
+        tcells = np.arange(kk, min(kk+chunksize, ntgt))
+        # source cells within reach of the target cells
+        cand   = stree.query_ball_point(_xyz(clon[tcells], clat[tcells]), tradius[tcells] + sradius.max())
+        count  = np.array([ len(cc) for cc in cand ])
+        if (count.sum() == 0):
+            continue
+        ti     = np.repeat(tcells, count)
+        si     = np.concatenate([ cc for cc in cand if len(cc) > 0 ]).astype(np.int64)
+        lon0   = clon[ti][:,np.newaxis]
+        tx, ty = _counter_clockwise(*_sinusoidal(*_quads(tlonh, tlath, ti), lon0=lon0))
+        sx, sy = _counter_clockwise(*_sinusoidal(*_quads(slonh, slath, si), lon0=lon0))
+        kept, px, py = _clip(sx, sy, tx, ty)
+        area   = _signed_area(px, py)
+        ok     = area > 0.
+        rows.append(ti[kept][ok])
+        cols.append(si[kept][ok])
+        areas.append(area[ok])
+    if (len(rows) == 0):
+        return sp.csr_matrix((ntgt, slon.size), dtype=np.float32)
+    ww = sp.csr_matrix((np.concatenate(areas), (np.concatenate(rows), np.concatenate(cols))), shape=(ntgt, slon.size))
+    covered = np.asarray(ww.sum(axis=1)).ravel()
+    ww.data = (ww.data / np.repeat(covered, np.diff(ww.indptr))).astype(np.float32)
+
+    return ww
+
+# -------------------------------------------------------------------------------------------------
+
+def regrid_key(src, srcvar, tgt, tgtvar, method='bilinear'):
+    """
+        Hex key of source grid, target grid and method.
+    """
+    from .grid    import grid_fingerprint, corners_version
+    from .rotated import rotated_pole
+    hh = hashlib.sha1()
+    for ds, var in [(src, srcvar), (tgt, tgtvar)]:
+        hh.update(grid_fingerprint(ds['lon'].values, ds['lat'].values).encode('ascii'))
+        hh.update(str((rotated_pole(ds, var), ds[var].shape[-2:])).encode('ascii'))
+    hh.update(method.encode('ascii'))
+    if (method == 'conservative'):
+        # conservative weights depend on the cell corners
+        hh.update('corners_c{:d}'.format(corners_version).encode('ascii'))
+
+    return hh.hexdigest()
+
+def regrid_weights(src, srcvar, tgt, tgtvar, method='bilinear', cache=True):
+    """
+        Sparse regridding matrix from grid of srcvar to grid of tgtvar, from the on-disk cache if possible.
+    """
+    import scipy.sparse as sp
+    if method not in regrid_methods:
+        raise ValueError('regrid_weights: method must be one of '+', '.join(regrid_methods)+': '+str(method))
+
+    key = regrid_key(src, srcvar, tgt, tgtvar, method=method)
+    if key in _weights:
+        return _weights[key]
+    if cache:
+        from .cache import cache_dir, save_npz
+        cfile = os.path.join(cache_dir('regrid'), key+'.npz')
+        if os.path.exists(cfile):
+            with np.load(cfile) as ff:
+                _weights[key] = sp.csr_matrix((ff['data'], ff['indices'], ff['indptr']), shape=tuple(ff['shape']))
+            return _weights[key]
+
+    if (method == 'conservative'):
+        ww = conservative_weights(src, srcvar, tgt, tgtvar, cache=cache)
+    else:
+        from .grid import cell_centres
+        lon, lat = cell_centres(tgt['lon'].values, tgt['lat'].values)
+        ww = bilinear_weights(src, srcvar, lon, lat)
+    if cache:
+        save_npz(cfile, data=ww.data, indices=ww.indices, indptr=ww.indptr, shape=np.array(ww.shape))
+    _weights.clear()                  # keep only the last weights in memory
+    _weights[key] = ww
+
+    return ww
+
+def regrid(weights, zz, shape):
+    """
+        Field zz (..., ny, nx) on the target grid of weights (..., shape); NaN where there are no weights.
+    """
+    zz    = np.asarray(zz)
+    lead  = zz.shape[:-2]
+    nsrc  = zz.shape[-2] * zz.shape[-1]
+    flat  = zz.reshape((-1, nsrc)).T                  # (nsource, nfields)
+    out   = weights.dot(flat).T                       # one sparse matrix-matrix product
+    empty = np.diff(weights.indptr) == 0              # target cells outside of the source grid
+    out[:,empty] = np.nan
+
+    return out.reshape(lead + tuple(shape))
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # relative imports and lib/ need the package: run the doctests of caspar.regrid
+    import os
+    import sys
+    import doctest
+    import importlib
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # lib/
+    doctest.testmod(importlib.import_module('caspar.regrid'), optionflags=doctest.NORMALIZE_WHITESPACE)
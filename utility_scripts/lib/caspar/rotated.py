@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+    Transformation between rotated and geographic latitudes and longitudes.
+
+    The rotated grid is defined as in CF grid_mapping 'rotated_latitude_longitude' by the
+    geographic position of its north pole (grid_north_pole_latitude, grid_north_pole_longitude).
+    The origin (0,0) of the rotated grid then lies at latitude 90-pole_lat and longitude pole_lon-180.
+
+
+    Definition
+    ----------
+    def rotated2geo(rlon, rlat, pole_lon, pole_lat):
+    def geo2rotated(lon, lat, pole_lon, pole_lat):
+    def rotated_pole(ds, variable):
+
+
+    Input
+    -----
+    rlon, rlat          rotated longitudes and latitudes [degree] (scalar or ND-array)
+    lon, lat            geographic longitudes and latitudes [degree] (scalar or ND-array)
+    pole_lon, pole_lat  geographic longitude and latitude of the rotated north pole [degree]
+    ds                  xarray dataset
+    variable            name of variable in ds
+
+
+    Output
+    ------
+    lon, lat     of rotated2geo: geographic longitudes in [-180,180) and latitudes
+    rlon, rlat   of geo2rotated: rotated longitudes in [-180,180) and latitudes
+    rotated_pole pole_lon, pole_lat of the grid_mapping 'rotated_latitude_longitude' of variable;
+                 None if variable is not on a rotated grid
+
+
+    Examples
+    --------
+    >>> lon, lat = rotated2geo(0., 0., 87.597031, 31.758312)
+    >>> print('{:.3f} {:.3f}'.format(lon, lat))
+    -92.403 58.242
+
+    >>> rlon, rlat = geo2rotated(lon, lat, 87.597031, 31.758312)
+    >>> print(abs(rlon) < 1e-10, abs(rlat) < 1e-10)
+    True True
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import numpy as np
+
+__all__ = ['rotated2geo', 'geo2rotated', 'rotated_pole']
+
+# -------------------------------------------------------------------------------------------------
+
+def _rotate(lon, lat, pole_lon, pole_lat, inverse=False):
+    """ Rotate points on the sphere given in degrees. """
+    lam   = np.deg2rad(lon)
+    phi   = np.deg2rad(lat)
+    sinp  = np.sin(np.deg2rad(pole_lat))
+    cosp  = np.cos(np.deg2rad(pole_lat))
+    dlam  = np.deg2rad(pole_lon - 180.)
+
+    if inverse:
+        lam = lam - dlam
+    x = np.cos(phi) * np.cos(lam)
+    y = np.cos(phi) * np.sin(lam)
+    z = np.sin(phi)
+
+    if inverse:
+        xr =  sinp * x + cosp * z
+        zr = -cosp * x + sinp * z
+    else:
+        xr =  sinp * x - cosp * z
+        zr =  cosp * x + sinp * z
+
+    olat = np.rad2deg(np.arcsin(np.clip(zr, -1., 1.)))
+    olam = np.arctan2(y, xr)
+    if not inverse:
+        olam = olam + dlam
+    olon = (np.rad2deg(olam) + 180.) % 360. - 180.
+
+    return olon, olat
+
+def rotated2geo(rlon, rlat, pole_lon, pole_lat):
+    """
+        Geographic longitudes and latitudes of rotated longitudes and latitudes.
+    """
+    return _rotate(rlon, rlat, pole_lon, pole_lat)
+
+def geo2rotated(lon, lat, pole_lon, pole_lat):
+    """
+        Rotated longitudes and latitudes of geographic longitudes and latitudes.
+    """
+    return _rotate(lon, lat, pole_lon, pole_lat, inverse=True)
+
+# -------------------------------------------------------------------------------------------------
+
+def rotated_pole(ds, variable):
+    """
+        Longitude and latitude of rotated north pole of grid_mapping of variable; None if not rotated.
+    """
+    gm = ds[variable].attrs.get('grid_mapping', '')
+    if (gm not in ds.variables):
+        return None
+    attrs = ds[gm].attrs
+    if (attrs.get('grid_mapping_name', '') != 'rotated_latitude_longitude'):
+        return None
+
+    return float(attrs['grid_north_pole_longitude']), float(attrs['grid_north_pole_latitude'])
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+    Common colour scale of a variable over many CaSPAr files and time steps.
+
+    Frames coloured with the minimum and maximum of each time step cannot be compared with each
+    other. The files are therefore streamed once, a few time steps at a time, keeping the running
+    minimum and maximum and a random sample of fixed size of all valid values. The sample gives
+    approximate quantiles, e.g. the 1st and 99th percentile, which are a robust colour range.
+    Sketches of single files are merged, so that the files can be read in parallel.
+
+    The sample is a bottom-k sample: every value gets a random key and the nsample values with
+    the smallest keys are kept. This is a uniform random sample of all values seen, and two
+    samples are merged by keeping the nsample smallest keys of both. The rank error of the
+    quantiles is about sqrt(q*(1-q)/nsample), i.e. 0.03% for the 1st percentile with the
+    default nsample=100000.
+
+
+    Definition
+    ----------
+    class ScaleSketch(object):
+        def __init__(self, nsample=100000, seed=None):
+        def update(self, values):
+        def merge(self, other):
+        def quantile(self, q):
+    def file_sketch(inputfile, variable, nsample=100000, chunksize=2**24):
+    def global_scale(files, variable, quantiles=[1., 99.], nsample=100000, nprocs=1):
+    def scale_norm(scale, mode='quantile'):
+
+
+    Input
+    -----
+    ScaleSketch.update
+        values     array of any shape; NaN and Inf are ignored
+    ScaleSketch.merge
+        other      ScaleSketch
+    ScaleSketch.quantile
+        q          quantile(s) in percent
+    file_sketch, global_scale
+        inputfile  name of CaSPAr NetCDF file
+        files      list of CaSPAr NetCDF files
+        variable   name of variable (time, [level or member,] y, x); only the first level or member
+                   is used, as in plot_caspar and quicklook
+    scale_norm
+        scale      dictionary of global_scale
+
+
+    Optional Input
+    --------------
+    nsample    size of random sample for the quantiles (default: 100000)
+    seed       seed of random keys (default: None)
+    chunksize  maximum number of values read at once from file (default: 2**24)
+    quantiles  percentiles of the colour range (default: [1., 99.])
+    nprocs     number of processes reading files in parallel (default: 1; 0: number of cores)
+    mode       'quantile': colour range from first to last of quantiles (default)
+               'minmax':   colour range from minimum to maximum
+
+
+    Output
+    ------
+    ScaleSketch        running 'count', 'min' and 'max' of valid values and random sample
+    file_sketch        ScaleSketch of all time steps of variable in file
+    global_scale       dictionary with 'count', 'min', 'max', 'quantiles' and their values 'qvalues',
+                       and list of unreadable files with error message 'failed'
+    scale_norm         matplotlib.colors.Normalize with fixed vmin and vmax
+
+
+    Examples
+    --------
+    >>> sk1 = ScaleSketch(nsample=1000, seed=1)
+    >>> sk1.update(np.arange(5000.))
+    >>> sk2 = ScaleSketch(nsample=1000, seed=2)
+    >>> sk2.update(np.array([np.nan, 5000., 9999.]))
+    >>> sk2.update(np.arange(5001., 9999.))
+    >>> sk1.merge(sk2)
+    >>> print(sk1.count, sk1.min, sk1.max, len(sk1.values))
+    10000 0.0 9999.0 1000
+    >>> print(abs(sk1.quantile(50.) - 5000.) < 500.)
+    True
+
+    # scale = global_scale(glob.glob('RDPS_*.nc'), 'RDPS_P_PR_SFC', nprocs=8)
+    # norm  = scale_norm(scale)
+    # plot_caspar('RDPS_2017100212.nc', 'RDPS_P_PR_SFC', pngbase='RDPS_', timesteps='all', norm=norm)
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - first level or member of 4D variables
+"""
+from __future__ import print_function
+import numpy as np
+
+__all__ = ['ScaleSketch', 'file_sketch', 'global_scale', 'scale_norm']
+
+# -------------------------------------------------------------------------------------------------
+
+class ScaleSketch(object):
+    """
+        Running count, minimum and maximum and bottom-k random sample of valid values.
+    """
+
+    def __init__(self, nsample=100000, seed=None):
+        self.nsample = nsample
+        self.count   = 0
+        self.min     = np.inf
+        self.max     = -np.inf
+        self.keys    = np.empty(0, dtype=np.float64)
+        self.values  = np.empty(0, dtype=np.float64)
+        self._random = np.random.RandomState(seed)
+
+    def _keep(self, keys, values):
+        """ Keep nsample values with smallest keys. """
+        if (keys.size > self.nsample):
+            ii     = np.argpartition(keys, self.nsample-1)[:self.nsample]
+            keys   = keys[ii]
+            values = values[ii]
+        self.keys   = keys
+        self.values = values
+
+    def update(self, values):
+        """ Add valid values of array. """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if (values.size == 0):
+            return
+        self.count += values.size
+        self.min    = min(self.min, values.min())
+        self.max    = max(self.max, values.max())
+        keys        = self._random.random_sample(values.size)
+        if (values.size > self.nsample):   # only the smallest keys of the chunk can stay
+            ii     = np.argpartition(keys, self.nsample-1)[:self.nsample]
+            keys   = keys[ii]
+            values = values[ii]
+        self._keep(np.concatenate((self.keys, keys)), np.concatenate((self.values, values)))
+
+    def merge(self, other):
+        """ Merge other sketch into this one. """
+        self.count += other.count
+        self.min    = min(self.min, other.min)
+        self.max    = max(self.max, other.max)
+        self._keep(np.concatenate((self.keys, other.keys)), np.concatenate((self.values, other.values)))
+
+    def quantile(self, q):
+        """ Approximate quantile(s) q [%] of all values. """
+        if (self.values.size == 0):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) > 0 else np.nan
+
+        return np.percentile(self.values, q)
+
+# -------------------------------------------------------------------------------------------------
+
+def file_sketch(inputfile, variable, nsample=100000, chunksize=2**24):
+    """
+        ScaleSketch of variable in file, read a few time steps at a time.
+    """
+    import xarray as xr
+    from .hyperslab import select_hyperslab
+
+    sketch = ScaleSketch(nsample=nsample)
+    ds     = xr.open_dataset(inputfile)
+    var    = select_hyperslab(ds, variable)[variable]   # first level or member, as plotted
+    nt     = var.shape[0]
+    step   = max(1, chunksize // max(1, int(np.prod(var.shape[1:]))))
+    for it in range(0, nt, step):
+        sketch.update(var[it:it+step].values)
+    ds.close()
+
+    return sketch
+
+def _file_sketch(args):
+    """ file_sketch for pool; returns file name, sketch and error message. """
+    inputfile, variable, nsample = args
+    try:
+        return inputfile, file_sketch(inputfile, variable, nsample=nsample), ''
+    except Exception as e:
+        return inputfile, None, type(e).__name__+': '+str(e)
+
+# -------------------------------------------------------------------------------------------------
+
+def global_scale(files, variable, quantiles=[1., 99.], nsample=100000, nprocs=1):
+    """
+        Count, minimum, maximum and quantiles of variable over all files and time steps.
+    """
+    jobs = [ (ff, variable, nsample) for ff in files ]
+    if (nprocs <= 0):
+        import multiprocessing as mp
+        nprocs = mp.cpu_count()
+    nprocs = min(nprocs, len(files))
+
+    if (nprocs > 1):
+        import multiprocessing as mp
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        results = list(pool.imap_unordered(_file_sketch, jobs, chunksize=1))
+        pool.close()
+        pool.join()
+    else:
+        results = [ _file_sketch(job) for job in jobs ]
+
+    sketch = ScaleSketch(nsample=nsample)
+    failed = []
+    for inputfile, isketch, error in results:
+        if (error != ''):
+            failed.append((inputfile, error))
+        else:
+            sketch.merge(isketch)
+    if (sketch.count == 0):
+        raise ValueError('global_scale: no valid values of '+variable+' in files: '+'; '.join([ ff+': '+ee for ff, ee in failed ]))
+
+    return {'count': sketch.count, 'min': float(sketch.min), 'max': float(sketch.max),
+            'quantiles': list(quantiles), 'qvalues': [ float(qq) for qq in sketch.quantile(quantiles) ],
+            'failed': failed}
+
+# -------------------------------------------------------------------------------------------------
+
+def scale_norm(scale, mode='quantile'):
+    """
+        Fixed matplotlib Normalize of global_scale from first to last quantile or from min to max.
+    """
+    import matplotlib as mpl
+    if (mode == 'quantile'):
+        return mpl.colors.Normalize(vmin=scale['qvalues'][0], vmax=scale['qvalues'][-1])
+    elif (mode == 'minmax'):
+        return mpl.colors.Normalize(vmin=scale['min'], vmax=scale['max'])
+    else:
+        raise ValueError('scale_norm: mode must be quantile or minmax: '+str(mode))
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
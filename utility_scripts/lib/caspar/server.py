@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+"""
+    Resident render server for CaSPAr plots on a local UNIX socket.
+
+    Importing xarray, pandas, matplotlib and Basemap and building the Basemap of a product
+    takes several seconds, often longer than drawing a small map. The server does this once
+    and then keeps imports, Basemaps, colour maps and grid geometries in memory. Jobs are sent
+    as one line of JSON with the keyword arguments of plot_caspar and answered with one line
+    of JSON. Jobs are rendered one after the other in the server process because matplotlib
+    is not thread-safe; start several servers on different sockets for parallel rendering.
+    A client that does not send its job within timeout seconds is dropped, so that it cannot
+    block the server. The plot style (rc parameters and backend) is set per job from its
+    output type, PNG or PDF, as in a local run.
+
+    Jobs (besides the keywords of plot_caspar):
+        {'command': 'ping'}   answer with the process id of the server
+        {'command': 'stop'}   stop the server
+        {'command': 'plot', 'inputfile': ..., 'variable': ..., 'pngbase': ...}   plot (default command)
+
+    Answers:
+        {'ok': True,  'result': <dictionary of plot_caspar>, 'time': <seconds>}
+        {'ok': False, 'error': '<exception>: <message>'}
+
+
+    Definition
+    ----------
+    def default_socket():
+    def serve(socketfile=None, warm=[], verbose=True, timeout=10.):
+    def submit(job, socketfile=None):
+
+
+    Input
+    -----
+    submit
+        job         dictionary with command and keyword arguments of plot_caspar;
+                    file names should be absolute because the server has its own working directory
+
+
+    Optional Input
+    --------------
+    serve, submit
+        socketfile  name of UNIX socket (default: default_socket())
+    serve
+        warm        list of products whose Basemaps are built at start (default: [])
+        verbose     True: print one line per job (default: True)
+        timeout     seconds to wait for the job line of a client before dropping it (default: 10)
+
+
+    Output
+    ------
+    default_socket  CASPAR_SOCKET or render.sock in cache_dir()
+    serve           None; runs until a stop command or KeyboardInterrupt
+    submit          answer dictionary of the server; None if no server is listening on socketfile
+
+
+    Examples
+    --------
+    # in one shell
+    # serve(warm=['RDPS', 'HRDPS'])
+
+    # in another process
+    # answer = submit({'inputfile': '/data/RDPS_2017100212.nc', 'variable': 'RDPS_P_PR_SFC',
+    #                  'pngbase': '/data/png/RDPS_', 'timesteps': 'all'})
+    # if answer is None: print('no server running')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - timeout of clients, plot style per job
+"""
+from __future__ import print_function
+import os
+import json
+import socket
+import time
+
+__all__ = ['default_socket', 'serve', 'submit']
+
+# keyword arguments of plot_caspar accepted in jobs
+_plot_keys = ['inputfile', 'variable', 'pngbase', 'pdffile', 'timesteps', 'engine',
+              'seltime', 'level', 'bbox', 'lod', 'norm', 'rasterdpi', 'cmap']
+
+# -------------------------------------------------------------------------------------------------
+
+def _readline(conn):
+    """ Read bytes from socket connection up to newline. """
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+
+    return data
+
+def _outtype(job):
+    """ Output type 'png' or 'pdf' of plot job as in plot_caspar; the server cannot plot on screen. """
+    if (job.get('pdffile', '') != ''):
+        return 'pdf'
+    if (job.get('pngbase', '') != ''):
+        return 'png'
+    raise ValueError('server renders only PNG or PDF: pngbase or pdffile needed')
+
+def _connect(socketfile):
+    """ Connected socket or None if nobody listens on socketfile. """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socketfile)
+    except (socket.error, OSError):
+        sock.close()
+        return None
+
+    return sock
+
+# -------------------------------------------------------------------------------------------------
+
+def default_socket():
+    """
+        UNIX socket of the render server: CASPAR_SOCKET or render.sock in cache directory.
+    """
+    if 'CASPAR_SOCKET' in os.environ:
+        return os.environ['CASPAR_SOCKET']
+    from .cache import cache_dir
+
+    return os.path.join(cache_dir(), 'render.sock')
+
+# -------------------------------------------------------------------------------------------------
+
+def serve(socketfile=None, warm=[], verbose=True, timeout=10.):
+    """
+        Render jobs received on UNIX socket until stop command.
+    """
+    from .plot     import set_plot_style, plot_caspar, _get_cmap
+    from .products import get_basemap
+
+    if socketfile is None:
+        socketfile = default_socket()
+    if os.path.exists(socketfile):
+        sock = _connect(socketfile)
+        if sock is not None:
+            sock.close()
+            raise ValueError('serve: server already running on '+socketfile)
+        os.remove(socketfile)   # stale socket of a killed server
+
+    # warm up: imports, colour map and Basemaps
+    tstart = time.time()
+    set_plot_style('png')
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    import xarray as xr
+    import pandas as pd
+    _get_cmap()
+    for product in warm:
+        get_basemap(product)
+    if verbose:
+        print('Render server ready in {:.2f} s on {:s} (process {:d})'.format(time.time()-tstart, socketfile, os.getpid()))
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socketfile)
+    server.listen(16)
+    try:
+        running = True
+        while running:
+            conn, addr = server.accept()
+            conn.settimeout(timeout)   # jobs run serially: a silent client must not block the server
+            try:
+                tstart  = time.time()
+                job     = {}
+                command = ''
+                try:
+                    line = _readline(conn)
+                except socket.timeout:
+                    if verbose:
+                        print('  dropped client without job after {:.0f} s'.format(timeout))
+                    continue
+                try:
+                    job     = json.loads(line.decode('utf-8'))
+                    command = job.get('command', 'plot')
+                    if (command == 'ping'):
+                        answer = {'ok': True, 'pid': os.getpid()}
+                    elif (command == 'stop'):
+                        answer  = {'ok': True}
+                        running = False
+                    elif (command == 'plot'):
+                        kwargs = dict([ (kk, job[kk]) for kk in _plot_keys if kk in job ])
+                        # rc parameters and backend of the output type, as in a local run
+                        mpl.rc_file_defaults()
+                        set_plot_style(_outtype(kwargs))
+                        result = plot_caspar(verbose=False, **kwargs)
+                        answer = {'ok': True, 'result': result, 'time': time.time()-tstart}
+                    else:
+                        raise ValueError('unknown command: '+str(command))
+                except Exception as e:
+                    plt.close('all')
+                    answer = {'ok': False, 'error': type(e).__name__+': '+str(e)}
+                try:
+                    conn.sendall(json.dumps(answer).encode('utf-8')+b'\n')
+                except socket.timeout:
+                    if verbose:
+                        print('  dropped client not reading its answer')
+            finally:
+                conn.close()
+            if verbose and (command == 'plot'):
+                print('  {:s}: {:s} in {:.2f} s'.format(str(job.get('inputfile', '')),
+                                                       'ok' if answer['ok'] else answer['error'], time.time()-tstart))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socketfile):
+            os.remove(socketfile)
+
+# -------------------------------------------------------------------------------------------------
+
+def submit(job, socketfile=None):
+    """
+        Send job to render server and wait for the answer; None if no server is running.
+    """
+    if socketfile is None:
+        socketfile = default_socket()
+    if not os.path.exists(socketfile):
+        return None
+    sock = _connect(socketfile)
+    if sock is None:
+        return None
+    try:
+        sock.sendall(json.dumps(job).encode('utf-8')+b'\n')
+        answer = json.loads(_readline(sock).decode('utf-8'))
+    finally:
+        sock.close()
+
+    return answer
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+    Per-stage timing of the CaSPAr tools: wall time, CPU time and peak memory as JSON lines.
+
+    Library functions mark their stages with the context manager stage(name). Nothing is
+    measured until profiling is switched on with enable_profile, so that the hooks cost
+    next to nothing in normal runs. When on, every finished stage is written as one line of
+    JSON, e.g.
+        {"stage": "read", "wall": 0.41, "cpu": 0.39, "peakrss": 812.3, "pid": 4711, "frame": 2}
+    Optionally every stage runs under cProfile and the profile of the slowest stage is kept,
+    which can be written with dump_profile and read with pstats or snakeviz. Stages can be
+    nested; cProfile then only profiles the outermost stage.
+
+
+    Definition
+    ----------
+    def enable_profile(jsonfile='-', cprofile=False):
+    def disable_profile():
+    def stage(name, **info):
+    def profile_records():
+    def dump_profile(filename):
+
+
+    Input
+    -----
+    stage
+        name       name of stage, e.g. 'open', 'read', 'projection', 'draw', 'savefig'
+    dump_profile
+        filename   name of cProfile output file (pstats format)
+
+
+    Optional Input
+    --------------
+    enable_profile
+        jsonfile   file to which JSON lines are appended; '-': standard output; None: only keep
+                   them in memory (default: '-')
+        cprofile   True: run stages under cProfile and keep profile of slowest stage (default: False)
+    stage
+        **info     additional items of the JSON line, e.g. frame=2 or inputfile='RDPS.nc'
+
+
+    Output
+    ------
+    stage            context manager
+    profile_records  list of dictionaries of all stages recorded since enable_profile
+    dump_profile     name of slowest stage (None if no profile was kept)
+
+
+    Examples
+    --------
+    # enable_profile(jsonfile='profile.jsonl', cprofile=True)
+    # plot_caspar('RDPS_2017100212.nc', 'RDPS_P_PR_SFC', pngbase='RDPS_', timesteps='all')
+    # dump_profile('slowest_stage.prof')
+
+    # in a library function
+    # with stage('projection', product=product):
+    #     xx, yy = project_grid(map, product, geometry)
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+__all__ = ['enable_profile', 'disable_profile', 'stage', 'profile_records', 'dump_profile']
+
+# profiling state of the process
+_profile = {'enabled': False, 'jsonfile': None, 'cprofile': False, 'depth': 0,
+            'records': [], 'slowest': None}
+
+# -------------------------------------------------------------------------------------------------
+
+def enable_profile(jsonfile='-', cprofile=False):
+    """
+        Switch on recording of stages.
+    """
+    _profile['enabled']  = True
+    _profile['jsonfile'] = jsonfile
+    _profile['cprofile'] = cprofile
+    _profile['depth']    = 0
+    _profile['records']  = []
+    _profile['slowest']  = None
+
+def disable_profile():
+    """
+        Switch off recording of stages.
+    """
+    _profile['enabled'] = False
+
+def profile_records():
+    """
+        Records of all stages since enable_profile.
+    """
+    return list(_profile['records'])
+
+def dump_profile(filename):
+    """
+        Write cProfile statistics of the slowest stage; returns its name.
+    """
+    if _profile['slowest'] is None:
+        return None
+    wall, name, profiler = _profile['slowest']
+    profiler.dump_stats(filename)
+
+    return name
+
+# -------------------------------------------------------------------------------------------------
+
+def _write(record):
+    """ Append record as JSON line to jsonfile. """
+    jsonfile = _profile['jsonfile']
+    if jsonfile is None:
+        return
+    line = json.dumps(record)
+    if (jsonfile == '-'):
+        print(line)
+        sys.stdout.flush()
+    else:
+        with open(jsonfile, 'a') as ff:   # one short write per line: lines of several processes do not mix
+            ff.write(line+'\n')
+
+@contextmanager
+def stage(name, **info):
+    """
+        Context manager recording wall time, CPU time and peak RSS of the enclosed stage.
+    """
+    if not _profile['enabled']:
+        yield
+        return
+
+    from .hyperslab import peak_rss
+
+    profiler = None
+    if _profile['cprofile'] and (_profile['depth'] == 0):
+        import cProfile
+        profiler = cProfile.Profile()
+    _profile['depth'] += 1
+    cpu0  = time.process_time() if hasattr(time, 'process_time') else time.clock()
+    wall0 = time.time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.time() - wall0
+        cpu  = (time.process_time() if hasattr(time, 'process_time') else time.clock()) - cpu0
+        _profile['depth'] -= 1
+        record = {'stage': name, 'wall': wall, 'cpu': cpu, 'peakrss': peak_rss(), 'pid': os.getpid()}
+        record.update(info)
+        _profile['records'].append(record)
+        _write(record)
+        if (profiler is not None) and ((_profile['slowest'] is None) or (wall > _profile['slowest'][0])):
+            _profile['slowest'] = (wall, name, profiler)
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+"""
+    Time series of CaSPAr variables at stations given by longitude and latitude.
+
+    The cell centres of a grid, which may be curvilinear, are put as points on the unit sphere
+    into a KD-tree (scipy.spatial.cKDTree), so that chordal distances are true nearest
+    neighbours everywhere, also close to the poles and across the date line. The tree is built
+    once per grid and cached in memory and on disk (pickle in cache_dir('stations')) under the
+    fingerprint of the grid. The stations are located with one query of the tree:
+
+        nearest   value of the nearest cell
+        bilinear  bilinear interpolation in the grid cell (quadrilateral of four cell centres)
+                  containing the station; the quadrilateral is inverted in the plane tangent
+                  to the sphere at the station. Stations in the outermost half cell, where no
+                  quadrilateral contains them, get the nearest cell.
+
+    Stations farther than half a cell diagonal from the nearest cell centre are outside of
+    the grid and get NaN.
+
+    Every file is opened once. The hyperslab covering all cells needed, i.e. the bounding box
+    of the stations in grid indexes, is read for a block of time steps at once and all
+    stations are taken from it with one numpy fancy-indexing operation. Reading single points
+    from NetCDF files would be one read request per point. Files are processed in parallel
+    and the series are concatenated into one table.
+
+
+    Definition
+    ----------
+    def station_tree(lon, lat, cache=True):
+    def station_weights(lon, lat, slon, slat, method='nearest', cache=True):
+    def extract_stations(inputfile, variable, slon, slat, method='nearest', chunksize=2**26, cache=True):
+    def station_table(files, variable, slon, slat, names=None, method='nearest', nprocs=1, cache=True):
+
+
+    Input
+    -----
+    lon, lat      1D or 2D longitudes and latitudes of the cell centres of a grid
+    slon, slat    1D longitudes and latitudes of the stations
+    inputfile     name of CaSPAr NetCDF file
+    files         list of CaSPAr NetCDF files
+    variable      name of variable with dimensions (time, [level or member,] y, x)
+
+
+    Optional Input
+    --------------
+    method        'nearest' or 'bilinear' (default: 'nearest')
+    cache         True: read KD-tree from / write to on-disk cache (default: True)
+    chunksize     maximum number of values read at once from file (default: 2**26)
+    names         names of the stations, i.e. columns of the table (default: None, i.e. 0, 1, 2, ...)
+    nprocs        number of processes reading files in parallel (default: 1; 0: number of cores)
+
+
+    Output
+    ------
+    station_tree      scipy.spatial.cKDTree of the cell centres on the unit sphere
+    station_weights   flat cell indexes (nstation,4) and weights (nstation,4); stations outside
+                      of the grid have all weights 0 and cell indexes -1
+    extract_stations  times (ntime) and values (ntime,nstation); first level or member if any
+    station_table     pandas.DataFrame with times as index and one column per station, sorted
+                      by time; times found in several files are kept once (the last file).
+                      Unreadable files with error message are in attribute 'failed' of the table.
+
+
+    Examples
+    --------
+    >>> lon, lat = np.meshgrid(np.arange(0., 10.), np.arange(40., 45.))
+    >>> cells, weights = station_weights(lon, lat, np.array([2., 3.6, 20.]), np.array([41., 42.25, 41.]), cache=False)
+    >>> print(cells[:,0], weights[:,0])
+    [12 24 -1] [1. 1. 0.]
+    >>> cells, weights = station_weights(lon, lat, np.array([3.5]), np.array([42.25]), method='bilinear', cache=False)
+    >>> print('{:.2f} {:.2f}'.format(np.sum(weights * lon.ravel()[cells]), np.sum(weights * lat.ravel()[cells])))
+    3.50 42.25
+
+    # table = station_table(glob.glob('RDPS_*.nc'), 'RDPS_P_PR_SFC', slon, slat, names=ids, method='bilinear', nprocs=8)
+    # table.to_csv('RDPS_stations.csv')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import os
+import numpy as np
+
+__all__ = ['station_tree', 'station_weights', 'extract_stations', 'station_table', 'station_methods']
+
+# methods of station_weights
+station_methods = ['nearest', 'bilinear']
+
+# KD-trees already used in this process, per grid fingerprint
+_trees = {}
+
+# -------------------------------------------------------------------------------------------------
+
+def _xyz(lon, lat):
+    """ Points (n,3) on the unit sphere of longitudes and latitudes [degree]. """
+    lam = np.deg2rad(np.ravel(lon))
+    phi = np.deg2rad(np.ravel(lat))
+    cp  = np.cos(phi)
+
+    return np.stack([cp*np.cos(lam), cp*np.sin(lam), np.sin(phi)], axis=-1)
+
+def _tangent(xyz, slon, slat):
+    """ Coordinates in the plane tangent to the unit sphere at the stations: xyz (...,n,3) -> (...,n), (...,n). """
+    lam = np.deg2rad(slon)
+    phi = np.deg2rad(slat)
+    east  = np.stack([-np.sin(lam), np.cos(lam), np.zeros_like(lam)], axis=-1)
+    north = np.stack([-np.sin(phi)*np.cos(lam), -np.sin(phi)*np.sin(lam), np.cos(phi)], axis=-1)
+
+    return np.sum(xyz*east, axis=-1), np.sum(xyz*north, axis=-1)
+
+def _inverse_bilinear(x, y, niter=8):
+    """
+        Coordinates s, t of the origin in quadrilaterals with corners x, y (4,...) ordered
+        (0,0), (0,1), (1,0), (1,1) in (t, s), by Newton iteration.
+    """
+    a  = x[0]
+    b  = x[1] - x[0]
+    c  = x[2] - x[0]
+    d  = x[3] - x[2] - x[1] + x[0]
+    e  = y[0]
+    f  = y[1] - y[0]
+    g  = y[2] - y[0]
+    h  = y[3] - y[2] - y[1] + y[0]
+    s  = np.full(a.shape, 0.5)
+    t  = np.full(a.shape, 0.5)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for ii in range(niter):
+            fx  = a + b*s + c*t + d*s*t
+            fy  = e + f*s + g*t + h*s*t
+            j11 = b + d*t
+            j12 = c + d*s
+            j21 = f + h*t
+            j22 = g + h*s
+            det = j11*j22 - j12*j21
+            ds  = ( j22*fx - j12*fy) / det
+            dt  = (-j21*fx + j11*fy) / det
+            s   = s - ds
+            t   = t - dt
+
+    return s, t
+
+# -------------------------------------------------------------------------------------------------
+
+def station_tree(lon, lat, cache=True):
+    """
+        KD-tree of the cell centres of the grid on the unit sphere, from the on-disk cache if possible.
+    """
+    from .grid import grid_fingerprint, cell_centres
+    key = grid_fingerprint(lon, lat)
+    if key in _trees:
+        return _trees[key]
+
+    if cache:
+        import pickle
+        from .cache import cache_dir, save_pickle
+        cfile = os.path.join(cache_dir('stations'), key+'_tree.pickle')
+        if os.path.exists(cfile):
+            with open(cfile, 'rb') as ff:
+                _trees[key] = pickle.load(ff)
+            return _trees[key]
+
+    from scipy.spatial import cKDTree
+    lon, lat = cell_centres(lon, lat)
+    tree = cKDTree(_xyz(lon, lat), balanced_tree=False)
+    if cache:
+        save_pickle(cfile, tree)
+    _trees.clear()                    # keep only the last tree in memory
+    _trees[key] = tree
+
+    return tree
+
+def station_weights(lon, lat, slon, slat, method='nearest', cache=True):
+    """
+        Flat cell indexes (nstation,4) and weights (nstation,4) of the stations on the grid.
+    """
+    from .grid import cell_centres
+    if method not in station_methods:
+        raise ValueError('station_weights: method must be one of '+', '.join(station_methods)+': '+str(method))
+    lon, lat = cell_centres(lon, lat)
+    ny, nx   = lon.shape
+    slon     = np.asarray(slon, dtype=np.float64).ravel()
+    slat     = np.asarray(slat, dtype=np.float64).ravel()
+    nsta     = slon.size
+    cells    = np.full((nsta, 4), -1, dtype=np.int64)
+    weights  = np.zeros((nsta, 4))
+
+    # nearest cell
+    tree       = station_tree(lon, lat, cache=cache)
+    dist, near = tree.query(_xyz(slon, slat))
+    iy, ix     = np.divmod(near, nx)
+    # half cell diagonal from the distances to the neighbouring cells
+    nxyz = lambda jy, jx: _xyz(lon[np.clip(jy, 0, ny-1), np.clip(jx, 0, nx-1)], lat[np.clip(jy, 0, ny-1), np.clip(jx, 0, nx-1)])
+    cxyz = nxyz(iy, ix)
+    dx   = np.maximum(np.linalg.norm(nxyz(iy, ix+1) - cxyz, axis=-1), np.linalg.norm(nxyz(iy, ix-1) - cxyz, axis=-1))
+    dy   = np.maximum(np.linalg.norm(nxyz(iy+1, ix) - cxyz, axis=-1), np.linalg.norm(nxyz(iy-1, ix) - cxyz, axis=-1))
+    if (nx == 1): dx = dy
+    if (ny == 1): dy = dx
+    inside = dist <= 0.5 * np.sqrt(dx**2 + dy**2) * (1. + 1.e-6)
+    cells[inside,0]   = near[inside]
+    weights[inside,0] = 1.
+
+    if (method == 'bilinear') and (ny > 1) and (nx > 1):
+        # the four quadrilaterals having the nearest cell centre as corner
+        found = ~inside
+        for dj, di in [(-1, -1), (-1, 0), (0, -1), (0, 0)]:
+            jy = np.clip(iy + dj, 0, ny-2)
+            jx = np.clip(ix + di, 0, nx-2)
+            corners = [ (jy, jx), (jy, jx+1), (jy+1, jx), (jy+1, jx+1) ]
+            xx, yy  = _tangent(np.stack([ nxyz(cy, cx) for cy, cx in corners ]), slon, slat)
+            s, t    = _inverse_bilinear(xx, yy)
+            ok      = (~found) & (s >= -1.e-9) & (s <= 1.+1.e-9) & (t >= -1.e-9) & (t <= 1.+1.e-9)
+            s, t    = np.clip(s, 0., 1.), np.clip(t, 0., 1.)
+            for kk, (cy, cx) in enumerate(corners):
+                cells[ok,kk] = cy[ok]*nx + cx[ok]
+            weights[ok] = np.stack([(1.-s)*(1.-t), s*(1.-t), (1.-s)*t, s*t], axis=-1)[ok]
+            found |= ok
+    cells[weights == 0.] = -1
+
+    return cells, weights
+
+# -------------------------------------------------------------------------------------------------
+
+def extract_stations(inputfile, variable, slon, slat, method='nearest', chunksize=2**26, cache=True):
+    """
+        Times and values (ntime,nstation) of variable at the stations, read from one file.
+    """
+    import xarray as xr
+
+    ds      = xr.open_dataset(inputfile)
+    var     = ds[variable]
+    cells, weights = station_weights(ds['lon'].values, ds['lat'].values, slon, slat, method=method, cache=cache)
+    ny, nx  = var.shape[-2:]
+    ydim, xdim = var.dims[-2:]
+    sel     = dict([ (dd, 0) for dd in var.dims[1:-2] ])   # first level or member if any
+    used    = cells >= 0
+    nt      = var.shape[0]
+    values  = np.full((nt, cells.shape[0]), np.nan, dtype=np.float32)
+    if np.any(used):
+        # bounding box of all cells needed
+        cy, cx  = np.divmod(cells[used], nx)
+        y0, y1  = cy.min(), cy.max()+1
+        x0, x1  = cx.min(), cx.max()+1
+        sel[ydim] = slice(y0, y1)
+        sel[xdim] = slice(x0, x1)
+        box     = np.zeros(cells.shape, dtype=np.int64)
+        box[used] = (cy - y0) * (x1 - x0) + (cx - x0)
+        step    = max(1, chunksize // ((y1 - y0) * (x1 - x0)))
+        for it in range(0, nt, step):
+            sel[var.dims[0]] = slice(it, it+step)
+            zz = var.isel(sel).values.reshape((-1, (y1 - y0) * (x1 - x0)))
+            zz = zz[:, box]                       # (ntime, nstation, 4): one fancy-indexing operation
+            zz = np.where(used, zz, 0.)           # unused corners may be NaN
+            values[it:it+step] = np.sum(zz * weights, axis=-1)
+        values[:, ~np.any(used, axis=1)] = np.nan
+    times = ds[var.dims[0]].values
+    ds.close()
+
+    return times, values
+
+def _extract_stations(args):
+    """ extract_stations for pool; returns file name, times, values and error message. """
+    inputfile, variable, slon, slat, method, cache = args
+    try:
+        times, values = extract_stations(inputfile, variable, slon, slat, method=method, cache=cache)
+        return inputfile, times, values, ''
+    except Exception as e:
+        return inputfile, None, None, type(e).__name__+': '+str(e)
+
+# -------------------------------------------------------------------------------------------------
+
+def station_table(files, variable, slon, slat, names=None, method='nearest', nprocs=1, cache=True):
+    """
+        Table of the time series of variable at the stations of all files, sorted by time.
+    """
+    import pandas as pd
+
+    slon = np.asarray(slon, dtype=np.float64).ravel()
+    slat = np.asarray(slat, dtype=np.float64).ravel()
+    if names is None:
+        names = list(range(slon.size))
+    if (len(names) != slon.size) or (slat.size != slon.size):
+        raise ValueError('station_table: slon, slat and names must have the same length.')
+    files = list(files)
+    jobs  = [ (ff, variable, slon, slat, method, cache) for ff in files ]
+    if (nprocs <= 0):
+        import multiprocessing as mp
+        nprocs = mp.cpu_count()
+    nprocs = min(nprocs, len(files))
+
+    if (nprocs > 1):
+        import multiprocessing as mp
+        # first file here: KD-tree of its grid is in the disk cache before the workers start
+        results = [ _extract_stations(jobs[0]) ] if cache else []
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        results += list(pool.imap_unordered(_extract_stations, jobs[len(results):], chunksize=1))
+        pool.close()
+        pool.join()
+    else:
+        results = [ _extract_stations(job) for job in jobs ]
+
+    order  = dict([ (ff, ii) for ii, ff in enumerate(files) ])
+    tables = []
+    failed = []
+    for inputfile, times, values, error in sorted(results, key=lambda rr: order[rr[0]]):
+        if (error != ''):
+            failed.append((inputfile, error))
+        else:
+            tables.append(pd.DataFrame(values, index=pd.Index(times, name='time'), columns=names))
+    if (len(tables) == 0):
+        raise ValueError('station_table: no readable files: '+'; '.join([ ff+': '+ee for ff, ee in failed ]))
+    table = pd.concat(tables)
+    table = table[~table.index.duplicated(keep='last')].sort_index()
+    table.attrs['failed'] = failed
+
+    return table
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # relative imports and lib/ need the package: run the doctests of caspar.stations
+    import os
+    import sys
+    import doctest
+    import importlib
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # lib/
+    doctest.testmod(importlib.import_module('caspar.stations'), optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+"""
+    Continuous best-estimate series stitched from consecutive forecast issues.
+
+    Hydrologic models are forced with the first hours of consecutive forecast issues, e.g. lead
+    hours 7 to 12 of every 6-hourly RDPS issue, joined into one continuous series. stitch_plan
+    reads the time steps of all files and picks for every valid time the issue that provides it:
+    valid times with a lead time inside the lead window are taken from the latest issue; valid
+    times not covered by any issue within the window, e.g. because an issue is missing, are
+    filled with the latest issue with lead times up to fill hours if fill is given. The issue
+    time is taken from the date YYYYMMDDHH in the file name (CaSPAr file names, e.g.
+    2017100212.nc) or else from the reference time of the time units.
+
+    stitch pre-allocates the output NetCDF file for the whole series and then streams the issues:
+    worker processes read the selected time steps of one issue at a time, and the main process
+    writes them at their place in the output file, with at most window issues in memory. Values
+    are copied as they are stored in the files (packed values, _FillValue), chunking and
+    compression of the variables are kept. The time axis is regular with the most common time
+    step of the series; time steps that no issue provides stay _FillValue.
+    Finished issues are appended to the file <outfile>.progress, so that an interrupted run
+    continues with the missing issues when started again with the same files, variables and lead
+    window; the progress file is removed when the series is complete.
+
+
+    Definition
+    ----------
+    def lead_window(leads):
+    def issue_time(filename, units=None):
+    def stitch_plan(files, leads='1-6', fill=None, tdim='time', nprocs=1):
+    def stitch(files, variables, outfile, leads='1-6', fill=None, tdim='time', nprocs=1, window=None):
+
+
+    Input
+    -----
+    leads        lead window as string 'first-last' or 'hour', or (first, last) [hours], inclusive
+    filename     name of a forecast file
+    files        list of CaSPAr NetCDF files of consecutive forecast issues
+    variables    list of names of variables with time dimension
+    outfile      name of NetCDF output file
+
+
+    Optional Input
+    --------------
+    units        time units 'hours since YYYY-MM-DD HH:MM:SS' used if filename has no date (default: None)
+    leads        lead window (default: '1-6')
+    fill         maximum lead time [hours] of issues filling valid times not covered by the lead
+                 window (default: None, i.e. no filling)
+    tdim         name of time dimension (default: 'time')
+    nprocs       number of processes reading files; <= 0: number of cores (default: 1)
+    window       maximum number of issues read but not yet written (default: 2*nprocs)
+
+
+    Output
+    ------
+    lead_window  tuple (first, last) of lead hours
+    issue_time   numpy datetime64 of the issue time
+    stitch_plan  dictionary with valid times ('times', datetime64), index of the file ('file'), index of
+                 the time step in the file ('local') and lead time [hours] ('lead') of every step of
+                 the series (-1 and NaN if missing), issue times of the files ('issues'), number of
+                 missing steps ('gaps'),
+                 list of (file, error) of unreadable files ('failed') and header of the first file ('header')
+    stitch       dictionary with number of time steps ('steps'), issues written ('written') and
+                 already written before ('resumed'), missing steps ('gaps') and unreadable files ('failed')
+
+
+    Examples
+    --------
+    >>> print(lead_window('7-12'), lead_window(6), lead_window((1, 6)))
+    (7.0, 12.0) (6.0, 6.0) (1.0, 6.0)
+    >>> print(issue_time('my/path/RDPS/2017100212.nc'))
+    2017-10-02T12:00:00.000000000
+    >>> print(issue_time('forecast.nc', units='hours since 2017-10-02 18:00:00'))
+    2017-10-02T18:00:00.000000000
+
+    # info = stitch(sorted(glob.glob('RDPS/2017*.nc')), ['RDPS_P_PR_SFC', 'RDPS_P_TT_09944'], 'RDPS_2017.nc',
+    #               leads='7-12', fill=36, nprocs=8)
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import os
+import re
+import hashlib
+import numpy as np
+
+__all__ = ['lead_window', 'issue_time', 'stitch_plan', 'stitch']
+
+# nanoseconds per hour
+_hour = 3600 * 10**9
+
+# -------------------------------------------------------------------------------------------------
+
+def _runs(positions):
+    """ Start and end indexes of runs of consecutive integers in sorted positions. """
+    starts = np.nonzero(np.r_[True, np.diff(positions) != 1])[0]
+    ends   = np.r_[starts[1:], positions.size]
+
+    return zip(starts, ends)
+
+def _expand(values, positions, size, fill):
+    """ Array of size with values at positions and fill elsewhere. """
+    out = np.full(size, fill, dtype=values.dtype)
+    out[positions] = values
+
+    return out
+
+def _bounded(pool, func, jobs, window):
+    """ Results of func for jobs in order, with at most window jobs submitted but not yet taken. """
+    from collections import deque
+    pending = deque()
+    for job in jobs:
+        pending.append(pool.apply_async(func, (job,)))
+        if (len(pending) >= window):
+            yield pending.popleft().get()
+    while (len(pending) > 0):
+        yield pending.popleft().get()
+
+def _read_issue(args):
+    """ Raw values of the selected time steps of variables of one file in a worker; returns file, arrays and error. """
+    import netCDF4 as nc4
+    filename, variables, local, tdim = args
+    try:
+        arrays = {}
+        with nc4.Dataset(filename) as nc:
+            nc.set_auto_maskandscale(False)
+            for vv in variables:
+                var   = nc.variables[vv]
+                taxis = var.dimensions.index(tdim)
+                sel   = [ slice(None) ] * len(var.dimensions)
+                sel[taxis] = slice(int(local.min()), int(local.max())+1)
+                arrays[vv] = np.take(np.asarray(var[tuple(sel)]), local - local.min(), axis=taxis)
+        error = ''
+    except Exception as e:
+        arrays = None
+        error  = type(e).__name__+': '+str(e)
+
+    return filename, arrays, error
+
+def _plan_key(files, plan, variables):
+    """ Hex key of the stitched series: files, selected time steps and variables. """
+    hh = hashlib.sha1()
+    hh.update('\n'.join(files+['']+list(variables)).encode('utf-8'))
+    for kk in ['times', 'file', 'local']:
+        hh.update(np.ascontiguousarray(plan[kk]).view(np.uint8))
+
+    return hh.hexdigest()
+
+def _create_output(outfile, plan, files, variables, tdim, key, leads):
+    """ Pre-allocated output file with the static variables of the first file. """
+    import netCDF4 as nc4
+    header = dict([ (hh[0], hh[1:]) for hh in plan['header'] ])
+    given  = plan['file'] >= 0
+    first  = files[plan['file'][given][0]]
+    ntime  = plan['times'].size
+    t0     = plan['times'][0]
+    hours  = (plan['times'] - t0).astype(np.int64) / float(_hour)
+    issues = np.where(given, (plan['issues'][plan['file']] - t0).astype(np.int64) / float(_hour), np.nan)
+    exact  = np.all(hours == np.round(hours)) and np.all(issues[given] == np.round(issues[given]))
+    units  = 'hours since '+str(t0.astype('datetime64[s]')).replace('T', ' ')
+    tmpfile = outfile+'.'+str(os.getpid())+'.tmp'
+    with nc4.Dataset(first) as src, nc4.Dataset(tmpfile, 'w') as nc:
+        src.set_auto_maskandscale(False)
+        nc.setncatts(dict([ (aa, src.getncattr(aa)) for aa in src.ncattrs() ]))
+        nc.setncatts({'stitched_leads': '{:g}-{:g}'.format(*leads), 'stitch_key': key})
+        for dd, dim in src.dimensions.items():
+            nc.createDimension(dd, ntime if (dd == tdim) else dim.size)
+        tattrs = header[tdim][3]
+        for name, values in [(tdim, hours), ('issue', issues)]:
+            if (name == 'issue') and (name in header):
+                continue
+            tvar = nc.createVariable(name, 'i8' if exact else 'f8', (tdim,),
+                                     fill_value=None if (name == tdim) else (-2**63 if exact else np.nan))
+            tvar.setncatts({'units': units, 'calendar': tattrs.get('calendar', 'proleptic_gregorian')})
+            if (name == 'issue'):
+                tvar.long_name = 'issue time of the forecast'
+            tvar[:] = np.ma.masked_invalid(values).astype(np.int64) if exact else np.ma.masked_invalid(values)
+        for name, (dims, dtype, shape, attrs, encoding) in header.items():
+            if (name == tdim) or ((tdim in dims) and (name not in variables)):
+                continue
+            if (tdim in dims):
+                chunks = encoding.get('chunksizes', shape)
+                chunks = [ 1 if (dd == tdim) else min(cc, ss) for dd, cc, ss in zip(dims, chunks, shape) ]
+                var = nc.createVariable(name, dtype, dims, fill_value=attrs.get('_FillValue', None),
+                                        zlib=encoding.get('zlib', False), complevel=encoding.get('complevel', 4),
+                                        shuffle=encoding.get('shuffle', False), chunksizes=chunks)
+            else:
+                var = nc.createVariable(name, dtype, dims, fill_value=attrs.get('_FillValue', None))
+                var[...] = src.variables[name][...]
+            var.setncatts(dict([ (aa, vv) for aa, vv in attrs.items() if aa != '_FillValue' ]))
+    os.rename(tmpfile, outfile)
+
+# -------------------------------------------------------------------------------------------------
+
+def lead_window(leads):
+    """
+        First and last lead hour of a lead window.
+    """
+    if isinstance(leads, str):
+        parts = leads.replace(' ', '').split('-')
+        if (len(parts) not in [1, 2]) or ('' in parts):
+            raise ValueError('lead_window: leads must be given as first-last, e.g. 7-12: '+leads)
+        leads = [ float(pp) for pp in parts ]
+    leads = np.atleast_1d(np.asarray(leads, dtype=np.float64))
+    first, last = float(leads[0]), float(leads[-1])
+    if (first < 0.) or (last < first):
+        raise ValueError('lead_window: leads must be 0 <= first <= last: '+str((first, last)))
+
+    return first, last
+
+def issue_time(filename, units=None):
+    """
+        Issue time of a forecast file from its name or from the reference time of units.
+    """
+    date = re.findall(r'(?<!\d)(\d{10})(?!\d)', os.path.basename(filename))
+    if (len(date) > 0):
+        dd = date[-1]
+        return np.datetime64(dd[0:4]+'-'+dd[4:6]+'-'+dd[6:8]+'T'+dd[8:10]+':00', 'ns')
+    if (units is not None) and (' since ' in units):
+        import pandas as pd
+        return np.datetime64(pd.Timestamp(units.split(' since ')[1].strip()).tz_localize(None), 'ns')
+
+    raise ValueError('issue_time: no date YYYYMMDDHH in file name and no time units: '+filename)
+
+def stitch_plan(files, leads='1-6', fill=None, tdim='time', nprocs=1):
+    """
+        Issue and time step of every valid time of the best-estimate series of forecast files.
+    """
+    from .collection import _scan_file, _layout
+    first, last = lead_window(leads)
+    maxlead = last if (fill is None) else max(last, float(fill))
+    files   = list(files)
+    jobs    = [ (ff, tdim) for ff in files ]
+    if (nprocs <= 0):
+        import multiprocessing as mp
+        nprocs = mp.cpu_count()
+    nprocs = min(nprocs, len(jobs))
+    if (nprocs > 1):
+        import multiprocessing as mp
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        results = pool.map(_scan_file, jobs, chunksize=16)
+        pool.close()
+        pool.join()
+    else:
+        results = [ _scan_file(job) for job in jobs ]
+
+    # candidates: every time step of every file within the maximum lead time
+    failed = []
+    header = None
+    layout = None
+    issues = np.zeros(len(files), dtype='datetime64[ns]')
+    cand   = []
+    for ifile, (filename, info, error) in enumerate(results):
+        if (error == ''):
+            if (header is None):
+                header, layout = info['header'], _layout(info['header'], tdim)
+            elif (_layout(info['header'], tdim) != layout):
+                error = 'ValueError: variables, dimensions or data types differ from the first file'
+        if (error == ''):
+            try:
+                tattrs = dict([ (hh[0], hh[4]) for hh in info['header'] ])[tdim]
+                issues[ifile] = issue_time(filename, units=tattrs.get('units', None))
+            except ValueError as e:
+                error = 'ValueError: '+str(e)
+        if (error != ''):
+            failed.append((filename, error))
+            continue
+        lead = (info['times'] - issues[ifile].astype(np.int64)) / float(_hour)
+        ok   = (lead >= first) & (lead <= maxlead)
+        local = np.nonzero(ok)[0]
+        cand.append(np.stack([info['times'][ok], np.full(local.size, ifile), local,
+                              np.where(lead[ok] <= last, 0, 1), issues[ifile].astype(np.int64) * np.ones(local.size, dtype=np.int64)]))
+    if (header is None):
+        raise ValueError('stitch_plan: no readable files: '+'; '.join([ ff+': '+ee for ff, ee in failed ]))
+    cand = np.concatenate(cand, axis=1) if (len(cand) > 0) else np.zeros((5, 0), dtype=np.int64)
+
+    # per valid time: inside lead window first, then latest issue
+    order = np.lexsort((-cand[4], cand[3], cand[0]))
+    cand  = cand[:,order]
+    keep  = np.r_[True, cand[0,1:] != cand[0,:-1]] if (cand.shape[1] > 0) else np.zeros(0, dtype=bool)
+    cand  = cand[:,keep]
+    lead  = (cand[0] - cand[4]) / float(_hour)
+    ifile = cand[1].astype(np.intp)
+    local = cand[2].astype(np.intp)
+    times = cand[0]
+    # regular time axis with the most common step; missing steps have file -1
+    if (times.size > 2):
+        dt   = np.diff(times)
+        step, count = np.unique(dt, return_counts=True)
+        step = step[count.argmax()]
+        if np.all(dt % step == 0) and np.any(dt > step):
+            pos   = (times - times[0]) // step
+            times = times[0] + step * np.arange(pos[-1]+1)
+            ifile, local, lead = [ _expand(aa, pos, times.size, ff) for aa, ff in [(ifile, -1), (local, -1), (lead, np.nan)] ]
+
+    return {'times': times.astype('datetime64[ns]'), 'file': ifile, 'local': local, 'lead': lead, 'issues': issues,
+            'gaps': int(np.sum(ifile < 0)), 'failed': failed, 'header': header}
+
+def stitch(files, variables, outfile, leads='1-6', fill=None, tdim='time', nprocs=1, window=None):
+    """
+        Stream the lead window of consecutive forecast issues into one pre-allocated NetCDF file.
+    """
+    import netCDF4 as nc4
+    files     = list(files)
+    variables = list(variables)
+    plan      = stitch_plan(files, leads=leads, fill=fill, tdim=tdim, nprocs=nprocs)
+    header    = dict([ (hh[0], hh[1]) for hh in plan['header'] ])
+    for vv in variables:
+        if (vv not in header) or (tdim not in header[vv]):
+            raise ValueError('stitch: no variable '+vv+' with dimension '+tdim+' in files.')
+    if (plan['times'].size == 0):
+        raise ValueError('stitch: no time steps of the files within the lead window '+str(leads))
+    key       = _plan_key(files, plan, variables)
+    progfile  = outfile+'.progress'
+
+    # resume if output and progress file belong to the same series
+    done = set()
+    if os.path.exists(outfile):
+        with nc4.Dataset(outfile) as nc:
+            samekey = ('stitch_key' in nc.ncattrs()) and (nc.getncattr('stitch_key') == key)
+        if samekey and not os.path.exists(progfile):
+            return {'steps': plan['times'].size, 'written': 0, 'resumed': np.unique(plan['file'][plan['file'] >= 0]).size,
+                    'gaps': plan['gaps'], 'failed': plan['failed']}
+        if samekey:
+            with open(progfile) as ff:
+                lines = [ ll.rstrip('\n') for ll in ff ]
+            if (len(lines) > 0) and (lines[0] == key):
+                done = set(lines[1:])
+    if (len(done) == 0):
+        with open(progfile, 'w') as ff:
+            ff.write(key+'\n')
+        _create_output(outfile, plan, files, variables, tdim, key, lead_window(leads))
+
+    # issues still to write and their places in the output file
+    jobs  = []
+    where = {}
+    for ifile in np.unique(plan['file'][plan['file'] >= 0]):
+        if files[ifile] in done:
+            continue
+        positions = np.nonzero(plan['file'] == ifile)[0]
+        where[files[ifile]] = positions
+        jobs.append((files[ifile], variables, plan['local'][positions], tdim))
+    if (nprocs <= 0):
+        import multiprocessing as mp
+        nprocs = mp.cpu_count()
+    nprocs = max(1, min(nprocs, len(jobs)))
+    if (window is None):
+        window = 2 * nprocs
+
+    failed  = list(plan['failed'])
+    written = 0
+    pool = None
+    if (nprocs > 1):
+        import multiprocessing as mp
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        results = _bounded(pool, _read_issue, jobs, window)
+    else:
+        results = map(_read_issue, jobs)
+
+    try:
+        with nc4.Dataset(outfile, 'a') as nc, open(progfile, 'a') as prog:
+            nc.set_auto_maskandscale(False)
+            for filename, arrays, error in results:
+                if (error != ''):
+                    failed.append((filename, error))
+                    continue
+                positions = where[filename]
+                for vv in variables:
+                    var   = nc.variables[vv]
+                    taxis = var.dimensions.index(tdim)
+                    for ss, ee in _runs(positions):
+                        sel = [ slice(None) ] * len(var.dimensions)
+                        sel[taxis] = slice(int(positions[ss]), int(positions[ee-1])+1)
+                        var[tuple(sel)] = np.take(arrays[vv], np.arange(ss, ee), axis=taxis)
+                nc.sync()
+                prog.write(filename+'\n')
+                prog.flush()
+                os.fsync(prog.fileno())
+                written += 1
+    except BaseException:
+        if (pool is not None):
+            pool.terminate()              # interrupted: no workers left behind; resume later
+        raise
+    if (pool is not None):
+        pool.close()
+        pool.join()
+    if (len(failed) == len(plan['failed'])):
+        os.remove(progfile)               # complete; a run with failed issues can be resumed
+
+    return {'steps': plan['times'].size, 'written': written, 'resumed': len(done),
+            'gaps': plan['gaps'], 'failed': failed}
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+    Synthetic CaSPAr-like datasets with the nominal grid of a CaSPAr product.
+
+    Used for benchmarks and tests of the plotting and processing tools when no
+    real CaSPAr files are at hand. The field is a smooth pattern plus noise that changes
+    with time, so that consecutive time steps differ.
+
+
+    Definition
+    ----------
+    def synthetic_dataset(product, ntime=1, scale=1., variable=None, seed=0):
+
+
+    Input
+    -----
+    product    product name, key of caspar_products
+
+
+    Optional Input
+    --------------
+    ntime      number of hourly time steps (default: 1)
+    scale      factor for number of grid cells per dimension, e.g. 0.1 for quick tests (default: 1.)
+    variable   name of variable (default: product+'_PR0_SFC')
+    seed       seed of random number generator (default: 0)
+
+
+    Output
+    ------
+    xarray.Dataset with 2D lon and lat, time, the variable (time, y, x) and
+    global attribute 'product' like CaSPAr NetCDF files
+
+
+    Examples
+    --------
+    # ds = synthetic_dataset('RDPS', ntime=48, scale=0.25)
+    # ds.to_netcdf('RDPS_synthetic.nc')
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+"""
+from __future__ import print_function
+import numpy as np
+
+__all__ = ['synthetic_dataset']
+
+# -------------------------------------------------------------------------------------------------
+
+def synthetic_dataset(product, ntime=1, scale=1., variable=None, seed=0):
+    """
+        CaSPAr-like xarray.Dataset with the nominal grid of the given product.
+    """
+    import xarray as xr
+    import pandas as pd
+    from .products import caspar_products
+    from .rotated  import rotated2geo
+
+    grid = caspar_products[product]['grid']
+    ny   = max(int(round(grid['shape'][0]*scale)), 2)
+    nx   = max(int(round(grid['shape'][1]*scale)), 2)
+    if variable is None:
+        variable = product+'_PR0_SFC'
+
+    if grid['type'] == 'rotated':
+        dlat = grid['dlat']*grid['shape'][0]/ny
+        dlon = grid['dlon']*grid['shape'][1]/nx
+        rlat = (np.arange(ny) - 0.5*(ny-1)) * dlat
+        rlon = (np.arange(nx) - 0.5*(nx-1)) * dlon
+        lon, lat = rotated2geo(rlon[np.newaxis,:], rlat[:,np.newaxis], grid['pole_lon'], grid['pole_lat'])
+        dims   = ('rlat', 'rlon')
+        coords = {'rlat': ('rlat', rlat, {'standard_name': 'grid_latitude',  'units': 'degrees'}),
+                  'rlon': ('rlon', rlon, {'standard_name': 'grid_longitude', 'units': 'degrees'})}
+    else:
+        dlat = 180. / ny
+        dlon = 360. / nx
+        lat1 = -90. + (np.arange(ny) + 0.5) * dlat
+        lon1 = np.arange(nx) * dlon
+        lon1 = np.where(lon1 >= 180., lon1-360., lon1)   # 0 ... 180, -180 ... 0 as in GDPS files
+        lon, lat = np.meshgrid(lon1, lat1)
+        dims   = ('lat_0', 'lon_0')
+        coords = {}
+    lon = np.broadcast_to(lon, (ny,nx)).astype(np.float32)
+    lat = np.broadcast_to(lat, (ny,nx)).astype(np.float32)
+
+    # smooth pattern moving with time plus noise
+    rs    = np.random.RandomState(seed)
+    time  = pd.date_range('2017-10-02 18:00:00', periods=ntime, freq='h')
+    field = np.empty((ntime,ny,nx), dtype=np.float32)
+    for it in range(ntime):
+        field[it] = ( 5. + 4. * np.sin(np.deg2rad(3.*lon + 10.*it)) * np.cos(np.deg2rad(4.*lat))
+                      + rs.standard_normal((ny,nx)) )
+
+    coords['time'] = ('time', time)
+    coords['lon']  = (dims, lon, {'units': 'degrees_east',  'long_name': 'longitude'})
+    coords['lat']  = (dims, lat, {'units': 'degrees_north', 'long_name': 'latitude'})
+    ds = xr.Dataset({variable: (('time',)+dims, field, {'units': 'kg m**-2', 'long_name': 'Synthetic field'})},
+                    coords=coords)
+    if grid['type'] == 'rotated':
+        ds['rotated_pole'] = xr.DataArray(np.int32(0), attrs={'grid_mapping_name': 'rotated_latitude_longitude',
+                                                              'grid_north_pole_latitude':  grid['pole_lat'],
+                                                              'grid_north_pole_longitude': grid['pole_lon'],
+                                                              'north_pole_grid_longitude': 0.})
+        ds[variable].attrs['grid_mapping'] = 'rotated_pole'
+    ds.attrs['product'] = product
+
+    return ds
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+"""
+    Web-Mercator XYZ map tiles of CaSPAr fields.
+
+    Tiles follow the usual XYZ scheme of web maps: zoom level z has 2**z x 2**z tiles of
+    256 x 256 pixels, x counts from 180 W eastwards and y from 85.05 N southwards. Every pixel
+    of a tile gets the value of the grid cell it falls into (nearest neighbour). Cells are found
+    analytically on the regular axes of the product grids, i.e. in rotated longitudes and
+    latitudes for the rotated grids (RDPS, HRDPS, ...) and in longitudes and latitudes for the
+    global grids (GDPS, GEPS). Values are coloured with the look-up table of the maps
+    (reversed dark_rainbow_256); pixels outside the grid or with NaN are transparent and
+    tiles without any valid pixel are not written.
+
+    Only the tiles overlapping the grid are visited (grid_tiles): the tiles crossed by the outer
+    edge of the grid, which is sampled at a quarter of the smallest tile, plus the runs of tiles
+    between them in a tile column whose middle tile has its centre inside the grid. Pixels are
+    only located on these tiles. A constant field (vmin == vmax) gets the middle colour.
+
+
+    Definition
+    ----------
+    def tile_lonlat(z, x, y, size=256):
+    def tile_range(z, latmin, latmax):
+    def grid_locator(ds, variable):
+    def grid_tiles(ds, variable, z, xrange=None):
+    def render_tiles(job):
+
+
+    Input
+    -----
+    tile_lonlat, tile_range
+        z          zoom level
+        x, y       tile column and row
+        latmin     southernmost latitude of the domain
+        latmax     northernmost latitude of the domain
+    grid_locator, grid_tiles
+        ds         xarray dataset
+        variable   name of the variable with dimensions (time, y, x)
+        z          zoom level
+    render_tiles
+        job        dictionary with
+                   'inputfile', 'variable':  NetCDF file and variable (time, [level or member,] y, x);
+                                             first level or member
+                   'zoom':                   zoom level
+                   'xrange':                 first and last+1 tile column to render
+                   'itimes', 'labels':       time step indexes and their names (sub-directories)
+                   'outdir':                 output directory; tiles are outdir/label/z/x/y.png
+                   'vmin', 'vmax':           values of the first and last colour
+                   'tiles':                  optional (x, y) of the tiles to render (default: grid_tiles
+                                             in xrange)
+
+
+    Optional Input
+    --------------
+    tile_lonlat
+        size       tile size in pixels (default: 256)
+    grid_tiles
+        xrange     first and last+1 tile column (default: None, i.e. all columns)
+
+
+    Output
+    ------
+    tile_lonlat   longitudes and latitudes (size,size) of pixel centres; first row is north
+    tile_range    first and last+1 tile row covering latmin to latmax
+    grid_locator  function locate(lon, lat) returning flat cell indexes (-1 outside of the grid)
+    grid_tiles    integer array (ntiles,2) of (x, y) of the tiles overlapping the grid, sorted by x and y
+    render_tiles  dictionary with 'zoom', 'xrange', 'written', 'empty' tiles and 'time' [s]
+
+
+    Examples
+    --------
+    >>> lon, lat = tile_lonlat(0, 0, 0, size=2)
+    >>> print(lon[0], '{:.4f} {:.4f}'.format(lat[0,0], lat[1,0]))
+    [-90.  90.] 66.5133 -66.5133
+
+    >>> print(tile_range(2, 40., 60.))
+    (1, 2)
+
+    >>> import xarray as xr
+    >>> ds = xr.Dataset({'z': (('lat', 'lon'), np.zeros((3,4)))},
+    ...                 coords={'lat': [40., 45., 50.], 'lon': [-100., -95., -90., -85.]})
+    >>> print(grid_tiles(ds, 'z', 4).tolist())
+    [[3, 5], [3, 6], [4, 5], [4, 6]]
+
+    # job = {'inputfile': 'RDPS_2017100212.nc', 'variable': 'RDPS_P_PR_SFC', 'zoom': 4, 'xrange': (0, 16),
+    #        'itimes': [0, 1], 'labels': ['2017100212', '2017100213'], 'outdir': 'tiles',
+    #        'vmin': 0., 'vmax': 10.}
+    # print(render_tiles(job))
+
+
+    License
+    -------
+    This file is part of Juliane Mai's personal code library.
+
+    Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Juliane Mai's personal code library is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copyright 2016-2026 Juliane Mai
+
+
+    History
+    -------
+    Written,  JM, Oct 2026
+    Modified, JM, Oct 2026 - only tiles overlapping the grid (grid_tiles), constant fields
+    Modified, JM, Oct 2026 - first level or member of 4D variables
+"""
+from __future__ import print_function
+import os
+import time
+import numpy as np
+
+__all__ = ['tile_lonlat', 'tile_range', 'grid_locator', 'grid_tiles', 'render_tiles']
+
+# latitude limit of Web-Mercator
+maxlat = 85.0511287798
+
+# -------------------------------------------------------------------------------------------------
+
+def _axis_locator(axis, periodic=False):
+    """ Function giving index of cells of 1D axis of cell centres (-1 outside); periodic for longitudes. """
+    from .grid import _edges1d
+    axis  = np.asarray(axis, dtype=np.float64)
+    order = np.argsort(axis)
+    edges = _edges1d(axis[order])
+
+    def locate(v):
+        v = np.asarray(v, dtype=np.float64)
+        if periodic:
+            v = edges[0] + np.mod(v - edges[0], 360.)
+        ii = np.searchsorted(edges, v, side='right') - 1
+        inside = (ii >= 0) & (ii < axis.size)
+        return np.where(inside, order[np.clip(ii, 0, axis.size-1)], -1)
+
+    return locate
+
+def _native_grid(ds, variable):
+    """
+        1D y and x axes of the grid of variable in native coordinates and the transforms
+        geographic -> native and native -> geographic.
+    """
+    from .rotated import rotated_pole, geo2rotated, rotated2geo
+
+    ydim, xdim = ds[variable].dims[-2:]
+    pole = rotated_pole(ds, variable)
+    if (pole is not None):
+        return (ds[ydim].values, ds[xdim].values,
+                (lambda lon, lat: geo2rotated(lon, lat, pole[0], pole[1])),
+                (lambda rlon, rlat: rotated2geo(rlon, rlat, pole[0], pole[1])))
+    lon = ds['lon'].values
+    lat = ds['lat'].values
+    if (np.ndim(lon) == 2):
+        if not (np.all(lat == lat[:,:1]) and np.all(lon == lon[:1,:])):
+            raise ValueError('grid_locator: grid is neither rotated nor regular in longitude and latitude: '+variable)
+        lon = lon[0,:]
+        lat = lat[:,0]
+    identity = lambda lon, lat: (lon, lat)
+
+    return lat, lon, identity, identity
+
+def _tile_index(z, lon, lat):
+    """ Tile columns and rows of zoom level z of longitudes and latitudes. """
+    n   = 2**z
+    x   = np.floor(np.mod(np.asarray(lon, dtype=np.float64) + 180., 360.) / 360. * n).astype(np.int64)
+    phi = np.deg2rad(np.clip(np.asarray(lat, dtype=np.float64), -maxlat, maxlat))
+    y   = np.floor((1. - np.log(np.tan(phi) + 1./np.cos(phi)) / np.pi) / 2. * n).astype(np.int64)
+
+    return np.clip(x, 0, n-1), np.clip(y, 0, n-1)
+
+# -------------------------------------------------------------------------------------------------
+
+def tile_lonlat(z, x, y, size=256):
+    """
+        Longitudes and latitudes of pixel centres of XYZ tile (z, x, y); first row is north.
+    """
+    n  = 2**z * size
+    ii = (np.arange(size) + 0.5)
+    lon = (x*size + ii) / n * 360. - 180.
+    lat = np.rad2deg(np.arctan(np.sinh(np.pi * (1. - 2. * (y*size + ii) / n))))
+
+    return np.broadcast_to(lon[np.newaxis,:], (size, size)), np.broadcast_to(lat[:,np.newaxis], (size, size))
+
+def tile_range(z, latmin, latmax):
+    """
+        First and last+1 tile row of zoom level z covering latitudes latmin to latmax.
+    """
+    n = 2**z
+
+    def row(lat):
+        lat = np.deg2rad(np.clip(lat, -maxlat, maxlat))
+        return int(np.clip(np.floor((1. - np.log(np.tan(lat) + 1./np.cos(lat)) / np.pi) / 2. * n), 0, n-1))
+
+    return row(latmax), row(latmin)+1
+
+# -------------------------------------------------------------------------------------------------
+
+def grid_locator(ds, variable):
+    """
+        Function locate(lon, lat) giving flat cell indexes of variable (-1 outside of the grid).
+        Works on rotated grids (rotated_latitude_longitude) and regular longitude-latitude grids.
+    """
+    yaxis, xaxis, transform, _ = _native_grid(ds, variable)
+    yloc = _axis_locator(yaxis)
+    xloc = _axis_locator(xaxis, periodic=True)
+    nx   = np.size(xaxis)
+
+    def locate(lon, lat):
+        xx, yy = transform(lon, lat)
+        iy = yloc(yy)
+        ix = xloc(xx)
+        return np.where((iy >= 0) & (ix >= 0), iy*nx + ix, -1)
+
+    return locate
+
+def grid_tiles(ds, variable, z, xrange=None):
+    """
+        Tiles (x, y) of zoom level z overlapping the grid of variable, optionally only in columns xrange.
+    """
+    from .grid import _edges1d
+
+    n = 2**z
+    yaxis, xaxis, _, to_geo = _native_grid(ds, variable)
+    yedge = _edges1d(np.sort(np.asarray(yaxis, dtype=np.float64)))
+    xedge = _edges1d(np.sort(np.asarray(xaxis, dtype=np.float64)))
+    # outer edge of the grid in native coordinates, sampled at a quarter of the smallest tile
+    step = 360. / n * np.cos(np.deg2rad(maxlat)) / 4.
+    ny   = int(np.ceil((yedge[-1] - yedge[0]) / step)) + 1
+    nx   = int(np.ceil((xedge[-1] - xedge[0]) / step)) + 1
+    ys   = np.linspace(yedge[0], yedge[-1], ny)
+    xs   = np.linspace(xedge[0], xedge[-1], nx)
+    bx   = np.concatenate([xs, np.full(ny, xedge[-1]), xs, np.full(ny, xedge[0])])
+    by   = np.concatenate([np.full(nx, yedge[0]), ys, np.full(nx, yedge[-1]), ys])
+    tx, ty = _tile_index(z, *to_geo(bx, by))
+    # diagonal steps between samples may cut the corner of a third tile: add both candidates
+    diag   = np.nonzero((np.abs(np.diff(tx)) == 1) & (np.abs(np.diff(ty)) == 1))[0]
+    tx, ty = np.concatenate([tx, tx[diag], tx[diag+1]]), np.concatenate([ty, ty[diag+1], ty[diag]])
+    tx, ty = np.divmod(np.unique(tx * n + ty), n)
+    if (xrange is not None):
+        keep   = (tx >= xrange[0]) & (tx < xrange[1])
+        tx, ty = tx[keep], ty[keep]
+
+    # runs of tiles between the edge tiles of a column are either inside or outside of the
+    # grid: test the centre of the middle tile of every run
+    x0, x1 = (0, n) if (xrange is None) else xrange
+    cols, first, last = [], [], []
+    for x in range(x0, x1):
+        rows = np.concatenate([[-1], ty[tx == x], [n]])
+        gap  = np.nonzero(np.diff(rows) > 1)[0]
+        cols.append(np.full(gap.size, x))
+        first.append(rows[gap] + 1)
+        last.append(rows[gap+1])
+    cols, first, last = np.concatenate(cols), np.concatenate(first), np.concatenate(last)
+    mid    = (first + last - 1) // 2
+    lon    = (cols + 0.5) / n * 360. - 180.
+    lat    = np.rad2deg(np.arctan(np.sinh(np.pi * (1. - 2. * (mid + 0.5) / n))))
+    inside = grid_locator(ds, variable)(lon, lat) >= 0
+    tiles  = [ np.stack([tx, ty], axis=1) ]
+    for x, f, l in zip(cols[inside], first[inside], last[inside]):
+        tiles.append(np.stack([np.full(l-f, x), np.arange(f, l)], axis=1))
+    tiles = np.concatenate(tiles)
+
+    return tiles[np.lexsort((tiles[:,1], tiles[:,0]))]
+
+# -------------------------------------------------------------------------------------------------
+
+def render_tiles(job):
+    """
+        Write the tiles of columns xrange of one zoom level for all time steps of job.
+    """
+    import xarray as xr
+    from .plot      import colour_lut
+    from .png       import write_png
+    from .hyperslab import select_hyperslab
+
+    tstart = time.time()
+    z      = job['zoom']
+    vmin   = job['vmin']
+    vmax   = job['vmax']
+    lut    = colour_lut()
+
+    # first level or member of variables with dimensions (time, level, y, x)
+    dsfile = xr.open_dataset(job['inputfile'])
+    ds     = select_hyperslab(dsfile, job['variable'])
+    locate = grid_locator(ds, job['variable'])
+    if ('tiles' in job):
+        todo = np.asarray(job['tiles'], dtype=np.int64).reshape((-1, 2))
+    else:
+        todo = grid_tiles(ds, job['variable'], z, xrange=job['xrange'])
+
+    # pixels and grid cells of the tiles touching the grid; same for all time steps
+    tiles = []
+    for x, y in todo:
+        cells = locate(*tile_lonlat(z, x, y)).ravel()
+        pix   = np.nonzero(cells >= 0)[0]
+        if (pix.size > 0):
+            tiles.append((x, y, pix.astype(np.int32), cells[pix].astype(np.int32)))
+    nempty = (len(todo) - len(tiles)) * len(job['itimes'])
+    # constant field (vmax == vmin): all values get the middle colour
+    scale  = 256. / (vmax - vmin) if (vmax > vmin) else 0.
+    middle = 0. if (vmax > vmin) else 128.
+
+    nwritten = 0
+    for itime, label in zip(job['itimes'], job['labels']):
+        zz = ds[job['variable']][itime].values.ravel()
+        for x, y, pix, cells in tiles:
+            vals = zz[cells]
+            ok   = np.isfinite(vals)
+            if not np.any(ok):
+                nempty += 1
+                continue
+            ic   = np.clip((vals[ok] - vmin) * scale + middle, 0, 255).astype(np.int32)
+            rgba = np.zeros((256*256, 4), dtype=np.uint8)
+            rgba[pix[ok]] = lut[ic]
+            tiledir = os.path.join(job['outdir'], label, str(z), str(x))
+            if not os.path.exists(tiledir):
+                try:
+                    os.makedirs(tiledir)
+                except OSError:   # created by another worker in the meantime
+                    pass
+            write_png(os.path.join(tiledir, str(y)+'.png'), rgba.reshape(256, 256, 4))
+            nwritten += 1
+    dsfile.close()
+
+    return {'zoom': z, 'xrange': job['xrange'], 'written': nwritten, 'empty': nempty,
+            'time': time.time() - tstart}
+
+# -------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    # relative imports and lib/ need the package: run the doctests of caspar.tiles
+    import os
+    import sys
+    import doctest
+    import importlib
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # lib/
+    doctest.testmod(importlib.import_module('caspar.tiles'), optionflags=doctest.NORMALIZE_WHITESPACE)
@@ -2,6 +2,9 @@
 """
     Functions working with colours and producing colour tables.
 
+    Colours, colour dictionaries and functions are imported from their submodules
+    only when they are first accessed, e.g. color.get_brewer loads the colour maps.
+
 
     Provided colours
     ----------------
@@ -290,53 +293,83 @@
     History
     -------
     Written,  MC, Mar 2015
+    Modified, JM, Oct 2026 - import submodules only on first access of their names (Python >= 3.7)
 """
 
-# UFZ colours
-from .ufz_colours       import ufzdarkblue, ufzblue, ufzlightblue
-from .ufz_colours       import ufzred, ufzorange, ufzyellow
-from .ufz_colours       import ufzdarkgreen, ufzgreen, ufzlightgreen
-from .ufz_colours       import ufzgray1, ufzgray2, ufzgray3
-from .ufz_colours       import ufzgrey1, ufzgrey2, ufzgrey3
-from .ufz_colours       import ufzdarkgray, ufzgray, ufzlightgray
-from .ufz_colours       import ufzdarkgrey, ufzgrey, ufzlightgrey
-from .ufz_colours       import ufzblack, ufzwhite
-from .ufz_colours       import darkblue, blue, lightblue
-from .ufz_colours       import red, orange, yellow
-from .ufz_colours       import darkgreen, green, lightgreen
-from .ufz_colours       import gray1, gray2, gray3
-from .ufz_colours       import grey1, grey2, grey3
-from .ufz_colours       import darkgray, gray, lightgray
-from .ufz_colours       import darkgrey, grey, lightgrey
-from .ufz_colours       import black, white
-from .colours           import colours, colors
-
-# colorbrewer
-from .brewer_colors     import brewer_sequential, brewer_diverging, brewer_qualitative
-from .brewer_colors     import oregon_sequential, oregon_diverging, oregon_qualitative
-from .brewer_colors     import ncl_large, ncl_small, ncl_meteo_swiss
-from .brewer_colors     import mathematica
-from .brewer            import get_brewer, register_brewer, print_brewer, plot_brewer
-
-# rgb interpolation
-from .rgb               import rgb_blend, rgb_gradient, rgb_range
-
-# chroma.js
-from .chroma_colors     import chroma_brewer, chroma_x11
-from .chroma_helper     import limit, luminance
-from .chroma_converter  import rgb2hex,   hex2rgb,   hex2rgb01
-from .chroma_converter  import rgb2hsi,   hsi2rgb,   hsi2rgb01
-from .chroma_converter  import rgb2hsl,   hsl2rgb,   hsl2rgb01
-from .chroma_converter  import rgb2hsv,   hsv2rgb,   hsv2rgb01
-from .chroma_converter  import rgb2lab,   lab2rgb,   lab2rgb01
-from .chroma_converter  import lab2lch,   lch2lab
-from .chroma_converter  import rgb2lch,   lch2rgb,   lch2rgb01
-from .chroma_converter  import rgb2rgb01, rgb012rgb
-from .chroma_converter  import col2rgb,   col2rgb01
-from .chroma_bezier     import bezier
-
-# sron
-from .sron              import sron_colors, sron_colours, sron_maps
+import sys
+import importlib
+
+# Names provided by the submodules. They are imported from the submodule on first access
+# of any of its names with the module __getattr__ below (Python >= 3.7), so that
+# "import color" does not load palettes, converters or numpy that are never used.
+_submodules = {
+    # UFZ colours
+    'ufz_colours':      ['ufzdarkblue', 'ufzblue', 'ufzlightblue',
+                         'ufzred', 'ufzorange', 'ufzyellow',
+                         'ufzdarkgreen', 'ufzgreen', 'ufzlightgreen',
+                         'ufzgray1', 'ufzgray2', 'ufzgray3',
+                         'ufzgrey1', 'ufzgrey2', 'ufzgrey3',
+                         'ufzdarkgray', 'ufzgray', 'ufzlightgray',
+                         'ufzdarkgrey', 'ufzgrey', 'ufzlightgrey',
+                         'ufzblack', 'ufzwhite',
+                         'darkblue', 'blue', 'lightblue',
+                         'red', 'orange', 'yellow',
+                         'darkgreen', 'green', 'lightgreen',
+                         'gray1', 'gray2', 'gray3',
+                         'grey1', 'grey2', 'grey3',
+                         'darkgray', 'gray', 'lightgray',
+                         'darkgrey', 'grey', 'lightgrey',
+                         'black', 'white'],
+    'colours':          ['colours', 'colors'],
+    # colorbrewer
+    'brewer_colors':    ['brewer_sequential', 'brewer_diverging', 'brewer_qualitative',
+                         'oregon_sequential', 'oregon_diverging', 'oregon_qualitative',
+                         'ncl_large', 'ncl_small', 'ncl_meteo_swiss',
+                         'mathematica'],
+    'brewer':           ['get_brewer', 'register_brewer', 'print_brewer', 'plot_brewer'],
+    # rgb interpolation
+    'rgb':              ['rgb_blend', 'rgb_gradient', 'rgb_range'],
+    # chroma.js
+    'chroma_colors':    ['chroma_brewer', 'chroma_x11'],
+    'chroma_helper':    ['limit', 'luminance'],
+    'chroma_converter': ['rgb2hex',   'hex2rgb',   'hex2rgb01',
+                         'rgb2hsi',   'hsi2rgb',   'hsi2rgb01',
+                         'rgb2hsl',   'hsl2rgb',   'hsl2rgb01',
+                         'rgb2hsv',   'hsv2rgb',   'hsv2rgb01',
+                         'rgb2lab',   'lab2rgb',   'lab2rgb01',
+                         'lab2lch',   'lch2lab',
+                         'rgb2lch',   'lch2rgb',   'lch2rgb01',
+                         'rgb2rgb01', 'rgb012rgb',
+                         'col2rgb',   'col2rgb01'],
+    'chroma_bezier':    ['bezier'],
+    # sron
+    'sron':             ['sron_colors', 'sron_colours', 'sron_maps'],
+    }
+
+_names = dict([ (name, module) for module in _submodules for name in _submodules[module] ])
+
+__all__ = sorted(_names)
+
+def _load(module):
+    """ Import submodule and set all its provided names in the package namespace. """
+    mod = importlib.import_module('.'+module, __name__)
+    # set after the import: importing e.g. .colours sets the package attribute colours to the submodule
+    for name in _submodules[module]:
+        globals()[name] = getattr(mod, name)
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """ Import names of submodules on first access. """
+        if name in _names:
+            _load(_names[name])
+            return globals()[name]
+        raise AttributeError('module '+__name__+' has no attribute '+name)
+
+    def __dir__():
+        return sorted(set(list(globals()) + __all__))
+else:
+    for _module in _submodules:
+        _load(_module)
 
 # Information
 __author__   = "Matthias Cuntz"
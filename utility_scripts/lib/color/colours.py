@@ -1,14 +1,14 @@
 #!/usr/bin/env python
 from __future__ import print_function
 
-from ufz_colours import ufzdarkblue, ufzblue, ufzlightblue
-from ufz_colours import ufzred, ufzorange, ufzyellow, ufzdarkgreen, ufzgreen, ufzlightgreen
-from ufz_colours import ufzgray1, ufzgray2, ufzgray3, ufzgrey1, ufzgrey2, ufzgrey3
-from ufz_colours import ufzdarkgray, ufzgray, ufzlightgray, ufzdarkgrey, ufzgrey, ufzlightgrey
-from ufz_colours import ufzblack, ufzwhite
-from ufz_colours import darkblue, blue, lightblue, red, orange, yellow, darkgreen, green, lightgreen
-from ufz_colours import gray1, gray2, gray3, grey1, grey2, grey3, darkgray, gray, lightgray, darkgrey
-from ufz_colours import grey, lightgrey, black, white
+from .ufz_colours import ufzdarkblue, ufzblue, ufzlightblue
+from .ufz_colours import ufzred, ufzorange, ufzyellow, ufzdarkgreen, ufzgreen, ufzlightgreen
+from .ufz_colours import ufzgray1, ufzgray2, ufzgray3, ufzgrey1, ufzgrey2, ufzgrey3
+from .ufz_colours import ufzdarkgray, ufzgray, ufzlightgray, ufzdarkgrey, ufzgrey, ufzlightgrey
+from .ufz_colours import ufzblack, ufzwhite
+from .ufz_colours import darkblue, blue, lightblue, red, orange, yellow, darkgreen, green, lightgreen
+from .ufz_colours import gray1, gray2, gray3, grey1, grey2, grey3, darkgray, gray, lightgray, darkgrey
+from .ufz_colours import grey, lightgrey, black, white
 
 __all__ = ['colours', 'colors']
 
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Basin-averaged (lumped) time series of a variable of CaSPAr files, e.g. for lumped hydrologic models.
+
+The basin polygons are given as shapefile or as JSON file with a dictionary of basin id and
+list of [lon, lat] vertices, i.e. the coordinates accepted by coords2shapefile. They are
+intersected exactly with the grid cells of the first file (see caspar.basin_weights); the area
+weights are stored as sparse matrix per grid and set of basins in the cache directory
+(CASPAR_CACHE_DIR, default ~/.cache/caspar), so that later runs start right away. The basin
+means of all time steps of all files are written as one table with one row per time step and
+one column per basin. Basins outside of the grid get empty values; basins partially covered by
+the grid are averaged over the covered part and reported.
+
+Run with::
+
+      CaSPAr-FILES    ... file names or glob patterns of netCDF files (quote patterns)
+      VARNAME         ... name of variable
+      BASINS          ... shapefile (.shp) or JSON file of basin polygons
+      IDFIELD         ... attribute of the shapefile with the basin ids (default: record number)
+      CSV-FILE        ... output table
+      NPROCS          ... number of processes computing the weights (default: number of cores)
+
+      run lump_CaSPAr_basins.py -i <CaSPAr-FILES> -v <VARNAME> -b <BASINS> -o <CSV-FILE>
+      run lump_CaSPAr_basins.py -i 'my/path/CaPA_fine_*.nc' -v CaPA_fine_A_PR0_SFC -b basins.shp -d ID -o CaPA_basins.csv
+      run lump_CaSPAr_basins.py -i 'my/path/RDPS_*.nc' -v RDPS_P_PR_SFC -b basins.json -o RDPS_basins.csv -n 16
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfiles = []
+variable   = ''
+basins     = ''
+idfield    = ''
+outfile    = 'basins.csv'
+nprocs     = 0
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Basin means of CASPAR.''')
+parser.add_argument('-i', '--inputfiles', action='store', nargs='+', default=inputfiles, dest='inputfiles',
+                    help="Names or glob patterns of NC files containing data.")
+parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
+                    help="Name of variable which will be averaged.")
+parser.add_argument('-b', '--basins', action='store', default=basins, dest='basins',
+                    help="Shapefile (.shp) or JSON file of basin polygons.")
+parser.add_argument('-d', '--idfield', action='store', default=idfield, dest='idfield',
+                    help="Attribute of shapefile with basin ids (default: record number).")
+parser.add_argument('-o', '--outfile', action='store', default=outfile, dest='outfile',
+                    help="Name of CSV output file (default: basins.csv).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of processes computing the weights (default: number of cores).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import glob
+import time
+
+
+if __name__ == '__main__':
+
+    args       = parser.parse_args()
+    inputfiles = args.inputfiles
+    variable   = args.variable
+    basins     = args.basins
+    idfield    = args.idfield
+    outfile    = args.outfile
+    nprocs     = args.nprocs
+    del parser, args
+
+    import numpy as np
+    import pandas as pd
+    import xarray as xr
+    import caspar                     # in lib/
+
+    files = []
+    for ii in inputfiles:
+        ifiles = sorted(glob.glob(ii))
+        if len(ifiles) == 0:
+            print('Warning: no file found for: ', ii)
+        files += ifiles
+    if len(files) == 0:
+        raise ValueError('lump_CaSPAr_basins: no input files given.')
+
+    # -------------------------------------------------------------------------
+    # Weights of grid cells in basins
+    # -------------------------------------------------------------------------
+    tstart = time.time()
+    ids, polygons = caspar.read_basins(basins, idfield=idfield if (idfield != '') else None)
+    ds     = xr.open_dataset(files[0])
+    ww     = caspar.basin_weights(ds['lon'].values, ds['lat'].values, polygons, ids=ids, nprocs=nprocs)
+    ds.close()
+    print('Weights of {:d} basins in {:.2f} s ({:d} cell fractions)'.format(len(ids), time.time()-tstart,
+                                                                         ww['weights'].nnz))
+    outside = [ str(ii) for ii, cc in zip(ids, ww['coverage']) if cc <= 0. ]
+    partial = [ str(ii) for ii, cc in zip(ids, ww['coverage']) if (cc > 0.) and (cc < 0.999) ]
+    if len(outside) > 0:
+        print('  {:d} basins outside of the grid: {:s}'.format(len(outside), ', '.join(outside[:10])+(', ...' if len(outside) > 10 else '')))
+    if len(partial) > 0:
+        print('  {:d} basins partially covered: {:s}'.format(len(partial), ', '.join(partial[:10])+(', ...' if len(partial) > 10 else '')))
+
+    # -------------------------------------------------------------------------
+    # Basin means of all files
+    # -------------------------------------------------------------------------
+    tstart = time.time()
+    tables = []
+    for ff in files:
+        ds  = xr.open_dataset(ff)
+        var = ds[variable]
+        sel = dict([ (dd, 0) for dd in var.dims[1:-2] ])   # first level or member if any
+        tables.append(pd.DataFrame(caspar.basin_means(ww, var.isel(sel).values),
+                                   index=pd.Index(ds[var.dims[0]].values, name='time'), columns=[ str(ii) for ii in ids ]))
+        ds.close()
+    table = pd.concat(tables)
+    table = table[~table.index.duplicated(keep='last')].sort_index()
+    table.to_csv(outfile)
+    print('Wrote {:d} time steps of {:d} basins to {:s} in {:.2f} s'.format(len(table), len(table.columns), outfile,
+                                                                            time.time()-tstart))
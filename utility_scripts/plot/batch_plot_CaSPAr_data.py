@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Plots many CaSPAr files in parallel, e.g. all CaLDAS or CaPA files of a nightly download.
+
+Files are distributed over a pool of worker processes. Every worker is a fresh Python process
+(multiprocessing 'spawn') with its own non-interactive matplotlib, so that workers do not share
+any matplotlib state, and keeps its Basemap per product for all the files it plots.
+A timing summary per file is printed at the end.
+
+By default every frame is coloured from its own minimum to its maximum. With a global colour
+scale (-c minmax or -c quantile), all files are first streamed in parallel, a few time steps at a
+time, to find the minimum and maximum or the 1st and 99th percentile over all files and time
+steps (see caspar.global_scale). All frames are then plotted with this fixed colour scale and are
+comparable with each other.
+
+Quick looks (-q) are small images for checking the data of many files, e.g. every file of a
+nightly download: the field is block-reduced to at most SIZE pixels per side (-z), mapped through a
+256-colour look-up table of a brewer colour map (-m) with missing values in light grey, and
+written directly as PNG without map, coastlines or colour bar (see caspar.quicklook). Workers
+do not import matplotlib. Minimum, maximum and fraction of missing values of every file are
+printed.
+
+Run with::
+
+      CaSPAr-FILES    ... file names or glob patterns of netCDF files (quote patterns)
+      VARNAME         ... name of variable that you want to plot
+      PNG-DIR         ... directory for the PNG files; files are named <ncfile-basename>_0001.png, ...
+      NPROCS          ... number of worker processes (default: number of cores)
+      SCALE           ... colour scale: frame, minmax or quantile (default: frame)
+      SIZE            ... maximum number of pixels per side of quick looks (default: 0, i.e. one pixel per cell)
+      REDUCE          ... reduction of blocks of quick looks: nearest, mean or max (default: nearest)
+      COLORMAP        ... colour map of quick looks from color.get_brewer (default: colour map of the maps)
+
+      run batch_plot_CaSPAr_data.py -i <CaSPAr-FILES> -v <VARNAME> -o <PNG-DIR> -n <NPROCS>
+      run batch_plot_CaSPAr_data.py -i 'my/path/CaLDAS_*.nc' -v CaLDAS_A_I0_Profile -o pngs/
+      run batch_plot_CaSPAr_data.py -f filelist.txt -v CaPA_fine_A_PR0_SFC -o pngs/ -n 16
+      run batch_plot_CaSPAr_data.py -i 'my/path/RDPS_*.nc' -v RDPS_P_PR_SFC -o pngs/ -s all -c quantile
+      run batch_plot_CaSPAr_data.py -i 'my/path/CaPA_fine_*.nc' -v CaPA_fine_A_PR0_SFC -o ql/ -q -z 256
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfiles = []
+filelist   = ''
+variable   = ''
+outdir     = '.'
+nprocs     = 0
+timesteps  = '0'
+scale      = 'frame'
+quicklook  = False
+size       = 0
+reduce     = 'nearest'
+colormap   = ''
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Batch plots for CASPAR.''')
+parser.add_argument('-i', '--inputfiles', action='store', nargs='+', default=inputfiles, dest='inputfiles',
+                    help="Names or glob patterns of NC files containing data.")
+parser.add_argument('-f', '--filelist', action='store', default=filelist, dest='filelist',
+                    help="Text file with names of NC files, one per line.")
+parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
+                    help="Name of variable which will be plotted.")
+parser.add_argument('-o', '--outdir', action='store', default=outdir, dest='outdir',
+                    help="Directory for png output files (default: .).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of worker processes (default: number of cores).")
+parser.add_argument('-s', '--timesteps', action='store', default=timesteps, dest='timesteps',
+                    help="Time steps to plot: single index, 'all' or slice 'i:j:k' (default: 0).")
+parser.add_argument('-c', '--scale', action='store', default=scale, dest='scale',
+                    choices=['frame', 'minmax', 'quantile'],
+                    help="Colour scale: minimum to maximum of each frame, or the same for all frames from "
+                         "minimum to maximum or 1st to 99th percentile over all files (default: frame).")
+parser.add_argument('-q', '--quicklook', action='store_true', default=quicklook, dest='quicklook',
+                    help="Quick looks: field only, coloured by look-up table and written without matplotlib.")
+parser.add_argument('-z', '--size', action='store', type=int, default=size, dest='size',
+                    help="Maximum number of pixels per side of quick looks (default: 0, i.e. one pixel per cell).")
+parser.add_argument('-r', '--reduce', action='store', default=reduce, dest='reduce',
+                    choices=['nearest', 'mean', 'max'],
+                    help="Reduction of blocks of cells of quick looks (default: nearest).")
+parser.add_argument('-m', '--colormap', action='store', default=colormap, dest='colormap',
+                    help="Colour map of quick looks from color.get_brewer (default: colour map of the maps).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import glob
+import time
+import multiprocessing as mp
+
+
+def init_worker():
+    """ Non-interactive matplotlib in each worker, set before pyplot is imported. """
+    import caspar                     # in lib/
+    caspar.set_plot_style('png')
+    import matplotlib.pyplot as plt
+
+
+def plot_file(job):
+    """ Plot one file in a worker; returns file name, timing and error message. """
+    import caspar                     # in lib/
+    inputfile, variable, pngbase, timesteps, norm = job
+    tstart = time.time()
+    try:
+        itime = caspar.plot_caspar(inputfile, variable, pngbase=pngbase, timesteps=timesteps, norm=norm,
+                                   verbose=False)
+        error = ''
+    except Exception as e:
+        itime = {'nframes': 0, 'setup': 0., 'render': 0.}
+        error = type(e).__name__+': '+str(e)
+    itime['total'] = time.time() - tstart
+    itime['pid']   = os.getpid()
+
+    return inputfile, itime, error
+
+
+def quicklook_file(job):
+    """ Quick looks of one file in a worker; returns file name, timing and statistics, and error message. """
+    import caspar                     # in lib/
+    inputfile, variable, pngbase, timesteps, vrange, maxsize, how, cname = job
+    tstart = time.time()
+    try:
+        itime = caspar.quicklook(inputfile, variable, pngbase, timesteps=timesteps, maxsize=maxsize, how=how,
+                                 vmin=vrange[0], vmax=vrange[1], cname=cname)
+        error = ''
+    except Exception as e:
+        itime = {'nframes': 0, 'setup': 0., 'render': 0.}
+        error = type(e).__name__+': '+str(e)
+    itime['total'] = time.time() - tstart
+    itime['pid']   = os.getpid()
+
+    return inputfile, itime, error
+
+
+if __name__ == '__main__':
+
+    args       = parser.parse_args()
+    inputfiles = args.inputfiles
+    filelist   = args.filelist
+    variable   = args.variable
+    outdir     = args.outdir
+    nprocs     = args.nprocs
+    timesteps  = args.timesteps
+    scale      = args.scale
+    quicklook  = args.quicklook
+    size       = args.size
+    reduce     = args.reduce
+    colormap   = args.colormap
+    del parser, args
+
+    # file names from glob patterns and file list
+    files = []
+    for ii in inputfiles:
+        ifiles = sorted(glob.glob(ii))
+        if len(ifiles) == 0:
+            print('Warning: no file found for: ', ii)
+        files += ifiles
+    if filelist != '':
+        with open(filelist) as ff:
+            files += [ ll.strip() for ll in ff if ll.strip() != '' ]
+    if len(files) == 0:
+        raise ValueError('batch_plot_CaSPAr_data: no input files given.')
+
+    if nprocs <= 0:
+        nprocs = mp.cpu_count()
+    nprocs = min(nprocs, len(files))
+
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    # -------------------------------------------------------------------------
+    # Global colour scale: stream all files in parallel before plotting
+    # -------------------------------------------------------------------------
+    norm = None
+    if (scale != 'frame'):
+        import caspar                     # in lib/
+        tstart = time.time()
+        gscale = caspar.global_scale(files, variable, nprocs=nprocs)
+        norm   = caspar.scale_norm(gscale, mode=scale)
+        print('Colour scale of {:d} values in {:.2f} s: min {:g}, p{:g} {:g}, p{:g} {:g}, max {:g}; using {:g} to {:g}'.format(
+            gscale['count'], time.time()-tstart, gscale['min'], gscale['quantiles'][0], gscale['qvalues'][0],
+            gscale['quantiles'][-1], gscale['qvalues'][-1], gscale['max'], norm.vmin, norm.vmax))
+        for ifile, error in gscale['failed']:
+            print('  {:s}: not in colour scale: {:s}'.format(ifile, error))
+
+    jobs = []
+    for ff in files:
+        pngbase = os.path.join(outdir, os.path.splitext(os.path.basename(ff))[0]+'_')
+        if quicklook:
+            vrange = (None, None) if (norm is None) else (norm.vmin, norm.vmax)
+            jobs.append((ff, variable, pngbase, timesteps, vrange, size if (size > 0) else None, reduce,
+                         colormap if (colormap != '') else None))
+        else:
+            jobs.append((ff, variable, pngbase, timesteps, norm))
+
+    # -------------------------------------------------------------------------
+    # Plot files in parallel
+    # -------------------------------------------------------------------------
+    print('Plot ', len(files), ' files on ', nprocs, ' processes')
+    tstart  = time.time()
+    ctx     = mp.get_context('spawn')   # fresh interpreter: no matplotlib state inherited
+    if quicklook:
+        # no matplotlib in the workers; several files per task for thousands of small files
+        pool    = ctx.Pool(processes=nprocs)
+        iresult = pool.imap_unordered(quicklook_file, jobs, chunksize=max(1, min(16, len(jobs) // (4*nprocs))))
+    else:
+        pool    = ctx.Pool(processes=nprocs, initializer=init_worker)
+        iresult = pool.imap_unordered(plot_file, jobs, chunksize=1)
+    results = []
+    for ifile, itime, error in iresult:
+        results.append((ifile, itime, error))
+        if (error == '') and quicklook:
+            print('  {:s}: {:d} frames in {:.2f} s: {:s}'.format(ifile, itime['nframes'], itime['total'],
+                  '; '.join([ 'min {:g}, max {:g}, NaN {:.1f}%'.format(zmin, zmax, 100.*fnan) for zmin, zmax, fnan in itime['stats'] ])))
+        elif error == '':
+            print('  {:s}: {:d} frames in {:.2f} s (process {:d})'.format(ifile, itime['nframes'], itime['total'], itime['pid']))
+        else:
+            print('  {:s}: FAILED: {:s}'.format(ifile, error))
+    pool.close()
+    pool.join()
+    twall = time.time() - tstart
+
+    # -------------------------------------------------------------------------
+    # Timing summary
+    # -------------------------------------------------------------------------
+    ok     = [ rr for rr in results if rr[2] == '' ]
+    failed = [ rr for rr in results if rr[2] != '' ]
+    print('')
+    print('Timing summary per file [s]')
+    print('{:<50s} {:>7s} {:>8s} {:>8s} {:>8s}'.format('file', 'frames', 'setup', 'render', 'total'))
+    for ifile, itime, error in sorted(ok, key=lambda rr: -rr[1]['total']):
+        print('{:<50s} {:>7d} {:>8.2f} {:>8.2f} {:>8.2f}'.format(os.path.basename(ifile), itime['nframes'],
+                                                                itime['setup'], itime['render'], itime['total']))
+    if len(ok) > 0:
+        ttotal = [ rr[1]['total'] for rr in ok ]
+        print('')
+        print('Files:  {:d} plotted, {:d} failed'.format(len(ok), len(failed)))
+        print('Per file: min {:.2f} s, mean {:.2f} s, max {:.2f} s'.format(min(ttotal), sum(ttotal)/len(ttotal), max(ttotal)))
+    print('Wall time {:.2f} s on {:d} processes ({:.2f} files per second)'.format(twall, nprocs, len(results)/twall))
+    for ifile, itime, error in failed:
+        print('Failed: ', ifile, ': ', error)
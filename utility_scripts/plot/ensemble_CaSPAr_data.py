@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Ensemble mean, spread and exceedance probability of a GEPS or REPS variable.
+
+The members are read one at a time, from the member dimension of one file or from several files
+(one member or a member dimension each), and reduced with Welford's online algorithm, so that
+never all members are in memory. Bands of grid rows of some time steps are reduced in parallel
+by a pool of worker processes. The statistics are written to a NetCDF file like a CaSPAr file
+with the variables <VARNAME>_mean, <VARNAME>_spread and, if a threshold is given, <VARNAME>_prob,
+which can be plotted with plot_CaSPAr_data.py, batch_plot_CaSPAr_data.py or tile_CaSPAr_data.py.
+
+Run with::
+
+      CaSPAr-FILES    ... file with member dimension or files with one member or member dimension each
+                          (glob patterns allowed)
+      VARNAME         ... name of variable
+      STATS-FILE      ... name of NetCDF output file
+      TIMESTEPS       ... time steps (default: 0)
+      THRESHOLD       ... probability of VARNAME > THRESHOLD is calculated if given
+      NPROCS          ... number of worker processes (default: number of cores)
+
+      run ensemble_CaSPAr_data.py -i <CaSPAr-FILES> -v <VARNAME> -o <STATS-FILE> -s <TIMESTEPS> -q <THRESHOLD>
+      run ensemble_CaSPAr_data.py -i my/path/REPS_2017100200.nc -v REPS_P_PR_SFC -o REPS_stats.nc -s all -q 1.
+      run plot_CaSPAr_data.py -i REPS_stats.nc -v REPS_P_PR_SFC_mean,REPS_P_PR_SFC_prob -s all -p REPS_stats.pdf
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfiles = []
+variable   = ''
+outputfile = ''
+timesteps  = '0'
+threshold  = None
+nprocs     = 0
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Ensemble statistics for CASPAR.''')
+parser.add_argument('-i', '--inputfiles', action='store', nargs='+', default=inputfiles, dest='inputfiles',
+                    help="NC file with member dimension or NC files with one member or a member dimension each (glob patterns allowed).")
+parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
+                    help="Name of variable.")
+parser.add_argument('-o', '--outputfile', action='store', default=outputfile, dest='outputfile',
+                    help="Name of NC output file with ensemble statistics.")
+parser.add_argument('-s', '--timesteps', action='store', default=timesteps, dest='timesteps',
+                    help="Time steps: single index, 'all' or slice 'i:j:k' (default: 0).")
+parser.add_argument('-q', '--threshold', action='store', type=float, default=threshold, dest='threshold',
+                    help="Threshold of exceedance probability (default: no probability).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of worker processes (default: number of cores).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import glob
+import time
+
+
+if __name__ == '__main__':
+
+    args       = parser.parse_args()
+    inputfiles = args.inputfiles
+    variable   = args.variable
+    outputfile = args.outputfile
+    timesteps  = args.timesteps
+    threshold  = args.threshold
+    nprocs     = args.nprocs
+    del parser, args
+
+    import xarray as xr
+    import caspar                     # in lib/
+
+    files = []
+    for ii in inputfiles:
+        ifiles = sorted(glob.glob(ii))
+        if len(ifiles) == 0:
+            print('Warning: no file found for: ', ii)
+        files += ifiles
+    if (len(files) == 0) or (outputfile == ''):
+        raise ValueError('ensemble_CaSPAr_data: input files and output file must be given.')
+
+    ds     = xr.open_dataset(files[0])
+    itimes = caspar.parse_timesteps(timesteps, ds[variable].shape[0])
+    ds.close()
+
+    tstart = time.time()
+    stats  = caspar.ensemble_stats(files, variable, itimes=itimes, threshold=threshold, nprocs=nprocs)
+    tstats = time.time() - tstart
+
+    tmpfile = outputfile+'.'+str(os.getpid())+'.tmp'
+    stats.to_netcdf(tmpfile)
+    os.rename(tmpfile, outputfile)
+
+    print('Ensemble statistics of {:d} members and {:d} time steps in {:.2f} s (peak RSS {:.1f} MB)'.format(
+        stats.attrs['nmembers'], len(itimes), tstats, caspar.peak_rss()))
+    print('Wrote ', ', '.join([ vv for vv in stats.data_vars if vv.startswith(variable+'_') ]), ' to ', outputfile)
@@ -29,11 +29,64 @@ Run with::
 
       PNG-FILENAME    ... name of the plot created (PNG extension is appended automatically)
       CaSPAr-FILENAME ... name incl. path to one of your netCDF files
-      VARNAME         ... name of variable that you want to plot
+      VARNAME         ... name of variable that you want to plot; several variables separated by commas
+      TIMESTEPS       ... time steps to plot (default: 0, i.e. first time step only)
+                          'all' or a Python slice 'i:j:k', e.g. '0:48' or '::6'
 
       run plot_CASPAR_data.py -i PNG-FILENAME -v <VARNAME> -g <PNG-FILENAME>
       run plot_CASPAR_data.py -i my/path/CaLDAS_2017100218.nc  -v CaLDAS_A_I0_Profile -g CaLDAS_2017100200_000
 
+      Animation mode: figure, map, cell boundaries and projected coordinates are set up once and
+      only the data and the title are updated for every time step (one PNG per time step or one
+      PDF page per time step):
+
+      run plot_CASPAR_data.py -i my/path/RDPS_2017100212.nc -v RDPS_P0_SFC -s all -g RDPS_2017100212_
+
+      Raster engine (-e): 'pcolormesh' draws one QuadMesh on the cell boundaries, 'imshow' an image
+      (only grids that are rectilinear on the map), 'pcolor' one polygon per cell (slow, large PDFs).
+      Default 'auto' uses imshow where possible and pcolormesh otherwise. 'native' draws fields on
+      rotated latitude-longitude grids (RDPS, HRDPS, CaPA, ...) as an image in the rotated
+      coordinates on a rotated-pole map; only coastlines and graticules are transformed:
+
+      run plot_CASPAR_data.py -i my/path/HRDPS_2017100212.nc -v HRDPS_P_PR_SFC -s all -g HRDPS_2017100212_ -e native
+
+      Hyperslab selection: only the selected time step (-d, index or ISO datetime), level (-l) and
+      bounding box (-b, lonmin,latmin,lonmax,latmax in degrees) are read from the file:
+
+      run plot_CASPAR_data.py -i my/path/HRDPS_2017100212.nc -v HRDPS_P_PR_SFC -d 2017-10-02T18:00 -b=-80,40,-70,50 -g HRDPS_
+
+      Level of detail (-r): grid cells are block-reduced (mean, max or nearest) to about one block
+      per output pixel before drawing, so that fine grids render about as fast as coarse ones:
+
+      run plot_CASPAR_data.py -i my/path/HRDPS_2017100212.nc -v HRDPS_P_PR_SFC -s all -r mean -g HRDPS_
+
+      Multi-page PDF (-p): one page per time step and variable. The field is rasterised at RASTERDPI
+      (-a, default: 150; 0 for vector graphics) while coastlines, graticules and labels stay vector,
+      and every page is written to the file when it is finished, so that long runs need little memory:
+
+      run plot_CASPAR_data.py -i my/path/HRDPS_2017100212.nc -v HRDPS_P_PR_SFC,HRDPS_P_TT_09944 -s all -p HRDPS_2017100212.pdf
+
+      Profiling (--profile): wall time, CPU time and peak memory of every stage (open, edges, map,
+      projection, read, draw, savefig) are written as JSON lines to standard output or to a file;
+      --profile-dump writes the cProfile statistics of the slowest stage (read with pstats or snakeviz):
+
+      run plot_CASPAR_data.py -i my/path/HRDPS_2017100212.nc -v HRDPS_P_PR_SFC -s all -g HRDPS_ --profile stages.jsonl --profile-dump slowest.prof
+
+      Comparison (-j, -w): plot variable of the first file minus variable of the second file at the
+      valid times present in both, e.g. forecast minus analysis. The field of one file is regridded
+      onto the grid of the other (-o 1 or 2, default: 2) with sparse interpolation weights that are
+      computed once per pair of grids and cached on disk. The difference is written one time step
+      at a time to a NetCDF file in the cache directory and drawn from there with a diverging
+      brewer colour map (-m, default: brbg11) and a colour scale symmetric around zero:
+
+      run plot_CASPAR_data.py -i my/path/RDPS_2017100212.nc -v RDPS_P_PR_SFC -j my/path/CaPA_fine_2017100212.nc -w CaPA_fine_A_PR0_SFC -s all -g diff_
+
+      Render server: if render_server_CaSPAr.py is running, PNG and PDF jobs are sent to the server,
+      which has all packages imported and Basemaps and grids set up already (use -x to plot locally):
+
+      run render_server_CaSPAr.py -w RDPS HRDPS &
+      run plot_CASPAR_data.py -i my/path/RDPS_2017100212.nc -v RDPS_P0_SFC -g RDPS_2017100212_
+
       
 """
 
@@ -48,6 +101,20 @@ inputfile = ''
 variable  = ''
 pdffile   = ''
 usetex    = False
+timesteps = '0'
+engine    = 'auto'
+seltime   = None
+level     = None
+bbox      = None
+lod       = 'none'
+rasterdpi = 150
+local     = False
+profile   = None
+profdump  = ''
+inputfile2 = ''
+variable2  = ''
+onto       = 2
+colormap   = ''
 
 parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
                                   description='''Plots for CASPAR.''')
@@ -61,9 +128,47 @@ parser.add_argument('-t', '--usetex', action='store_true', default=usetex, dest=
                     help="Use LaTeX to render text in pdf.")
 
 parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
-                    help="Name of variable which will be plotted.")
+                    help="Name of variable which will be plotted; several variables separated by commas.")
 parser.add_argument('-i', '--inputfile', action='store', default=inputfile, dest='inputfile',
                     help="Name of NC file containing data.")
+parser.add_argument('-s', '--timesteps', action='store', default=timesteps, dest='timesteps',
+                    help="Time steps to plot: single index, 'all' or slice 'i:j:k' (default: 0).")
+parser.add_argument('-e', '--engine', action='store', default=engine, dest='engine',
+                    choices=['auto', 'pcolor', 'pcolormesh', 'imshow', 'native'],
+                    help="Raster engine: pcolor, pcolormesh (QuadMesh on cell boundaries), imshow "
+                         "(rectilinear grids only), native (image in rotated coordinates of rotated grids) "
+                         "or auto (default: imshow if possible, else pcolormesh).")
+
+parser.add_argument('-d', '--time', action='store', default=seltime, dest='seltime',
+                    help="Read only this time step: index or ISO datetime, e.g. 2017-10-02T18:00 (default: all).")
+parser.add_argument('-l', '--level', action='store', default=level, dest='level',
+                    help="Read only this level index of 4D variables (default: first level).")
+parser.add_argument('-b', '--bbox', action='store', default=bbox, dest='bbox',
+                    help="Read only cells within lonmin,latmin,lonmax,latmax [degree]; use -b=-80,40,-70,50 "
+                         "for negative longitudes (default: whole domain).")
+parser.add_argument('-r', '--lod', action='store', default=lod, dest='lod',
+                    choices=['none', 'mean', 'max', 'nearest'],
+                    help="Level of detail: reduce blocks of grid cells to about one output pixel with "
+                         "mean, max or nearest cell before drawing (default: none, i.e. every cell).")
+parser.add_argument('-a', '--rasterdpi', action='store', type=int, default=rasterdpi, dest='rasterdpi',
+                    help="Resolution of the rasterised field in PDF output; 0: vector graphics (default: 150).")
+parser.add_argument('--profile', action='store', nargs='?', const='-', default=profile, dest='profile',
+                    metavar='JSONFILE',
+                    help="Write wall time, CPU time and peak memory of every stage as JSON lines to JSONFILE "
+                         "(default: standard output); plots locally.")
+parser.add_argument('--profile-dump', action='store', default=profdump, dest='profdump', metavar='PROFFILE',
+                    help="Write cProfile statistics of the slowest stage to PROFFILE (with --profile).")
+parser.add_argument('-j', '--inputfile2', action='store', default=inputfile2, dest='inputfile2',
+                    help="Name of second NC file: plot variable of -i minus variable of -j (default: no comparison).")
+parser.add_argument('-w', '--variable2', action='store', default=variable2, dest='variable2',
+                    help="Name of variable in second NC file (default: same as -v).")
+parser.add_argument('-o', '--onto', action='store', type=int, default=onto, dest='onto', choices=[1, 2],
+                    help="Grid of the difference: 1: grid of -i, 2: grid of -j (default: 2).")
+parser.add_argument('-m', '--colormap', action='store', default=colormap, dest='colormap',
+                    help="Brewer colour map of color.get_brewer (default: brbg11 for differences, "
+                         "reversed dark_rainbow_256 otherwise).")
+parser.add_argument('-x', '--local', action='store_true', default=local, dest='local',
+                    help="Plot in this process even if a render server is running.")
 
 args            = parser.parse_args()
 pngbase         = args.pngbase
@@ -71,6 +176,20 @@ pdffile         = args.pdffile
 usetex          = args.usetex
 variable        = args.variable
 inputfile       = args.inputfile
+timesteps       = args.timesteps
+engine          = args.engine
+seltime         = args.seltime
+level           = args.level
+bbox            = args.bbox
+lod             = args.lod
+rasterdpi       = args.rasterdpi
+local           = args.local
+profile         = args.profile
+profdump        = args.profdump
+inputfile2      = args.inputfile2
+variable2       = args.variable2
+onto            = args.onto
+colormap        = args.colormap
 
 if (pdffile != '') & (pngbase != ''):
     print('\nError: PDF and PNG are mutually exclusive. Only either -p or -g possible.\n')
@@ -89,14 +208,11 @@ dir_path = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(dir_path+'/../lib')
 
 # import packages after help so that help with command line -h is fast
-import numpy as np
-import time
-import xarray as xr
-import pandas as pd
+import caspar                     # in lib/
 
-import color                      # in lib/
-from position   import position   # in lib/
-from str2tex    import str2tex    # in lib/
+if (profile is not None):
+    caspar.enable_profile(jsonfile=profile, cprofile=(profdump != ''))
+    local = True                  # profile this process, not the render server
 
 # -------------------------------------------------------------------------
 # Customize plots
@@ -110,321 +226,80 @@ if (pdffile == ''):
 else:
     outtype = 'pdf'
 
-# Main plot
-nrow        = 3           # # of rows of subplots per figure
-ncol        = 1           # # of columns of subplots per figure
-hspace      = 0.05        # x-space between subplots
-vspace      = 0.04        # y-space between subplots
-right       = 0.9         # right space on page
-textsize    = 7           # standard text size
-textsize_clock = 0.6*textsize        # standard text size
-dxabc       = 0.95        # % of (max-min) shift to the right from left y-axis for a,b,c,... labels
-dyabc       = 0.9         # % of (max-min) shift up from lower x-axis for a,b,c,... labels
-dxabc_clock = 2.3         # % of (max-min) shift to the right from left y-axis for a,b,c,... labels
-dyabc_clock = 0           # % of (max-min) shift up from lower x-axis for a,b,c,... labels
-dxsig       = 1.23        # % of (max-min) shift to the right from left y-axis for a,b,c,... labels
-dysig       = -0.05       # % of (max-min) shift up from lower x-axis for a,b,c,... labels
-
-lwidth      = 1.5         # linewidth
-elwidth     = 1.0         # errorbar line width
-alwidth     = 1.0         # axis line width
-glwidth     = 0.5         # grid line width
-msize       = 1.0         # marker size
-mwidth      = 1.0         # marker edge width
-mcol1       = '0.0'       # primary marker colour
-mcol2       = '0.4'                     # secondary
-mcol3       = '0.0' # third
-mcols       = ['0.0', '0.4', '0.4', '0.7', '0.7', '1.0']
-lcol1       = color.colours('blue')   # primary line colour
-lcol2       = '0.4'
-lcol3       = '0.0'
-lcols       = ['None', 'None', 'None', 'None', 'None', '0.0']
-hatches     = [None, None, None, None, None, '//']
-dobw      = False # True: black & white
-
-# Legend
-llxbbox       = 0.0         # x-anchor legend bounding box
-llybbox       = 1.0        # y-anchor legend bounding box
-llxbbox_clock = -0.2        # x-anchor legend bounding box clock_plot
-llybbox_clock = 1.08        # y-anchor legend bounding box clock_plot
-llrspace      = 0.          # spacing between rows in legend
-llcspace      = 1.0         # spacing between columns in legend
-llhtextpad    = 0.4         # the pad between the legend handle and text
-llhlength     = 1.5         # the length of the legend handles
-frameon       = False       # if True, draw a frame around the legend. If None, use rc
-
-# PNG
-dpi           = 600
-transparent   = False
-bbox_inches   = 'tight'
-pad_inches    = 0.035
-
-# Clock options
-ymax          = 0.8
-ntextsize     = textsize_clock # 'medium'   # normal textsize
-# modules
-bmod          = 0.5         # fraction of ymax from center to start module colours
-alphamod      = 0.7         # alpha channel for modules
-fwm           = 0.05         # module width to remove at sides
-ylabel1       = 1.15        # position of module names
-ylabel2       = 1.35        # position of class names
-mtextsize     = 1.3*textsize_clock #'large' # 1.3*textsize # textsize of module labels
-# bars
-bpar          = 0.4         # fraction of ymax from center to start with parameter bars
-fwb           = [0.7,0.4,0.3]  # width of bars
-plwidth       = 0.5
-# parameters in centre
-bplabel       = 0.1        # fractional distance of ymax of param numbers in centre from 0-line
-ptextsize     = textsize_clock/1.3 #'small' # 0.8*textsize # textsize of param numbers in centre
-# yaxis
-ytextsize     = textsize_clock/1.3 #'small' # 0.8*textsize # textsize of y-axis
-
-import matplotlib as mpl
-if (outtype == 'pdf'):
-    mpl.use('PDF') # set directly after import matplotlib
+# -------------------------------------------------------------------------
+# Send job to render server if one is running
+#
+
+variables = variable.split(',')
+
+if (inputfile2 != ''):
+    if (len(variables) > 1):
+        print('\nError: comparison (-j) only for one variable.\n')
+        sys.exit(1)
+    local = True                  # difference is computed in this process
+
+if (outtype != 'x') and (not usetex) and (not local) and (len(variables) == 1):
+    from caspar.server import submit
+    absfile = lambda ff: os.path.abspath(ff) if (ff != '') else ff   # server has other working directory
+    answer  = submit({'command': 'plot', 'inputfile': absfile(inputfile), 'variable': variable,
+                      'pngbase': absfile(pngbase), 'pdffile': absfile(pdffile), 'timesteps': timesteps,
+                      'engine': engine, 'seltime': seltime, 'level': level, 'bbox': bbox, 'lod': lod,
+                      'rasterdpi': rasterdpi, 'cmap': colormap if (colormap != '') else None})
+    if answer is not None:
+        if not answer['ok']:
+            print('Error: render server: '+answer['error'])
+            sys.exit(1)
+        print('Rendered {:d} frames on render server in {:.2f} s'.format(answer['result']['nframes'], answer['time']))
+        sys.exit()
+
+# -------------------------------------------------------------------------
+# Comparison: difference of both files on one grid, symmetric diverging colour scale
+#
+
+norm = None
+if (inputfile2 != ''):
+    import time
+    tstart    = time.time()
+    diff      = caspar.difference_dataset(inputfile, variable, inputfile2, variable2 if (variable2 != '') else variable,
+                                          onto=onto, timesteps=timesteps)
+    inputfile = diff
+    variables = list(diff.data_vars)[:1]
+    timesteps = 'all'             # selected among the common valid times already
+    norm      = [-diff.attrs['absmax'], diff.attrs['absmax']]
+    colormap  = colormap if (colormap != '') else caspar.diff_cmap
+    print('Difference of {:d} common time steps in {:.2f} s'.format(diff.sizes['time'], time.time()-tstart))
+
+with caspar.stage('import'):
+    caspar.set_plot_style(outtype, usetex=usetex)   # sets backend; before pyplot is imported
     import matplotlib.pyplot as plt
+
+# -------------------------------------------------------------------------
+# Plot
+# -------------------------------------------------------------------------
+
+if (outtype == 'pdf') and (len(variables) > 1):
     from matplotlib.backends.backend_pdf import PdfPages
-    # Customize: http://matplotlib.sourceforge.net/users/customizing.html
-    mpl.rc('ps', papersize='a4', usedistiller='xpdf') # ps2pdf
-    mpl.rc('figure', figsize=(8.27,11.69)) # a4 portrait
-    if usetex:
-        mpl.rc('text', usetex=True)
-    else:
-        mpl.rc('font',**{'family':'sans-serif','sans-serif':['Helvetica']})
-        #mpl.rc('font',**{'family':'serif','serif':['times']})
-    mpl.rc('text.latex', unicode=True)
-elif (outtype == 'png'):
-    mpl.use('TkAgg') # set directly after import matplotlib
-    import matplotlib.pyplot as plt
-    mpl.rc('figure', figsize=(8.27,11.69)) # a4 portrait
-    if usetex:
-        mpl.rc('text', usetex=True)
-    else:
-        mpl.rc('font',**{'family':'sans-serif','sans-serif':['Helvetica']})
-        #mpl.rc('font',**{'family':'serif','serif':['times']})
-    mpl.rc('text.latex', unicode=True)
-    mpl.rc('savefig', dpi=dpi, format='png')
-else:
-    import matplotlib.pyplot as plt
-    mpl.rc('figure', figsize=(4./5.*8.27,4./5.*11.69)) # a4 portrait
-mpl.rc('font', size=textsize)
-mpl.rc('lines', linewidth=lwidth, color='black')
-mpl.rc('axes', linewidth=alwidth, labelcolor='black')
-mpl.rc('path', simplify=False) # do not remove
-
-from matplotlib.patches import Rectangle, Circle, Polygon
-from mpl_toolkits.basemap import Basemap
-
-# colors
-if dobw:
-    c = np.linspace(0.2, 0.85, nmod)
-    c = np.ones(nmod)*0.7
-    c = [ str(i) for i in c ]
-    ocean_color = '0.1'
+    pdf_pages = PdfPages(pdffile)   # pages of all variables in one file
 else:
-    c = color.get_brewer('dark_rainbow_256', rgb=True)
-    c = c[::-1] # reverse colors
-    ocean_color = (151/256., 183/256., 224/256.)
-
-cmap = mpl.colors.ListedColormap(c)
-
-# use a colormap from Brewer module
-cc        = color.get_brewer('gsdtol', rgb=True)[10:]
-cmap_gray = mpl.colors.ListedColormap(cc)
-
-if (True):
-
-    # Latlon
-    fname    = inputfile
-
-    ds       = xr.open_dataset(fname)
-    lon      = ds['lon'].data        # 1D or 2D field
-    lat      = ds['lat'].data        # 1D or 2D field
-    var      = ds[variable].data[0]  #       2D field
-    product  = ds.attrs['product']
-
-    if (product == 'GDPS' or product == 'GEPS'):
-        lon = np.where(lon<0., lon+360., lon)
-        lon[:,-1] = 359.999999   # this is a hack
-
-    # first time step as a string in nice format
-    timestep = ds['time'].data[0]                              # numpy.datetime64('2017-10-02T18:00:00.000000000')
-    timestep = pd.to_datetime(str(timestep))                   # Timestamp('2017-10-02 18:00:00')
-    timestep = timestep.strftime('%d %h %Y %H:%M:%S')+' UTC'   # '02 Oct 2017 18:00:00 UTC'
-
-    # some variable properties
-    unit      = ds[variable].attrs['units']
-    longname  = ds[variable].attrs['long_name'] 
-
-    # 1D lats and lons
-    if (len(np.shape(lon)) == 1):
-        nlat = lat.shape[0]
-        nlon = lon.shape[0]
-        lon       = np.array([ lon for ilat in range(nlat) ])
-        lon[:,-1] = 359.999999   # this is a hack
-        lat = np.transpose(np.array([ lat for ilon in range(nlon) ]))
-    elif (len(np.shape(lon)) == 2):
-        nlat = lat.shape[0]
-        nlon = lon.shape[1]
-    else:
-        raise ValueError('plot_CASPAR_data: lon and lat has to be either 1D or 2D')
-    
-    # boundaries between lats and lons
-    lonh = np.empty((nlat+1,nlon+1), dtype=np.float)
-    lath = np.empty((nlat+1,nlon+1), dtype=np.float)
-    dlon = np.diff(lon,axis=1)
-    dlat = np.diff(lat,axis=0)
-    lonh[0:nlat,0]      = lon[:,0]         - 0.5*dlon[:,0]          # 0
-    lonh[0:nlat,1:nlon] = lonh[0:nlat,0:1] + np.cumsum(dlon,axis=1) # 1:nlon+1
-    lonh[0:nlat,-1]     = lon[:,-1]        + 0.5*dlon[:,-1]         # nlon
-    lonh[nlat,0:nlon+1] = lonh[nlat-1,0:nlon+1]                     # lower corner of box: assign last upper boundary
-    lath[0,0:nlon]      = lat[0,:]         - 0.5*dlat[0,:]
-    lath[1:nlat,0:nlon] = lath[0:1,0:nlon] + np.cumsum(dlat,axis=0)
-    lath[-1,0:nlon]     = lat[-1,:]        + 0.5*dlat[-1,:]
-    lath[0:nlat+1,nlon] = lath[0:nlat+1,nlon-1]
-
-    # -------------------------------------------------------------------------
-    # Plot
-    # -------------------------------------------------------------------------
-
-    if (outtype == 'pdf'):
-        print('Plot PDF ', pdffile)
-        pdf_pages = PdfPages(pdffile)
-    elif (outtype == 'png'):
-        print('Plot PNG ', pngbase)
-    else:
-        print('Plot X')
-    # figsize = mpl.rcParams['figure.figsize']
-
-    ifig = 0
-
-    # -------------------------------------------------------------------------
-    # Fig 1 :: map with color bar (whole domain)
-    # -------------------------------------------------------------------------
-    ifig += 1
-    iplot = 0
-    print('Plot - Fig ', ifig, ' ::  ')
-    fig = plt.figure(ifig)
-
-    # -------------------------------------------------------------------------
-    # (1a) map:: glb
-    # -------------------------------------------------------------------------
-    iplot += 1
-    sub    = fig.add_axes(position(nrow,ncol,1,hspace=hspace,vspace=vspace) )
-
-    if (product == 'CaPA_coarse'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'CaPA_coarse_exp'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'CaPA_fine'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'GDPS'):
-        # Miller projection
-        map = Basemap(projection='mill',lon_0=180)
-        # map = Basemap(projection='npstere',boundinglat=-10,lon_0=270,resolution='c')
-        parallels = np.arange(-90,90,30)
-        meridians = np.arange(-360,1,60)
-    elif (product == 'GEPS'):
-        # Miller projection
-        map = Basemap(projection='mill',lon_0=180)
-        parallels = np.arange(-90,90,30)
-        meridians = np.arange(-360,1,60)
-    elif (product == 'RDRS'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=-10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'RDRS_v2'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=-10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'RDPS'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=-10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'REPS'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'CaLDAS'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == 'HRDPS'):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    elif (product == ''):
-        # Polar Stereographic Projection
-        map = Basemap(projection='npstere',boundinglat=10,lon_0=270,resolution='c')
-        parallels = np.arange(-80,80,20)
-        meridians = np.arange(-360,1,40)
-    else:
-        raise ValueError('Product not implemented')
-    
-    # plot coastlines, draw label meridians and parallels.
-    # labels = [left, right, top, bottom]
-    map.drawcoastlines()
-    map.drawparallels(parallels,labels=[1,0,0,0],linewidth=0.5)
-    map.drawmeridians(meridians,labels=[0,1,0,1],linewidth=0.5)
-
-    lon_unwrapped = lon
-
-    # geo-referenced
-    xx, yy = map(lon_unwrapped,lat)
-    zz = var[:,:]  #var[0,:,:]
-    variable_plot = map.pcolor(xx, yy, zz, cmap=cmap)
-
-    # set title as time step
-    sub.set_title(timestep,fontsize=textsize)
-
-    # abc2plot(sub, dxabc, dyabc, iplot, lower=True, parenthesis='close',
-    #          bold=True, large=True,
-    #          mathrm=True, usetex=usetex,
-    #          horizontalalignment='right', verticalalignment='bottom')
-
-    # -------------------------------------------------------------------------
-    # (1b) Colorbar
-    # -------------------------------------------------------------------------
-    iplot += 1
-    sub    = fig.add_axes(position(1,1,1,hspace=hspace,vspace=vspace, left=0.3, right=0.7, top=0.642, bottom=0.632) )
-
-    # minimal value
-    var_minval = np.nanmin(var)
-    var_maxval = np.nanmax(var)
-    cbar = mpl.colorbar.ColorbarBase(sub, norm=mpl.colors.Normalize(vmin=var_minval, vmax=var_maxval), cmap=cmap, orientation='horizontal')
-    cbar.set_label(variable+': '+longname+' [$'+str2tex(unit.replace('**','^').replace('-1','{-1}').replace('_','\_'),usetex=usetex)+'$]')
-    
-    if (outtype == 'pdf'):
-        pdf_pages.savefig(fig)
-        plt.close(fig)
-    elif (outtype == 'png'):
-        pngfile = pngbase+"{0:04d}".format(ifig)+".png"
-        fig.savefig(pngfile, transparent=transparent, bbox_inches=bbox_inches, pad_inches=pad_inches)
-        plt.close(fig)
+    pdf_pages = pdffile
+for ivar in variables:
+    ipngbase = pngbase+ivar+'_' if (pngbase != '') and (len(variables) > 1) else pngbase
+    caspar.plot_caspar(inputfile, ivar, pngbase=ipngbase, pdffile=pdf_pages,
+                       timesteps=timesteps, usetex=usetex, engine=engine,
+                       seltime=seltime, level=level, bbox=bbox, lod=lod, rasterdpi=rasterdpi,
+                       norm=norm, cmap=colormap if (colormap != '') else None)
+if (pdf_pages is not pdffile):
+    pdf_pages.close()
+
+if (profdump != ''):
+    slowest = caspar.dump_profile(profdump)
+    if slowest is not None:
+        print('cProfile statistics of slowest stage ', slowest, ' written to ', profdump)
 
 # -------------------------------------------------------------------------
 # Finished
 # -------------------------------------------------------------------------
 
-if (outtype == 'pdf'):
-    pdf_pages.close()
-elif (outtype == 'png'):
-    pass
-else:
+if (outtype == 'x'):
     plt.show()
     
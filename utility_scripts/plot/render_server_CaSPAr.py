@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Resident render server for plot_CaSPAr_data.py.
+
+The server imports xarray, pandas, matplotlib and Basemap once and keeps Basemaps, colour maps
+and grid geometries in memory. plot_CaSPAr_data.py sends its PNG and PDF jobs to the server
+whenever it is running, so that each plot only costs reading and drawing. Jobs are one line of
+JSON on a local UNIX socket (default: $CASPAR_SOCKET or ~/.cache/caspar/render.sock).
+
+Run with::
+
+      PRODUCTS        ... products whose Basemaps are built at start (optional)
+      SOCKET          ... name of UNIX socket (optional)
+
+      run render_server_CaSPAr.py -w <PRODUCTS> -s <SOCKET>
+      run render_server_CaSPAr.py -w RDPS HRDPS CaPA_fine &
+      run render_server_CaSPAr.py -q      # stop running server
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+socketfile = ''
+warm       = []
+stop       = False
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Render server for CASPAR plots.''')
+parser.add_argument('-s', '--socket', action='store', default=socketfile, dest='socketfile',
+                    help="Name of UNIX socket (default: $CASPAR_SOCKET or ~/.cache/caspar/render.sock).")
+parser.add_argument('-w', '--warm', action='store', nargs='+', default=warm, dest='warm',
+                    help="Products whose Basemaps are built at start, e.g. RDPS HRDPS.")
+parser.add_argument('-q', '--stop', action='store_true', default=stop, dest='stop',
+                    help="Stop the running server.")
+
+args       = parser.parse_args()
+socketfile = args.socketfile
+warm       = args.warm
+stop       = args.stop
+
+del parser, args
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+from caspar.server import serve, submit, default_socket   # in lib/
+
+if (socketfile == ''):
+    socketfile = default_socket()
+
+if stop:
+    answer = submit({'command': 'stop'}, socketfile=socketfile)
+    if answer is None:
+        print('No render server running on ', socketfile)
+    else:
+        print('Stopped render server on ', socketfile)
+else:
+    serve(socketfile=socketfile, warm=warm)
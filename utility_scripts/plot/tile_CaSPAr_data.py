@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Writes Web-Mercator XYZ map tiles (256 x 256 PNG) of a CaSPAr variable for a web map viewer.
+
+Tiles are written to TILE-DIR/<time>/<z>/<x>/<y>.png with <time> as YYYYMMDDTHHMM, i.e. a viewer
+uses the URL template TILE-DIR/<time>/{z}/{x}/{y}.png. Tiles outside of the grid or with only
+missing values are not written. Only the tiles overlapping the grid are rendered
+(caspar.grid_tiles), by a pool of worker processes in jobs of at most 256 tiles of one zoom level.
+
+The colour scale (first and last colour) and the finished time steps are stored in
+TILE-DIR/tiles.json. Running the script again, e.g. on a file with additional time steps,
+only renders the new time steps with the same colour scale. Changing variable, zoom levels or
+colour scale renders all time steps again.
+
+Run with::
+
+      CaSPAr-FILENAME ... name incl. path to one of your netCDF files
+      VARNAME         ... name of variable that you want to plot
+      TILE-DIR        ... output directory of tiles
+      ZOOMS           ... zoom levels zmin:zmax (default: 0:6)
+      TIMESTEPS       ... time steps to plot (default: all)
+      VMIN, VMAX      ... values of first and last colour (default: min and max over all time steps)
+
+      run tile_CaSPAr_data.py -i <CaSPAr-FILENAME> -v <VARNAME> -o <TILE-DIR> -z <ZOOMS>
+      run tile_CaSPAr_data.py -i my/path/RDPS_2017100212.nc -v RDPS_P_PR_SFC -o tiles/ -z 2:7 -l 0 -u 10
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfile = ''
+variable  = ''
+outdir    = '.'
+zooms     = '0:6'
+timesteps = 'all'
+vmin      = None
+vmax      = None
+nprocs    = 0
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Map tiles for CASPAR.''')
+parser.add_argument('-i', '--inputfile', action='store', default=inputfile, dest='inputfile',
+                    help="Name of NC file containing data.")
+parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
+                    help="Name of variable which will be plotted.")
+parser.add_argument('-o', '--outdir', action='store', default=outdir, dest='outdir',
+                    help="Directory for tiles (default: .).")
+parser.add_argument('-z', '--zooms', action='store', default=zooms, dest='zooms',
+                    help="Zoom levels zmin:zmax or single zoom level (default: 0:6).")
+parser.add_argument('-s', '--timesteps', action='store', default=timesteps, dest='timesteps',
+                    help="Time steps to plot: single index, 'all' or slice 'i:j:k' (default: all).")
+parser.add_argument('-l', '--vmin', action='store', type=float, default=vmin, dest='vmin',
+                    help="Value of first colour (default: minimum over all time steps).")
+parser.add_argument('-u', '--vmax', action='store', type=float, default=vmax, dest='vmax',
+                    help="Value of last colour (default: maximum over all time steps).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of worker processes (default: number of cores).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import json
+import time
+import multiprocessing as mp
+
+
+if __name__ == '__main__':
+
+    args      = parser.parse_args()
+    inputfile = args.inputfile
+    variable  = args.variable
+    outdir    = args.outdir
+    zooms     = args.zooms
+    timesteps = args.timesteps
+    vmin      = args.vmin
+    vmax      = args.vmax
+    nprocs    = args.nprocs
+    del parser, args
+
+    import numpy as np
+    import pandas as pd
+    import xarray as xr
+    import caspar                     # in lib/
+    from caspar.tiles import render_tiles
+
+    zz    = [ int(z) for z in zooms.split(':') ]
+    zooms = list(range(zz[0], zz[-1]+1))
+
+    ds     = caspar.select_hyperslab(xr.open_dataset(inputfile), variable)   # first level or member
+    itimes = caspar.parse_timesteps(timesteps, ds[variable].shape[0])
+    labels = list(pd.to_datetime(ds['time'].values[itimes]).strftime('%Y%m%dT%H%M'))
+
+    # -------------------------------------------------------------------------
+    # Colour scale and time steps already rendered
+    # -------------------------------------------------------------------------
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    metafile = os.path.join(outdir, 'tiles.json')
+    meta     = {}
+    if os.path.exists(metafile):
+        with open(metafile) as ff:
+            meta = json.load(ff)
+        if ( (meta['variable'] != variable) or (meta['zooms'] != zooms) or
+             ((vmin is not None) and (vmin != meta['vmin'])) or
+             ((vmax is not None) and (vmax != meta['vmax'])) ):
+            print('Variable, zoom levels or colour scale changed: render all time steps again')
+            meta = {}
+    if (len(meta) == 0):
+        if (vmin is None) or (vmax is None):
+            vmins, vmaxs = [], []
+            for itime in itimes:   # one time step at a time
+                var = ds[variable][itime].values
+                vmins.append(np.nanmin(var))
+                vmaxs.append(np.nanmax(var))
+            vmin = float(min(vmins)) if (vmin is None) else vmin
+            vmax = float(max(vmaxs)) if (vmax is None) else vmax
+        meta = {'variable': variable, 'zooms': zooms, 'vmin': vmin, 'vmax': vmax, 'times': []}
+    ds.close()
+
+    todo   = [ ii for ii, ll in enumerate(labels) if ll not in meta['times'] ]
+    itimes = [ itimes[ii] for ii in todo ]
+    labels = [ labels[ii] for ii in todo ]
+    if (len(itimes) == 0):
+        print('All time steps already rendered in ', outdir)
+        sys.exit()
+
+    # tiles overlapping the grid; jobs of at most 256 tiles of one zoom level
+    jobs = []
+    ds   = xr.open_dataset(inputfile)
+    for z in zooms[::-1]:
+        tiles = caspar.grid_tiles(ds, variable, z)
+        for t0 in range(0, len(tiles), 256):
+            jtiles = tiles[t0:t0+256]
+            jobs.append({'inputfile': inputfile, 'variable': variable, 'zoom': z,
+                         'xrange': (int(jtiles[0,0]), int(jtiles[-1,0])+1), 'tiles': jtiles.tolist(),
+                         'itimes': itimes, 'labels': labels,
+                         'outdir': outdir, 'vmin': meta['vmin'], 'vmax': meta['vmax']})
+    ds.close()
+
+    if nprocs <= 0:
+        nprocs = mp.cpu_count()
+    nprocs = min(nprocs, len(jobs))
+
+    # -------------------------------------------------------------------------
+    # Render tiles in parallel
+    # -------------------------------------------------------------------------
+    print('Tiles of ', len(itimes), ' time steps, zoom levels ', zooms[0], '-', zooms[-1], ' on ', nprocs, ' processes')
+    print('Colour scale: {:g} to {:g}'.format(meta['vmin'], meta['vmax']))
+    tstart   = time.time()
+    ctx      = mp.get_context('spawn')
+    pool     = ctx.Pool(processes=nprocs)
+    nwritten = 0
+    nempty   = 0
+    for result in pool.imap_unordered(render_tiles, jobs, chunksize=1):
+        nwritten += result['written']
+        nempty   += result['empty']
+        print('  zoom {:d}, columns {:d}-{:d}: {:d} tiles in {:.2f} s'.format(result['zoom'], result['xrange'][0],
+                                                                           result['xrange'][1]-1, result['written'], result['time']))
+    pool.close()
+    pool.join()
+    twall = time.time() - tstart
+
+    meta['times'] = sorted(meta['times'] + labels)
+    caspar.save_json(metafile, meta)
+
+    print('Wrote {:d} tiles, skipped {:d} empty tiles in {:.2f} s'.format(nwritten, nempty, twall))
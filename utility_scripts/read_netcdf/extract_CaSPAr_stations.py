@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Extracts time series of a variable at stations from many CaSPAr files into one CSV table.
+
+read_python.py reads one grid cell by its indexes. Here the stations are given by longitude and
+latitude and can lie on any, also curvilinear, grid: the cell centres of every grid are put into
+a KD-tree, which is built once per grid and cached on disk (see caspar.station_table). Values
+are taken from the nearest cell or interpolated bilinearly (-m). Every file is read once with
+all stations at a time, files are read in parallel, and the series of all files are written as
+one table with one row per time step and one column per station. Stations outside of the grid
+get empty values.
+
+Run with::
+
+      CaSPAr-FILES    ... file names or glob patterns of netCDF files (quote patterns)
+      VARNAME         ... name of variable
+      STATIONS        ... CSV file with columns id, lon and lat of the stations (header line)
+      CSV-FILE        ... output table
+      METHOD          ... nearest or bilinear (default: nearest)
+      NPROCS          ... number of worker processes (default: number of cores)
+
+      run extract_CaSPAr_stations.py -i <CaSPAr-FILES> -v <VARNAME> -s <STATIONS> -o <CSV-FILE>
+      run extract_CaSPAr_stations.py -i 'my/path/RDPS_*.nc' -v RDPS_P_PR_SFC -s stations.csv -o RDPS_stations.csv -m bilinear
+      run extract_CaSPAr_stations.py -f filelist.txt -v CaPA_fine_A_PR0_SFC -s stations.csv -o CaPA_stations.csv -n 16
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfiles = []
+filelist   = ''
+variable   = ''
+stations   = ''
+outfile    = 'stations.csv'
+method     = 'nearest'
+nprocs     = 0
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Station time series of CASPAR.''')
+parser.add_argument('-i', '--inputfiles', action='store', nargs='+', default=inputfiles, dest='inputfiles',
+                    help="Names or glob patterns of NC files containing data.")
+parser.add_argument('-f', '--filelist', action='store', default=filelist, dest='filelist',
+                    help="Text file with names of NC files, one per line.")
+parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
+                    help="Name of variable which will be extracted.")
+parser.add_argument('-s', '--stations', action='store', default=stations, dest='stations',
+                    help="CSV file with columns id, lon and lat of stations (header line).")
+parser.add_argument('-o', '--outfile', action='store', default=outfile, dest='outfile',
+                    help="Name of CSV output file (default: stations.csv).")
+parser.add_argument('-m', '--method', action='store', default=method, dest='method',
+                    choices=['nearest', 'bilinear'],
+                    help="Value of nearest cell or bilinear interpolation (default: nearest).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of worker processes (default: number of cores).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import glob
+import time
+
+
+if __name__ == '__main__':
+
+    args       = parser.parse_args()
+    inputfiles = args.inputfiles
+    filelist   = args.filelist
+    variable   = args.variable
+    stations   = args.stations
+    outfile    = args.outfile
+    method     = args.method
+    nprocs     = args.nprocs
+    del parser, args
+
+    import pandas as pd
+    import caspar                     # in lib/
+
+    # file names from glob patterns and file list
+    files = []
+    for ii in inputfiles:
+        ifiles = sorted(glob.glob(ii))
+        if len(ifiles) == 0:
+            print('Warning: no file found for: ', ii)
+        files += ifiles
+    if filelist != '':
+        with open(filelist) as ff:
+            files += [ ll.strip() for ll in ff if ll.strip() != '' ]
+    if len(files) == 0:
+        raise ValueError('extract_CaSPAr_stations: no input files given.')
+
+    # stations
+    sta = pd.read_csv(stations, skipinitialspace=True)
+    sta.columns = [ cc.strip().lower() for cc in sta.columns ]
+    for cc in ['id', 'lon', 'lat']:
+        if cc not in sta.columns:
+            raise ValueError('extract_CaSPAr_stations: column '+cc+' missing in '+stations)
+
+    print('Extract ', len(sta), ' stations from ', len(files), ' files')
+    tstart = time.time()
+    table  = caspar.station_table(files, variable, sta['lon'].values, sta['lat'].values,
+                                  names=[ str(ii) for ii in sta['id'] ], method=method, nprocs=nprocs)
+    for ifile, error in table.attrs['failed']:
+        print('  {:s}: FAILED: {:s}'.format(ifile, error))
+    outside = table.columns[table.isnull().all().values]
+    if len(outside) > 0:
+        print('  {:d} stations outside of the grid: {:s}'.format(len(outside), ', '.join(outside[:10])+(', ...' if len(outside) > 10 else '')))
+    table.to_csv(outfile)
+    print('Wrote {:d} time steps of {:d} stations to {:s} in {:.2f} s'.format(len(table), len(table.columns), outfile,
+                                                                              time.time()-tstart))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+
+"""
+
+Indexes many CaSPAr files, e.g. a year of hourly CaLDAS files, so that they open as one dataset in a split second.
+
+The headers of all files are read once and written to an SQLite index file: time steps, sizes
+and modification times of the files, and the variables, attributes, chunking and coordinates of
+the collection (see caspar.scan_collection). Running the script again on a grown collection
+only reads the new or changed files; an interrupted run continues where it stopped. The
+collection is then opened in Python without touching the NetCDF files:
+
+      import caspar
+      ds = caspar.open_collection('CaLDAS_2017.sqlite')
+      tt = ds['CaLDAS_A_TT_1.5m'].sel(time=slice('2017-07-01', '2017-07-31'))
+
+Only the files of the selected time steps are read when the values are accessed.
+
+Run with::
+
+      CaSPAr-FILES    ... file names or glob patterns of netCDF files (quote patterns)
+      FILELIST        ... text file with names of netCDF files, one per line
+      INDEX-FILE      ... SQLite index file (default: caspar.sqlite)
+      TDIM            ... name of time dimension (default: time)
+      NPROCS          ... number of processes reading headers (default: 1)
+
+      run index_CaSPAr_files.py -i <CaSPAr-FILES> -o <INDEX-FILE>
+      run index_CaSPAr_files.py -i 'my/path/CaLDAS_2017*.nc' -o CaLDAS_2017.sqlite -n 8
+      run index_CaSPAr_files.py -f filelist.txt -o RDPS.sqlite
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfiles = []
+filelist   = ''
+indexfile  = 'caspar.sqlite'
+tdim       = 'time'
+nprocs     = 1
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Index of many files of CASPAR.''')
+parser.add_argument('-i', '--inputfiles', action='store', nargs='+', default=inputfiles, dest='inputfiles',
+                    help="Names or glob patterns of NC files containing data.")
+parser.add_argument('-f', '--filelist', action='store', default=filelist, dest='filelist',
+                    help="Text file with names of NC files, one per line.")
+parser.add_argument('-o', '--indexfile', action='store', default=indexfile, dest='indexfile',
+                    help="Name of SQLite index file (default: caspar.sqlite).")
+parser.add_argument('-t', '--tdim', action='store', default=tdim, dest='tdim',
+                    help="Name of time dimension (default: time).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of processes reading headers (default: 1).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import glob
+import time
+
+
+if __name__ == '__main__':
+
+    args       = parser.parse_args()
+    inputfiles = args.inputfiles
+    filelist   = args.filelist
+    indexfile  = args.indexfile
+    tdim       = args.tdim
+    nprocs     = args.nprocs
+    del parser, args
+
+    import caspar                     # in lib/
+
+    # file names from glob patterns and file list
+    files = []
+    for ii in inputfiles:
+        ifiles = sorted(glob.glob(ii))
+        if len(ifiles) == 0:
+            print('Warning: no file found for: ', ii)
+        files += ifiles
+    if filelist != '':
+        with open(filelist) as ff:
+            files += [ ll.strip() for ll in ff if ll.strip() != '' ]
+    if len(files) == 0:
+        raise ValueError('index_CaSPAr_files: no input files given.')
+
+    tstart = time.time()
+    info   = caspar.scan_collection(files, indexfile, tdim=tdim, nprocs=nprocs)
+    for ifile, error in info['failed']:
+        print('  {:s}: FAILED: {:s}'.format(ifile, error))
+    print('Scanned {:d} files, removed {:d} files in {:.2f} s; {:d} files in {:s}'.format(
+        info['scanned'], info['removed'], time.time()-tstart, info['files'], indexfile))
+
+    tstart = time.time()
+    ds     = caspar.open_collection(indexfile)
+    print('Opened collection in {:.3f} s: {:d} time steps from {:s} to {:s}'.format(
+        time.time()-tstart, ds.dims[tdim], str(ds[tdim].values[0])[:19], str(ds[tdim].values[-1])[:19]))
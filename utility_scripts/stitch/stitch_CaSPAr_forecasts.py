@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Stitches a continuous best-estimate series of variables from consecutive forecast issues (e.g. RDPS, HRDPS).
+
+Every CaSPAr file holds one forecast issue (file name YYYYMMDDHH.nc). From every issue the
+time steps with lead times in the lead window (-l) are taken, e.g. lead hours 7 to 12 of the
+6-hourly RDPS issues, and written into one NetCDF file with one continuous time axis and the
+issue time of every time step (variable issue). Valid times that are not in the lead window of
+any issue, e.g. because an issue is missing, are taken from the latest issue with lead times up
+to FILL hours (-a) or stay empty; the number of missing time steps is reported.
+
+The output file is allocated for the whole series first; the issues are then read by parallel
+processes and written one by one, so that memory does not grow with the length of the series
+(see caspar.stitch). A run that was interrupted continues with the missing issues if it is
+started again with the same arguments.
+
+Run with::
+
+      CaSPAr-FILES    ... file names or glob patterns of netCDF files (quote patterns)
+      FILELIST        ... text file with names of netCDF files, one per line
+      VARNAMES        ... comma-separated names of variables
+      LEADS           ... lead window first-last [hours] (default: 1-6)
+      FILL            ... maximum lead time [hours] filling missing issues (default: no filling)
+      NC-FILE         ... output file (default: stitched.nc)
+      NPROCS          ... number of processes reading files (default: 1)
+
+      run stitch_CaSPAr_forecasts.py -i <CaSPAr-FILES> -v <VARNAMES> -l <LEADS> -o <NC-FILE>
+      run stitch_CaSPAr_forecasts.py -i 'my/path/RDPS/2017*.nc' -v RDPS_P_PR_SFC,RDPS_P_TT_09944 -l 7-12 -o RDPS_2017.nc -n 8
+      run stitch_CaSPAr_forecasts.py -f filelist.txt -v HRDPS_P_PR_SFC -l 7-12 -a 36 -o HRDPS_2017.nc
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfiles = []
+filelist   = ''
+variable   = ''
+leads      = '1-6'
+fill       = 0.
+outfile    = 'stitched.nc'
+nprocs     = 1
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''Best-estimate series of forecasts of CASPAR.''')
+parser.add_argument('-i', '--inputfiles', action='store', nargs='+', default=inputfiles, dest='inputfiles',
+                    help="Names or glob patterns of NC files containing data.")
+parser.add_argument('-f', '--filelist', action='store', default=filelist, dest='filelist',
+                    help="Text file with names of NC files, one per line.")
+parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
+                    help="Comma-separated names of variables which will be stitched.")
+parser.add_argument('-l', '--leads', action='store', default=leads, dest='leads',
+                    help="Lead window first-last in hours, e.g. 7-12 (default: 1-6).")
+parser.add_argument('-a', '--fill', action='store', type=float, default=fill, dest='fill',
+                    help="Maximum lead time in hours of issues filling missing issues (default: no filling).")
+parser.add_argument('-o', '--outfile', action='store', default=outfile, dest='outfile',
+                    help="Name of NetCDF output file (default: stitched.nc).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of processes reading files (default: 1).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import glob
+import time
+
+
+if __name__ == '__main__':
+
+    args       = parser.parse_args()
+    inputfiles = args.inputfiles
+    filelist   = args.filelist
+    variable   = args.variable
+    leads      = args.leads
+    fill       = args.fill
+    outfile    = args.outfile
+    nprocs     = args.nprocs
+    del parser, args
+
+    import caspar                     # in lib/
+
+    # file names from glob patterns and file list
+    files = []
+    for ii in inputfiles:
+        ifiles = sorted(glob.glob(ii))
+        if len(ifiles) == 0:
+            print('Warning: no file found for: ', ii)
+        files += ifiles
+    if filelist != '':
+        with open(filelist) as ff:
+            files += [ ll.strip() for ll in ff if ll.strip() != '' ]
+    if len(files) == 0:
+        raise ValueError('stitch_CaSPAr_forecasts: no input files given.')
+    files = sorted(files)
+
+    print('Stitch lead hours {:g}-{:g} of {:d} issues'.format(*(caspar.lead_window(leads)+(len(files),))))
+    tstart = time.time()
+    info   = caspar.stitch(files, variable.split(','), outfile, leads=leads, fill=fill if (fill > 0.) else None,
+                           nprocs=nprocs)
+    for ifile, error in info['failed']:
+        print('  {:s}: FAILED: {:s}'.format(ifile, error))
+    if (info['resumed'] > 0):
+        print('  {:d} issues were already written'.format(info['resumed']))
+    if (info['gaps'] > 0):
+        print('  {:d} time steps missing in the series'.format(info['gaps']))
+    print('Wrote {:d} time steps of {:d} issues to {:s} in {:.2f} s'.format(info['steps'], info['written'], outfile,
+                                                                          time.time()-tstart))
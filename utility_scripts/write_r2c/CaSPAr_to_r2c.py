@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+# Copyright 2016-2020 Juliane Mai - juliane.mai(at)uwaterloo.ca
+#
+# License
+# This file is part of Juliane Mai's personal code library.
+#
+# Juliane Mai's personal code library is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Juliane Mai's personal code library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with Juliane Mai's personal code library.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+
+Converts variables of one or many CaSPAr files to EnSim r2c files for Green Kenue, MESH or WATFLOOD.
+
+Every variable is written to its own r2c file <R2C-DIR>/<VARNAME>.r2c with one frame per time
+step of all files (sorted by name, i.e. by issue time). Variables are converted in parallel
+processes. Every process streams the files a block of time steps at a time and appends one
+frame after the other, so that memory does not grow with the length of the record.
+
+r2c files are on regular longitude-latitude grids. Variables on rotated grids (RDPS, HRDPS, CaPA)
+are interpolated bilinearly or conservatively (-m) onto a regular grid with the spacing of the
+rotated grid or the given resolution (-r); use a bounding box (-b) around your basin, because the rotated grids
+span all longitudes around the pole. Missing values and cells outside of the rotated grid are
+written as NODATA (-a).
+
+Run with::
+
+      CaSPAr-FILES    ... file names or glob patterns of netCDF files (quote patterns)
+      VARNAMES        ... comma-separated names of variables
+      R2C-DIR         ... directory for the r2c files (default: .)
+      BBOX            ... bounding box lonmin,latmin,lonmax,latmax of the r2c grid [degree] (default: whole grid)
+      RESOLUTION      ... spacing of the r2c grid of rotated grids [degree] (default: spacing of rotated grid)
+      DECIMALS        ... number of decimals of the values (default: 4)
+      NODATA          ... value of missing data (default: -999.)
+      METHOD          ... regridding of rotated grids: bilinear or conservative (default: bilinear)
+      NPROCS          ... number of processes (default: number of variables)
+
+      run CaSPAr_to_r2c.py -i <CaSPAr-FILES> -v <VARNAMES> -o <R2C-DIR> -b <BBOX>
+      run CaSPAr_to_r2c.py -i 'my/path/RDPS_*.nc' -v RDPS_P_PR_SFC,RDPS_P_TT_09944 -o r2c/ -b=-81,42,-74,47
+      run CaSPAr_to_r2c.py -i 'my/path/CaPA_fine_*.nc' -v CaPA_fine_A_PR0_SFC -o r2c/ -b=-81,42,-74,47 -r 0.1 -d 3 -m conservative
+
+"""
+
+# -------------------------------------------------------------------------
+# Command line arguments
+#
+
+import argparse
+
+inputfiles = []
+variable   = ''
+outdir     = '.'
+bbox       = ''
+resolution = 0.
+decimals   = 4
+nodata     = -999.
+method     = 'bilinear'
+nprocs     = 0
+
+parser  = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                  description='''r2c files of CASPAR.''')
+parser.add_argument('-i', '--inputfiles', action='store', nargs='+', default=inputfiles, dest='inputfiles',
+                    help="Names or glob patterns of NC files containing data.")
+parser.add_argument('-v', '--variable', action='store', default=variable, dest='variable',
+                    help="Comma-separated names of variables which will be converted.")
+parser.add_argument('-o', '--outdir', action='store', default=outdir, dest='outdir',
+                    help="Directory for r2c files (default: .).")
+parser.add_argument('-b', '--bbox', action='store', default=bbox, dest='bbox',
+                    help="Bounding box 'lonmin,latmin,lonmax,latmax' of r2c grid, e.g. -b=-81,42,-74,47 "
+                         "(default: whole grid).")
+parser.add_argument('-r', '--resolution', action='store', type=float, default=resolution, dest='resolution',
+                    help="Spacing of r2c grid of rotated grids in degree (default: spacing of rotated grid).")
+parser.add_argument('-d', '--decimals', action='store', type=int, default=decimals, dest='decimals',
+                    help="Number of decimals of values (default: 4).")
+parser.add_argument('-a', '--nodata', action='store', type=float, default=nodata, dest='nodata',
+                    help="Value of missing data (default: -999.).")
+parser.add_argument('-m', '--method', action='store', default=method, dest='method',
+                    choices=['bilinear', 'conservative'],
+                    help="Regridding of rotated grids: bilinear or conservative (default: bilinear).")
+parser.add_argument('-n', '--nprocs', action='store', type=int, default=nprocs, dest='nprocs',
+                    help="Number of processes (default: number of variables).")
+
+# -----------------------
+# add subolder scripts/lib to search path
+# -----------------------
+import sys
+import os
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(dir_path+'/../lib')
+
+import glob
+import time
+import multiprocessing as mp
+
+
+def convert_variable(job):
+    """ r2c file of one variable in a worker; returns variable, timing and error message. """
+    import caspar                     # in lib/
+    files, variable, r2cfile, decimals, resolution, bbox, nodata, method = job
+    tstart = time.time()
+    try:
+        itime = caspar.write_r2c(files, variable, r2cfile, decimals=decimals, resolution=resolution, bbox=bbox,
+                                 nodata=nodata, method=method)
+        error = ''
+    except Exception as e:
+        itime = {'nframes': 0}
+        error = type(e).__name__+': '+str(e)
+    itime['total'] = time.time() - tstart
+
+    return variable, itime, error
+
+
+if __name__ == '__main__':
+
+    args       = parser.parse_args()
+    inputfiles = args.inputfiles
+    variable   = args.variable
+    outdir     = args.outdir
+    bbox       = args.bbox
+    resolution = args.resolution
+    decimals   = args.decimals
+    nodata     = args.nodata
+    method     = args.method
+    nprocs     = args.nprocs
+    del parser, args
+
+    files = []
+    for ii in inputfiles:
+        ifiles = sorted(glob.glob(ii))
+        if len(ifiles) == 0:
+            print('Warning: no file found for: ', ii)
+        files += ifiles
+    files = sorted(files)
+    if len(files) == 0:
+        raise ValueError('CaSPAr_to_r2c: no input files given.')
+    variables = variable.split(',')
+
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    if nprocs <= 0:
+        nprocs = len(variables)
+    nprocs = min(nprocs, len(variables))
+
+    jobs = [ (files, vv, os.path.join(outdir, vv+'.r2c'), decimals, resolution if (resolution > 0.) else None,
+              bbox if (bbox != '') else None, nodata, method) for vv in variables ]
+
+    print('Convert ', len(variables), ' variables of ', len(files), ' files on ', nprocs, ' processes')
+    tstart = time.time()
+    if (nprocs > 1):
+        ctx     = mp.get_context('spawn')
+        pool    = ctx.Pool(processes=nprocs)
+        iresult = pool.imap_unordered(convert_variable, jobs, chunksize=1)
+    else:
+        iresult = map(convert_variable, jobs)
+    for ivar, itime, error in iresult:
+        if error == '':
+            print('  {:s}: {:d} frames in {:.2f} s (read {:.2f} s, regrid {:.2f} s, format {:.2f} s, write {:.2f} s)'.format(
+                ivar, itime['nframes'], itime['total'], itime['read'], itime['regrid'], itime['format'], itime['write']))
+        else:
+            print('  {:s}: FAILED: {:s}'.format(ivar, error))
+    if (nprocs > 1):
+        pool.close()
+        pool.join()
+    print('Wall time: {:.2f} s'.format(time.time()-tstart))